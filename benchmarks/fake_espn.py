@@ -0,0 +1,135 @@
+"""Deterministic stand-in for espnff's League, for benchmarking without ESPN.
+
+League ids encode the league's size: league id 12003 is variant 3 of a 12-team league. Every league-season
+is generated from a seed derived from its id and year, so repeated runs see identical data.
+"""
+import time
+import numpy as np
+
+
+REG_SEASON_WEEKS = 13
+PLAYOFF_WEEKS = 3
+
+
+def make_league_id(number_teams, variant=0):
+    """Returns the id of a fake league with the given number of teams"""
+
+    return number_teams * 1000 + variant
+
+
+class FakeSettings:
+
+    def __init__(self, league_id, number_teams):
+        self.name = 'Benchmark League {}'.format(league_id)
+        self.team_count = number_teams
+        self.reg_season_count = REG_SEASON_WEEKS
+        self.final_season_count = REG_SEASON_WEEKS + PLAYOFF_WEEKS
+        self.playoff_team_count = min(4, number_teams)
+        self.status = 'complete'
+
+
+class FakeTeam:
+
+    def __init__(self, team_id, owner):
+        self.team_id = team_id
+        self.owner = owner
+        self.team_name = 'Team {}'.format(team_id)
+        self.wins = 0
+        self.losses = 0
+        self.scores = []
+        self.schedule = []
+        self.mov = []
+
+    def __repr__(self):
+        return 'Team({})'.format(self.team_name)
+
+
+class FakeMatchup:
+
+    def __init__(self, home_team, home_score, away_team, away_score):
+        self.home_team = home_team
+        self.home_score = home_score
+        self.away_team = away_team
+        self.away_score = away_score
+
+
+def round_robin(number_teams, number_weeks):
+    """Returns a circle-method schedule as a list of weeks of (home, away) index pairs; away is None on a bye"""
+
+    slots = list(range(number_teams)) + ([None] if number_teams % 2 else [])
+    weeks = []
+
+    for _ in range(number_weeks):
+        half = len(slots) // 2
+        pairs = list(zip(slots[:half], reversed(slots[half:])))
+        weeks.append([(home, away) if home is not None else (away, None) for home, away in pairs])
+
+        # keep the first slot fixed and rotate the rest
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+
+    return weeks
+
+
+class FakeLeague:
+    """Quacks like espnff.League(league_id, year) for a completed season of synthetic scores
+
+    Set FakeLeague.latency to the seconds each request should take, to stand in for ESPN's response time.
+    """
+
+    latency = 0.0
+
+    def __init__(self, league_id, year):
+        self.league_id = league_id
+        self.year = year
+        self.requests = 1
+
+        number_teams = int(league_id) // 1000
+        rng = np.random.RandomState((int(league_id) * 7919 + int(year)) % (2 ** 31))
+
+        self.settings = FakeSettings(league_id, number_teams)
+        self.teams = [FakeTeam(idx + 1, 'Owner{} Benchmark'.format(idx + 1)) for idx in range(number_teams)]
+
+        # each team has its own strength, so standings and odds aren't all alike
+        strength = rng.normal(110, 12, number_teams)
+        self._scores = np.round(rng.normal(strength[:, None], 20, (number_teams, REG_SEASON_WEEKS)), 1)
+        self._pairings = round_robin(number_teams, REG_SEASON_WEEKS)
+
+        for week, pairs in enumerate(self._pairings):
+            for home, away in pairs:
+                home_team = self.teams[home]
+                away_team = self.teams[away] if away is not None else home_team
+
+                # espnff lists a team on a bye as its own opponent
+                home_team.schedule.append(away_team)
+
+                if away is not None:
+                    away_team.schedule.append(home_team)
+
+        for idx, team in enumerate(self.teams):
+            team.scores = self._scores[idx].tolist()
+
+        for team in self.teams:
+            for week, opponent in enumerate(team.schedule):
+                team.mov.append(team.scores[week] - opponent.scores[week])
+
+            team.wins = sum(mov > 0 for mov in team.mov)
+            team.losses = REG_SEASON_WEEKS - team.wins
+
+        time.sleep(self.latency)
+
+    def __repr__(self):
+        return 'FakeLeague({}, {})'.format(self.league_id, self.year)
+
+    def scoreboard(self, week=None):
+        self.requests += 1
+        time.sleep(self.latency)
+
+        matchups = []
+
+        for home, away in self._pairings[week - 1]:
+            away_team = self.teams[away] if away is not None else None
+            away_score = self._scores[away, week - 1] if away is not None else 0.0
+
+            matchups.append(FakeMatchup(self.teams[home], self._scores[home, week - 1], away_team, away_score))
+
+        return matchups
@@ -0,0 +1,314 @@
+"""Benchmarks for the explorer's hot paths, run against the fake ESPN backend in fake_espn.py.
+
+For every synthetic league size and number of seasons, each stage reports its wall time (best of --repeat
+runs), peak memory traced while it ran, and, for the explorer's handlers, the size of the websocket message
+the change would send. Results are saved per commit under benchmarks/results/ so runs can be compared.
+
+    python benchmarks/run_benchmarks.py --teams 4 12 32 --seasons 1 5 20
+    python benchmarks/run_benchmarks.py --compare 1a2b3c4
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from unittest import mock
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# runs must not touch the real store or shared cache; read when the app modules are first imported
+os.environ['FFL_STORE_PATH'] = ''
+os.environ['FFL_SHARED_CACHE_DIR'] = ''
+os.environ['FFL_OFFLINE'] = '0'
+
+# the explorer starts simulations in the background on every league it shows; keep them from skewing timings
+os.environ.setdefault('FFL_PLAYOFF_SIMS', '1000')
+
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import league_data
+from fake_espn import FakeLeague, make_league_id
+from league_data import load_league_season
+from playoff_odds import simulate_playoff_odds
+from schedule_luck import simulate_schedule_luck
+from scoreboard_store import ScoreboardStore
+from structures import LeagueSeason
+
+
+# the explorer's default league; the benchmark league is cached under this key before the explorer starts
+EXPLORER_LEAGUE_ID = 1667721
+
+FIRST_SEASON = 2000
+
+# week the mid-season copy used for playoff odds is cut at
+MID_SEASON_WEEK = 7
+
+
+def measure(fn, *args):
+    """Runs fn(*args) once
+    :return: tuple of (result, wall seconds, peak traced bytes)
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        result = fn(*args)
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+    return result, wall, peak
+
+
+def run_stage(results, config, stage, repeat, fn, *args):
+    """Measures a stage repeat times and records the best wall time and the first run's peak memory
+    :return: the stage's result from its first run
+    """
+
+    result, best_wall, peak = measure(fn, *args)
+
+    for _ in range(repeat - 1):
+        best_wall = min(best_wall, measure(fn, *args)[1])
+
+    results.append(dict(config, stage=stage, wall_s=round(best_wall, 6), peak_kb=round(peak / 1024.0, 1)))
+    print('  {: <16} {: >10.2f} ms {: >12.1f} KB'.format(stage, best_wall * 1000, peak / 1024.0))
+
+    return result
+
+
+def load_seasons(league_id, years, store):
+    return [load_league_season(league_id, year, store=store) for year in years]
+
+
+def compile_seasons(seasons):
+    return [LeagueSeason(s.league_id, s.year, s.name, s.team_ids, s.owners, np.array(s.scores), s.wins, s.complete,
+                         opponents=s.opponents, playoff_teams=s.playoff_teams) for s in seasons]
+
+
+def all_window_tables(season):
+    # every table the Summary tab can show
+    for start in range(1, season.latest_week + 1):
+        for end in range(start, season.latest_week + 1):
+            order = season.window_order(start, end)
+            season.window_ranks(start, end)[order]
+            season.window_wins(start, end)[order]
+            season.rank_movement(start, end)[order]
+
+
+def mid_season(season, week):
+    """Returns a copy of a league-season as it stood after the given week"""
+
+    wins = season.cumul_wins[:, week].astype(int)
+
+    return LeagueSeason(season.league_id, season.year, season.name, season.team_ids, season.owners,
+                        season.scores[:, :week], wins, False, opponents=season.opponents,
+                        playoff_teams=season.playoff_teams)
+
+
+def run_explorer_stages(results, config, season, other_season, repeat):
+    """Times the explorer's session start and handlers in a bokeh Document, if bokeh is installed"""
+
+    try:
+        from bokeh.document import Document
+        from bokeh.document.events import DocumentPatchedEvent
+        from bokeh.io.doc import set_curdoc
+        from bokeh.protocol.messages.patch_doc import process_document_events
+
+    except ImportError:
+        print('  (bokeh is not installed; skipping explorer stages)')
+        return
+
+    from league_cache import league_cache
+    from league_data import current_season
+
+    league_cache.clear()
+    league_cache.put(EXPLORER_LEAGUE_ID, current_season(), season)
+
+    def start_session():
+        doc = Document()
+        set_curdoc(doc)
+        return doc, runpy.run_path(os.path.join(REPO_ROOT, 'explore.py'), run_name='explore')
+
+    def message_bytes(doc, fn, *args):
+        # what the server would send the browser for the changes fn makes
+        events = []
+
+        def on_change(event):
+            if isinstance(event, DocumentPatchedEvent):
+                events.append(event)
+
+        doc.on_change(on_change)
+
+        try:
+            fn(*args)
+        finally:
+            doc.remove_on_change(on_change)
+
+        if not events:
+            return 0
+
+        patch_json, buffers = process_document_events(events)
+
+        return len(patch_json.encode('utf-8')) + sum(len(payload) for _, payload in buffers)
+
+    doc, explorer = run_stage(results, config, 'session_start', repeat, start_session)
+    results[-1]['message_bytes'] = len(doc.to_json_string().encode('utf-8'))
+
+    # widget changes are synced between browser and server the same way in either direction; repeating
+    # them would change nothing, so each is run once
+    handlers = [
+        ('switch_league', repeat, explorer['display_season'], other_season),
+        ('week_slider', 1, setattr, explorer['week_slider'], 'value', (2, other_season.latest_week)),
+        ('week_select', 1, setattr, explorer['week_select'], 'value', str(other_season.latest_week - 1)),
+        ('compare_select', 1, setattr, explorer['teams_select'], 'value', list(other_season.owners[:2])),
+    ]
+
+    for handler in handlers:
+        stage, runs, fn, args = handler[0], handler[1], handler[2], handler[3:]
+
+        size = run_stage(results, config, stage, runs, message_bytes, doc, fn, *args)
+        results[-1]['message_bytes'] = size
+
+        print('  {: <16} {: >28} bytes'.format('', size))
+
+
+def run_config(number_teams, number_seasons, repeat, sims):
+    """Runs every stage for one synthetic league
+    :return: list of result dicts
+    """
+
+    config = dict(teams=number_teams, seasons=number_seasons)
+    results = []
+    league_id = make_league_id(number_teams)
+    years = list(range(FIRST_SEASON, FIRST_SEASON + number_seasons))
+
+    print('{} teams, {} season(s)'.format(number_teams, number_seasons))
+
+    with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.object(league_data, 'League', FakeLeague):
+        cold_runs = []
+
+        # a fresh store each run, so every cold fetch really goes to the fake backend
+        def cold_fetch():
+            cold_runs.append(len(cold_runs))
+            store_path = os.path.join(tmp_dir, 'cold-{}.sqlite3'.format(cold_runs[-1]))
+
+            return load_seasons(league_id, years, ScoreboardStore(store_path))
+
+        seasons = run_stage(results, config, 'fetch_cold', repeat, cold_fetch)
+
+        warm_store = ScoreboardStore(os.path.join(tmp_dir, 'warm.sqlite3'))
+        load_seasons(league_id, years, warm_store)
+        run_stage(results, config, 'fetch_warm', repeat, load_seasons, league_id, years, warm_store)
+
+    run_stage(results, config, 'compile', repeat, compile_seasons, seasons)
+
+    latest = seasons[-1]
+    run_stage(results, config, 'window_tables', repeat, all_window_tables, latest)
+
+    mid = mid_season(latest, MID_SEASON_WEEK)
+    run_stage(results, config, 'playoff_odds', repeat, simulate_playoff_odds, mid, sims, 0, 0)
+    run_stage(results, config, 'schedule_luck', repeat, simulate_schedule_luck, latest, sims, 0, 0)
+
+    other = seasons[0] if len(seasons) > 1 else mid
+    run_explorer_stages(results, config, latest, other, repeat)
+
+    return results
+
+
+def current_commit():
+    """Returns the short hash of HEAD, marked -dirty if the tree has uncommitted changes"""
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT).decode().strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT)
+
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    return commit + ('-dirty' if dirty.strip() else '')
+
+
+def save_results(results, args):
+    """Writes this run's results to benchmarks/results/<commit>.json
+    :return: path written
+    """
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = current_commit()
+    path = os.path.join(RESULTS_DIR, '{}.json'.format(commit))
+
+    with open(path, 'w') as outfile:
+        json.dump(dict(commit=commit, timestamp=time.time(), python=platform.python_version(),
+                       numpy=np.__version__, latency=args.latency, sims=args.sims, results=results),
+                  outfile, indent=1)
+
+    return path
+
+
+def compare_results(results, reference_path):
+    """Prints each stage's change against a saved run"""
+
+    with open(reference_path, 'r') as infile:
+        reference = json.load(infile)
+
+    previous = {(r['teams'], r['seasons'], r['stage']): r for r in reference['results']}
+
+    print('\nCompared with {}:'.format(reference['commit']))
+    print('{: >5} {: >7} {: <16} {: >10} {: >10} {: >8}'.format('teams', 'seasons', 'stage', 'before ms',
+                                                               'after ms', 'change'))
+
+    for result in results:
+        before = previous.get((result['teams'], result['seasons'], result['stage']))
+
+        if before is None or not before['wall_s']:
+            continue
+
+        print('{: >5} {: >7} {: <16} {: >10.2f} {: >10.2f} {: >+7.0%}'.format(
+            result['teams'], result['seasons'], result['stage'], before['wall_s'] * 1000, result['wall_s'] * 1000,
+            result['wall_s'] / before['wall_s'] - 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the explorer against a fake ESPN backend.')
+    parser.add_argument('--teams', type=int, nargs='+', default=[4, 12, 32], help='league sizes (4 to 32)')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[1, 5, 20], help='seasons per league (1 to 20)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; the best time is kept')
+    parser.add_argument('--sims', type=int, default=20000, help='simulations for the odds and luck stages')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per fake ESPN request')
+    parser.add_argument('--compare', default=None, help='commit (or results file) to compare against')
+    parser.add_argument('--no-save', action='store_true', help="don't save this run's results")
+    args = parser.parse_args(argv)
+
+    FakeLeague.latency = args.latency
+
+    results = []
+
+    for number_teams in args.teams:
+        for number_seasons in args.seasons:
+            results.extend(run_config(number_teams, number_seasons, args.repeat, args.sims))
+
+    if not args.no_save:
+        print('\nSaved {}'.format(save_results(results, args)))
+
+    if args.compare is not None:
+        reference_path = args.compare if os.path.exists(args.compare) else \
+            os.path.join(RESULTS_DIR, '{}.json'.format(args.compare))
+
+        compare_results(results, reference_path)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import numpy as np
+
+
+# score matrices are (teams, weeks); any leading axes (e.g. stacked seasons) are carried through
+TEAM_AXIS = -2
+WEEK_AXIS = -1
+
+
+def _tie_counts(scores):
+    """Returns, for every score, how many scores in its week are strictly lower and how many are equal
+    :param scores: array of shape (..., teams, weeks)
+    :return: tuple of int arrays (below, equal), both shaped like scores; equal counts the score itself
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    num_teams = scores.shape[TEAM_AXIS]
+
+    # stable sort keeps runs of equal scores contiguous down each week's column
+    order = np.argsort(scores, axis=TEAM_AXIS, kind='mergesort')
+    sorted_scores = np.take_along_axis(scores, order, axis=TEAM_AXIS)
+
+    positions = np.arange(num_teams).reshape((num_teams, 1))
+    positions = np.broadcast_to(positions, scores.shape)
+
+    # mark where each run of equal scores starts and ends
+    diffs = np.diff(sorted_scores, axis=TEAM_AXIS) != 0
+    edge = np.ones(scores.shape[:-2] + (1, scores.shape[-1]), dtype=bool)
+    run_starts = np.concatenate([edge, diffs], axis=TEAM_AXIS)
+    run_ends = np.concatenate([diffs, edge], axis=TEAM_AXIS)
+
+    # first / last sorted position of the run each score belongs to
+    first = np.maximum.accumulate(np.where(run_starts, positions, 0), axis=TEAM_AXIS)
+    last = np.flip(np.minimum.accumulate(np.flip(np.where(run_ends, positions, num_teams), axis=TEAM_AXIS),
+                                         axis=TEAM_AXIS), axis=TEAM_AXIS)
+
+    # scatter back from sorted order to team order
+    below = np.empty(scores.shape, dtype=int)
+    equal = np.empty(scores.shape, dtype=int)
+    np.put_along_axis(below, order, first, axis=TEAM_AXIS)
+    np.put_along_axis(equal, order, last - first + 1, axis=TEAM_AXIS)
+
+    return below, equal
+
+
+def weekly_ranks(scores):
+    """Returns each team's rank within every week, highest score ranked 1
+    :param scores: array of shape (..., teams, weeks)
+    :return: float array shaped like scores; tied teams share the average of the ranks they span
+    """
+
+    below, equal = _tie_counts(scores)
+    num_teams = below.shape[TEAM_AXIS]
+
+    return num_teams - below - (equal - 1) / 2
+
+
+def weekly_expected_wins(scores):
+    """Returns each team's expected wins for every week, i.e. its all-play win fraction
+    :param scores: array of shape (..., teams, weeks)
+    :return: float array shaped like scores
+
+    e.g., 12-team league, 2nd highest scorer would lose one matchup --> 1 - (1 * 1/11) = .909 expected wins.
+    A tie counts as half a win against each team it ties with.
+    """
+
+    below, equal = _tie_counts(scores)
+    num_teams = below.shape[TEAM_AXIS]
+
+    return (below + (equal - 1) / 2) / (num_teams - 1)
+
+
+def cumulative_expected_wins(weekly_ew):
+    """Returns running expected wins totals, starting from zero before week 1
+    :param weekly_ew: array of shape (..., teams, weeks)
+    :return: float array of shape (..., teams, weeks + 1); column k is the total through week k
+    """
+
+    weekly_ew = np.asarray(weekly_ew, dtype=float)
+    start = np.zeros(weekly_ew.shape[:-1] + (1,))
+
+    return np.concatenate([start, np.cumsum(weekly_ew, axis=WEEK_AXIS)], axis=WEEK_AXIS)
+
+
+def head_to_head(scores):
+    """Returns the all-play result of every team against every other team, week by week
+    :param scores: array of shape (..., teams, weeks)
+    :return: tuple of int arrays (wins, ties), each (..., teams, teams, weeks); [i, j, w] is 1 if team i
+    beat (or tied) team j in week w + 1. Losses are the wins transposed: wins[j, i, w].
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    num_teams = scores.shape[TEAM_AXIS]
+
+    # (..., teams, 1, weeks) against (..., 1, teams, weeks) compares every pair at once
+    mine = np.expand_dims(scores, TEAM_AXIS)
+    theirs = np.expand_dims(scores, TEAM_AXIS - 1)
+
+    wins = (mine > theirs).astype(int)
+    ties = (mine == theirs).astype(int)
+
+    # a team never plays itself
+    diagonal = np.arange(num_teams)
+    ties[..., diagonal, diagonal, :] = 0
+
+    return wins, ties
+
+
+def all_play_matrix(scores, start_week=1, end_week=None):
+    """Returns every team's all-play record against every other team over a range of weeks
+    :param scores: array of shape (..., teams, weeks)
+    :param start_week: int, first week included
+    :param end_week: int, last week included; defaults to the last week of scores
+    :return: tuple of int arrays (wins, losses, ties), each (..., teams, teams); row i is team i's record
+    against each column's team
+    """
+
+    wins, ties = head_to_head(np.asarray(scores)[..., start_week - 1:end_week])
+
+    wins = wins.sum(axis=WEEK_AXIS)
+    ties = ties.sum(axis=WEEK_AXIS)
+
+    return wins, np.swapaxes(wins, -1, -2), ties
+
+
+def all_play_records(scores):
+    """Returns each team's all-play record in every week
+    :param scores: array of shape (..., teams, weeks)
+    :return: tuple of int arrays (wins, losses, ties), each shaped like scores
+    """
+
+    below, equal = _tie_counts(scores)
+    num_teams = below.shape[TEAM_AXIS]
+
+    return below, num_teams - below - equal, equal - 1
+
+
+def window_totals(cumulative):
+    """Returns totals over every window of weeks from running totals
+    :param cumulative: array of shape (teams, weeks + 1), e.g. from cumulative_expected_wins()
+    :return: array of shape (weeks + 1, weeks + 1, teams); [a, b] totals weeks a + 1 through b, for a < b
+    """
+
+    totals = np.asarray(cumulative, dtype=float).T
+
+    return totals[None, :, :] - totals[:, None, :]
+
+
+def standings_ranks(totals, decimals=5):
+    """Returns each team's rank by total, highest ranked 1
+    :param totals: array of shape (..., teams)
+    :param decimals: int, totals equal to this many places are tied
+    :return: int array shaped like totals; tied teams share the best rank they span
+    """
+
+    totals = np.round(totals, decimals)
+
+    # one more than the number of teams strictly ahead
+    return (totals[..., None, :] > totals[..., :, None]).sum(axis=-1) + 1
@@ -2,556 +2,680 @@ from bokeh.io import curdoc
 from bokeh.plotting import figure, ColumnDataSource
 from bokeh.layouts import row, column, widgetbox
 from bokeh.models import HoverTool, ResetTool, SaveTool, WheelZoomTool, BoxZoomTool, PanTool, Spacer, Range1d, Legend
-from bokeh.models.widgets import Dropdown, Button, RangeSlider, Div, TextInput, Panel, Tabs, DataTable, TableColumn
+from bokeh.models import CDSView, IndexFilter, LinearColorMapper, ColorBar
+from bokeh.models.widgets import MultiSelect, Button, RangeSlider, Div, TextInput, Panel, Tabs, DataTable, TableColumn
+from bokeh.models.widgets import NumberFormatter, Select
 from bokeh.models.tickers import FixedTicker
 from bokeh.palettes import all_palettes
 from bokeh.models.callbacks import CustomJS
-from espnff import League, PrivateLeagueException, InvalidLeagueException, UnknownLeagueException
-from datetime import datetime
-from structures import Team
+import numpy as np
+from espnff import PrivateLeagueException, InvalidLeagueException, UnknownLeagueException
+from league_cache import league_cache, load_in_background, load_history_in_background, run_in_background
+from league_data import current_season, history_years, LoadCancelled
+from structures import FranchiseHistory
+from league_figures import get_line_colors, initialize_sc_figure, initialize_ew_figure, initialize_ew_table
+from league_figures import get_sc_source, get_ew_source, get_table_sources, plot_sc_data, plot_ew_data
+from league_figures import make_week_filter, make_week_range_callback, make_week_select_callback, week_range_args
+from playoff_odds import get_playoff_odds
+from expected_wins import head_to_head
+from schedule_luck import get_schedule_luck, summarize_schedule_luck
+from metrics import timed, get_session_profile
+from sessions import register_session
+from functools import partial, wraps
+import threading
 import logging
 
 # hide bokeh warnings, but show errors and above
 logging.root.setLevel(logging.ERROR)
+logger = logging.getLogger(__name__)
 
 
-def retrieve_lg_info(league_id, year):
-    # todo docstring
-
-    # flag for whether league access was successful
-    all_good = True
+def session_stage(stage):
+    """Decorator timing every call of a function under stage for /metrics, profiling it too if this session
+    is being profiled
+    """
 
-    try:
-        league = League(league_id, year)
+    def decorate(fn):
+        @wraps(fn)
+        def timed_fn(*args, **kwargs):
+            with timed(stage, session_profile):
+                return fn(*args, **kwargs)
 
-    # todo function for wrapping with this style
-    except PrivateLeagueException:
-        lg_id_message.text = ('<b><p style="color: red;">League not viewable by public. '
-                              '<a href="http://support.espn.com/articles/en_US/FAQ/Making-a-Private-League-'
-                              'Viewable-to-the-Public?section=Fantasy-Football" target="_blank">'
-                              'How to Resolve</a></p></b>')
-        all_good = False
+        return timed_fn
 
-    except InvalidLeagueException:
-        lg_id_message.text = '<b><p style="color: red;">League with id {} does not exist.</p></b>'.format(league_id)
-        all_good = False
+    return decorate
 
-    except UnknownLeagueException:
-        lg_id_message.text = '<b><p style="color: red;">{} Season for league with id {} does not exist.</p></b>'.format(year, league_id)
-        all_good = False
 
-    if all_good:
+def get_error_message(error, league_id, year):
+    """Returns the message to show when a league could not be accessed
+    :param error: the exception raised while loading the league
+    :param league_id: int or str
+    :param year: int or str
+    :return: string, html for lg_id_message
+    """
 
-        lg_id_message.text = '<b><p style="color: #fcbf16;">Compiling data for League {}, \n{} Season</p></b>'.format(league_id, year)
+    if isinstance(error, PrivateLeagueException):
+        return ('<b><p style="color: red;">League not viewable by public. '
+                '<a href="http://support.espn.com/articles/en_US/FAQ/Making-a-Private-League-'
+                'Viewable-to-the-Public?section=Fantasy-Football" target="_blank">'
+                'How to Resolve</a></p></b>')
 
-        teams = league.teams
-        number_teams = league.settings.team_count
+    if isinstance(error, InvalidLeagueException):
+        return '<b><p style="color: red;">League with id {} does not exist.</p></b>'.format(league_id)
 
-        # not available to just pull from league object
-        latest_week = teams[0].wins + teams[0].losses
+    if not isinstance(error, UnknownLeagueException):
+        return '<b><p style="color: red;">Could not load league with id {}. Please try again.</p></b>'.format(league_id)
 
-        # list of owner names as given by their espn accounts
-        all_owners = [tm.owner for tm in teams]
+    return '<b><p style="color: red;">{} Season for league with id {} does not exist.</p></b>'.format(year, league_id)
 
-        # to be used for options in dropdown menus
-        owners_list_dd = [(owner, owner) for owner in all_owners]
 
-        # espnff team objects to retrieve data
-        all_team_objs = [Team(tm.owner, tm.scores) for tm in teams]
+def get_progress_message(league_id, year, done=None, total=None):
+    """Returns the message shown while a league is loading
+    :param league_id: int or str
+    :param year: int or str
+    :param done: int, weeks fetched so far
+    :param total: int, weeks to fetch; None before the count is known
+    :return: string, html for lg_id_message
+    """
 
-        # valid regular season weeks
-        all_weeks = [i for i in range(1, latest_week + 1)]
+    message = 'Compiling data for League {}, \n{} Season'.format(league_id, year)
 
-        # given the name of an owner, returns index where it's found in the team objects list
-        owner_to_idx_dict = {tm_obj.owner: index for index, tm_obj in enumerate(all_team_objs)}
+    if total:
+        message += ' (week {} of {})'.format(done, total)
 
-        return league, number_teams, latest_week, all_owners, owners_list_dd, all_team_objs, all_weeks, owner_to_idx_dict
+    return '<b><p style="color: #fcbf16;">{}</p></b>'.format(message)
 
 
-def get_scores(lg_obj, wk_num):
-    """Returns a list of each team's owner and score for the selected week
-    :param lg_obj: a League(league_id, year) object for espnff
-    :param wk_num: int, week of the season
-    :return: a list of lists; [[owner, score], ... ] sorted highest to lowest
+@session_stage('initialize_odds_table')
+def initialize_odds_table(season, odds):
+    """Returns a table of each team's chance of making the playoffs and of finishing in each seed
+    :param season: structures.LeagueSeason
+    :param odds: (teams, teams) array from playoff_odds.get_playoff_odds()
+    :return: DataTable, most likely playoff teams first
     """
 
-    week_scores = {}
-    for matchup in lg_obj.scoreboard(week=wk_num):
-        home = [matchup.home_team, matchup.home_score]
-        away = [matchup.away_team, matchup.away_score]
-        week_scores[home[0].owner] = home[1]
-        week_scores[away[0].owner] = away[1]
+    number_teams = season.number_teams
+    playoff_odds = odds[:, :season.playoff_teams].sum(axis=1)
+
+    # stable sort so teams with equal odds keep team order
+    order = np.argsort(-playoff_odds, kind='mergesort')
 
-    # dict to list of lists
-    scores = map(list, week_scores.items())
+    data = dict(owner=[season.owners[i] for i in order], playoffs=playoff_odds[order].tolist())
+    percent = NumberFormatter(format='0.0%')
 
-    # a list of lists [owner, score] for current week, highest to lowest score
-    return sorted(scores, reverse=True, key=lambda x: x[1])
+    table_columns = [
+        TableColumn(field='owner', title='Owner'),
+        TableColumn(field='playoffs', title='Playoffs', formatter=percent)
+    ]
 
+    for seed in range(number_teams):
+        data['seed_{}'.format(seed + 1)] = odds[order, seed].tolist()
+        table_columns.append(TableColumn(field='seed_{}'.format(seed + 1), title='#{}'.format(seed + 1),
+                                         formatter=percent))
 
-def get_line_colors(number_teams):
-    # todo docstring
-    # todo - this is hacky - refactor
-    colors = all_palettes['Paired'][number_teams]
+    return DataTable(source=ColumnDataSource(data), columns=table_columns, width=1000, height=500,
+                     sortable=True)
 
-    colors[0] = '#7fe8cd'
 
-    if len(colors) >= 5:
-        colors[4] = '#828081'
+@session_stage('initialize_luck_table')
+def initialize_luck_table(season, distribution):
+    """Returns a table comparing each team's actual wins with the wins other schedules would have given it
+    :param season: structures.LeagueSeason
+    :param distribution: array from schedule_luck.get_schedule_luck()
+    :return: DataTable, luckiest teams first
+    """
+
+    summary = summarize_schedule_luck(season, distribution)
 
-    if len(colors) >= 7:
-        colors[6] = '#000000'
+    # stable sort so equally lucky teams keep team order
+    order = np.argsort(-summary['luck'], kind='mergesort')
 
-    if len(colors) >= 9:
-        colors[8] = '#592724'
+    data = dict(
+        owner=[season.owners[i] for i in order],
+        wins=season.wins[order].tolist(),
+        mean=np.round(summary['mean'][order], 2).tolist(),
+        range=['{:g} - {:g}'.format(summary['low'][i], summary['high'][i]) for i in order],
+        luck=summary['luck'][order].tolist()
+    )
 
-    if len(colors) >= 11:
-        colors[10] = '#0f4c30'
+    table_columns = [
+        TableColumn(field='owner', title='Owner'),
+        TableColumn(field='wins', title='Wins'),
+        TableColumn(field='mean', title='Avg Wins, Other Schedules'),
+        TableColumn(field='range', title='90% of Schedules'),
+        TableColumn(field='luck', title='Schedules With Fewer Wins', formatter=NumberFormatter(format='0.0%'))
+    ]
 
-    return colors
+    return DataTable(source=ColumnDataSource(data), columns=table_columns, width=800, height=500,
+                     sortable=True)
 
 
-def initialize_sc_figure(league, curr_week):
-    # todo docstring
+@session_stage('initialize_all_play_figure')
+def initialize_all_play_figure(season, all_play_source):
+    """Returns a heatmap of every team's all-play win percentage against every other team
+    :param season: structures.LeagueSeason
+    :param all_play_source: ColumnDataSource from get_all_play_source()
+    :return: figure with teams down the side and opponents across the top
+    """
 
-    sc_hover = HoverTool(tooltips=[
-        ('Week', '@x'),
-        ('Owner', '@owner'),
-        ('Score', '@y{*00.00}'),
+    ap_hover = HoverTool(tooltips=[
+        ('Team', '@owner'),
+        ('Opponent', '@opponent'),
+        ('All-Play Record', '@record'),
     ])
 
-    # try plotting just scores first
     plot = figure(plot_height=600, plot_width=1000,
-                  title='{} - {} Regular Season'.format(league.settings.name, year_input.value),
-                  x_axis_label='Week',
-                  y_axis_label='Scores',
-                  tools=[sc_hover, ResetTool(), BoxZoomTool(), WheelZoomTool(), SaveTool(), PanTool()])
+                  title='{} - {} All-Play Records'.format(season.name, season.year),
+                  x_range=list(season.owners), y_range=list(reversed(season.owners)),
+                  x_axis_location='above', tools=[ap_hover, SaveTool()])
 
-    plot.xaxis.ticker = FixedTicker(ticks=[i for i in range(1, curr_week + 1)])
+    plot.grid.grid_line_color = None
+    plot.axis.axis_line_color = None
+    plot.axis.major_tick_line_color = None
+    plot.xaxis.major_label_orientation = np.pi / 4
+
+    # red for teams that lose the matchup most weeks, green for those that win it
+    mapper = LinearColorMapper(palette=list(reversed(all_palettes['RdYlGn'][11])), low=0, high=1)
+
+    plot.rect('opponent', 'owner', width=1, height=1, source=all_play_source, line_color='white',
+              fill_color={'field': 'pct', 'transform': mapper})
+
+    plot.add_layout(ColorBar(color_mapper=mapper, location=(0, 0)), 'right')
 
     return plot
 
 
-def initialize_ew_figure(league, curr_week):
-    # todo docstring
+@session_stage('initialize_history_figure')
+def initialize_history_figure(history, history_source):
+    """Returns a figure of every owner's expected wins in each season of the league's history
+    :param history: structures.FranchiseHistory
+    :param history_source: ColumnDataSource from get_history_source()
+    :return: figure with a line per owner, which can be muted from the legend
+    """
 
-    ew_hover = HoverTool(tooltips=[
-        ('Week', '@x'),
+    hist_hover = HoverTool(tooltips=[
+        ('Season', '@x'),
         ('Owner', '@owner'),
-        ('Expected Wins', '@y{*0.000}'),
+        ('Expected Wins', '@y{0.000}'),
+        ('Wins', '@wins'),
+        ('Luck', '@luck{+0.000}'),
+        ('All-Time Expected Wins', '@cumul_ew{0.000}'),
     ])
 
-    # plotting wins and expected wins in the second tab
     plot = figure(plot_height=600, plot_width=1000,
-                  title='{} - {} Regular Season'.format(league.settings.name, year_input.value),
-                  x_axis_label='Week',
+                  title='{} - All-Time'.format(history.name),
+                  x_axis_label='Season',
                   y_axis_label='Expected Wins',
-                  tools=[ew_hover, ResetTool(), BoxZoomTool(), WheelZoomTool(), SaveTool(), PanTool()])
+                  tools=[hist_hover, ResetTool(), BoxZoomTool(), WheelZoomTool(), SaveTool(), PanTool()])
+
+    plot.xaxis.ticker = FixedTicker(ticks=history.years)
+
+    # more owners than the paired palette has colors once a league has changed hands a few times
+    palette = all_palettes['Category20'][20]
+    legend_items = []
+    owners = history_source.data['owner']
 
-    plot.xaxis.ticker = FixedTicker(ticks=[i for i in range(1, curr_week + 1)])
+    for idx, owner in enumerate(history.owners):
+        color = palette[idx % len(palette)]
+        view = CDSView(source=history_source,
+                       filters=[IndexFilter(indices=[i for i, o in enumerate(owners) if o == owner])])
+
+        l = plot.line('x', 'y', source=history_source, view=view, line_color=color, line_alpha=0.95,
+                      muted_color=color, muted_alpha=0.05, line_width=1.5)
+        c = plot.circle('x', 'y', size=6, source=history_source, view=view, fill_color=color, line_color=color,
+                        muted_color=color, muted_alpha=0.05)
+
+        legend_items.append(('{}  '.format(owner.split(' ')[0]), [l, c]))
+
+    plot.add_layout(Legend(items=legend_items, location=(0, 13), orientation='horizontal', click_policy='mute',
+                           border_line_alpha=0), 'above')
 
     return plot
 
 
-def initialize_ew_table(team_objects, week_number, number_teams):
-    # todo docstring
+@session_stage('initialize_history_table')
+def initialize_history_table(history):
+    """Returns a table of every owner's totals over the league's history
+    :param history: structures.FranchiseHistory
+    :return: DataTable, most all-time expected wins first
+    """
 
-    table_sources = get_table_sources(team_objects, week_number, number_teams)
+    expected_wins = history.cumul_expected_wins[:, -1]
+    wins = history.cumul_wins[:, -1]
+    ap_wins, ap_losses, ap_ties = [np.nansum(record, axis=-1).astype(int) for record in
+                                   (history.all_play_wins, history.all_play_losses, history.all_play_ties)]
+
+    # stable sort so owners with equal totals keep the order they joined in
+    order = np.argsort(-expected_wins, kind='mergesort')
+
+    data = dict(
+        owner=[history.owners[i] for i in order],
+        seasons=history.played.sum(axis=-1)[order].tolist(),
+        wins=wins[order].tolist(),
+        ew=np.round(expected_wins[order], 3).tolist(),
+        luck=np.round(wins[order] - expected_wins[order], 3).tolist(),
+        all_play=['{}-{}-{}'.format(ap_wins[i], ap_losses[i], ap_ties[i]) for i in order],
+        all_play_pct=((ap_wins + ap_ties / 2.0) / np.maximum(ap_wins + ap_losses + ap_ties, 1))[order].tolist()
+    )
 
     table_columns = [
-        TableColumn(field='rank', title='Rank'),
         TableColumn(field='owner', title='Owner'),
+        TableColumn(field='seasons', title='Seasons'),
         TableColumn(field='wins', title='Wins'),
         TableColumn(field='ew', title='Expected Wins'),
-        TableColumn(field='diff', title='Difference')
+        TableColumn(field='luck', title='Luck', formatter=NumberFormatter(format='+0.000')),
+        TableColumn(field='all_play', title='All-Play Record'),
+        TableColumn(field='all_play_pct', title='All-Play', formatter=NumberFormatter(format='0.0%'))
     ]
 
-    return DataTable(source=table_sources, columns=table_columns, width=600, height=500, sortable=True)
-
+    return DataTable(source=ColumnDataSource(data), columns=table_columns, width=1000, height=400,
+                     sortable=True)
 
-def get_sc_sources(all_weeks, team_objects, all_owners, curr_week, number_teams):
-    # todo docstring
-
-    # scores
-    # looks awful, but faster than using list.append() for each
-    sources = [ColumnDataSource(dict(
-        x=all_weeks,
-        y=team_objects[i].scores[:curr_week],
-        owner=[all_owners[i]] * len(all_weeks)
-    )) for i in range(number_teams)]
 
-    return sources
+def get_history_source(history):
+    """Returns one ColumnDataSource row per season each owner played, oldest first within each owner
+    :param history: structures.FranchiseHistory
+    :return: ColumnDataSource with x (season), y (expected wins), owner, wins, luck and cumul_ew columns
+    """
 
+    rows, cols = np.nonzero(history.played)
 
-def get_ew_sources(all_weeks, team_objects, all_owners, curr_week, number_teams):
-    # todo docstring
+    return ColumnDataSource(dict(
+        x=[history.years[col] for col in cols],
+        y=history.expected_wins[rows, cols].tolist(),
+        owner=[history.owners[row] for row in rows],
+        wins=history.wins[rows, cols].astype(int).tolist(),
+        luck=history.luck[rows, cols].tolist(),
+        cumul_ew=history.cumul_expected_wins[rows, cols].tolist()
+    ))
 
-    # expected wins
-    # looks awful, but faster than using list.append() for each
-    sources = [ColumnDataSource(dict(
-        x=all_weeks,
-        y=team_objects[i].exp_wins[1:curr_week + 1],
-        owner=[all_owners[i]] * len(all_weeks)
-    )) for i in range(number_teams)]
 
-    return sources
+@session_stage('get_all_play_source')
+def get_all_play_source(season):
+    """Returns one ColumnDataSource row per pair of different teams, with their head-to-head all-play results
+    :param season: structures.LeagueSeason
+    :return: ColumnDataSource; wins_cum / ties_cum hold running totals from week 0, so the browser can total
+    any week range without asking the server
+    """
 
+    wins, ties = head_to_head(season.scores)
+    teams = np.arange(season.number_teams)
 
-def get_table_sources(team_objects, curr_week, number_teams):
-    # todo docstring
+    rows, cols = np.nonzero(teams[:, None] != teams[None, :])
+    start = np.zeros((len(rows), 1), dtype=int)
 
-    teams_by_ew = sorted(team_objects, key=lambda x: x.exp_wins[curr_week], reverse=True)
-    owners_wins = {team.owner: team.wins for team in league_obj.teams}
+    wins_cum = np.concatenate([start, np.cumsum(wins[rows, cols], axis=-1)], axis=-1)
+    ties_cum = np.concatenate([start, np.cumsum(ties[rows, cols], axis=-1)], axis=-1)
 
-    rankings = [1] * number_teams
+    number_weeks = season.latest_week
+    total_wins = wins_cum[:, -1]
+    total_ties = ties_cum[:, -1]
 
-    rank = 1
-    for idx in range(number_teams):
+    return ColumnDataSource(dict(
+        owner=[season.owners[i] for i in rows],
+        opponent=[season.owners[j] for j in cols],
+        wins_cum=wins_cum.tolist(),
+        ties_cum=ties_cum.tolist(),
+        pct=((total_wins + total_ties / 2) / max(number_weeks, 1)).tolist(),
+        record=['{}-{}-{}'.format(w, number_weeks - w - t, t) for w, t in zip(total_wins, total_ties)]
+    ))
 
-        not_first_index = idx != 0
-        this_team_ew = round(teams_by_ew[idx].exp_wins[curr_week], 5)
-        prev_team_ew = round(teams_by_ew[idx - 1].exp_wins[curr_week], 5)
 
-        if not_first_index and this_team_ew < prev_team_ew:
-            rank = idx + 1
+@session_stage('show_league')
+def show_league(league_id, year):
+    """Starts loading a league-season off the server's IO loop; the page is rebuilt once it arrives
+    :param league_id: int or str
+    :param year: int or str
+    """
 
-        rankings[idx] = rank
+    global pending_load
 
-    sources = dict(
-        rank=[rankings[i] for i in range(number_teams)],
-        owner=[teams_by_ew[i].owner for i in range(number_teams)],
-        wins=[owners_wins[teams_by_ew[i].owner] for i in range(number_teams)],
-        ew=[round(teams_by_ew[i].exp_wins[curr_week], 3) for i in range(number_teams)],
-        diff=[round(owners_wins[teams_by_ew[i].owner] - teams_by_ew[i].exp_wins[curr_week], 3) for i in range(number_teams)]
-    )
+    # a newer request supersedes whatever this session is still loading
+    if pending_load is not None:
+        pending_load.set()
 
-    return ColumnDataSource(sources)
+    pending_load = None
 
+    # a season this process already has, e.g. one of the league's history, is shown right away
+    cached_season = league_cache.get(league_id, year)
 
-def plot_sc_data(team_objects, score_sources, colors):
-    # todo docstring
+    if cached_season is not None:
+        display_season(cached_season)
+        return
 
-    sc_rend_list = []
-    sc_legend_items = []
+    cancel = threading.Event()
+    pending_load = cancel
 
-    for idx, tm_obj in enumerate(team_objects):
-        first_name = tm_obj.owner.split(' ')[0]
+    lg_id_message.text = get_progress_message(league_id, year)
 
-        r = plot1.rect('x', 'y', source=score_sources[idx], width=.5, height=1.2, fill_color=colors[idx], fill_alpha=0.95,
-                       line_color=colors[idx], muted_color=colors[idx], muted_alpha=0.05, hover_alpha=1,
-                       hover_color=colors[idx], hover_line_alpha=1)
+    # runs on a loader thread; bokeh models may only be touched from the document's own callbacks
+    def progress(done, total):
+        doc.add_next_tick_callback(partial(update_progress, cancel, league_id, year, done, total))
 
-        l = plot1.line('x', 'y', source=score_sources[idx], line_color='black', line_alpha=0.08, line_dash='dashed',
-                       muted_color=colors[idx], muted_alpha=0.05, hover_color=colors[idx], hover_alpha=1)
+    future = load_in_background(league_id, year, progress=progress, cancel=cancel)
+    future.add_done_callback(lambda f: doc.add_next_tick_callback(partial(finish_load, cancel, league_id, year, f)))
 
-        sc_rend_list.append((r, l))
-        sc_legend_items.append(('{}  '.format(first_name), [r, l]))
 
-    plot1.legend.location = 'top_center'
-    plot1.legend.orientation = 'horizontal'
+def update_progress(cancel, league_id, year, done, total):
+    """Shows how far a load has got, unless a newer one has replaced it"""
 
-    sc_legend = Legend(items=sc_legend_items, location=(0, 13), orientation='horizontal')
+    if not cancel.is_set():
+        lg_id_message.text = get_progress_message(league_id, year, done, total)
 
-    plot1.add_layout(sc_legend, 'above')
-    plot1.legend.click_policy = 'mute'
-    plot1.legend.border_line_alpha = 0
 
-    return sc_rend_list
+@session_stage('finish_load')
+def finish_load(cancel, league_id, year, future):
+    """Shows a finished load, unless a newer one has replaced it
+    :param cancel: threading.Event belonging to the load
+    :param league_id: int or str
+    :param year: int or str
+    :param future: concurrent.futures.Future from league_cache.load_in_background()
+    """
 
+    global pending_load
 
-def plot_ew_data(team_objects, exp_wins_sources, colors):
-    # todo docstring
+    if cancel.is_set():
+        return
 
-    ew_rend_list = []
-    ew_legend_items = []
+    pending_load = None
 
-    for idx, tm_obj in enumerate(team_objects):
+    try:
+        new_season = future.result()
 
-        f_name = tm_obj.owner.split(' ')[0]
+    except LoadCancelled:
+        return
 
-        l = plot2.line('x', 'y', source=exp_wins_sources[idx], line_color=colors[idx], line_alpha=0.95,
-                       muted_color=colors[idx], muted_alpha=0.05, line_width=1.5)
+    except (PrivateLeagueException, InvalidLeagueException, UnknownLeagueException) as error:
+        lg_id_message.text = get_error_message(error, league_id, year)
+        return
 
-        x = plot2.square('x', 'y', size=4, source=exp_wins_sources[idx], fill_color=colors[idx], line_alpha=0.95,
-                         muted_color=colors[idx], muted_alpha=0.05, line_color=colors[idx], line_width=1.5)
+    # anything else, e.g. ESPN timing out, is reported the same way so the page can take the next request
+    except Exception as error:
+        logger.exception('Load of league {} ({}) failed'.format(league_id, year))
+        lg_id_message.text = get_error_message(error, league_id, year)
+        return
 
-        ew_rend_list.append((l, x))
-        ew_legend_items.append(('{}  '.format(f_name), [l, x]))
+    display_season(new_season)
 
-    plot2.legend.location = 'top_center'
-    plot2.legend.orientation = 'horizontal'
 
-    ew_legend = Legend(items=ew_legend_items, location=(0, 13), orientation='horizontal')
+@session_stage('display_season')
+def display_season(new_season):
+    """Rebuilds the figures, table and widgets around a league-season
+    :param new_season: structures.LeagueSeason
+    """
 
-    plot2.add_layout(ew_legend, 'above')
-    plot2.legend.click_policy = 'mute'
-    plot2.legend.border_line_alpha = 0
+    global season, plot1, plot2, line_colors
+    global sc_source, ew_source, sc_renderers, ew_renderers, all_play_source, table_source
 
-    return ew_rend_list
+    season = new_season
+    week_num = season.latest_week
 
+    plot1 = initialize_sc_figure(season)
+    plot2 = initialize_ew_figure(season)
 
-def compile_expected_wins(league, team_objects, all_weeks, ownr_to_idx, number_teams):
-    # todo docstring
+    line_colors = get_line_colors(season.number_teams)
 
-    # compile expected wins
-    for week in all_weeks:
+    sc_source = get_sc_source(season)
+    sc_renderers = plot_sc_data(plot1, season, sc_source, line_colors, week_filter)
 
-        all_scores = get_scores(league, week)
+    ew_source = get_ew_source(season)
+    ew_renderers = plot_ew_data(plot2, season, ew_source, line_colors, week_filter)
 
-        for i, (owner, score) in enumerate(all_scores):
+    all_play_source = get_all_play_source(season)
+    table_source = get_table_sources(season, 1, week_num)
 
-            tgt_team = team_objects[ownr_to_idx[owner]]
+    # slider moves re-filter and re-total the new sources in the browser
+    week_range_callback.args = week_range_args(season, sc_source, ew_source, table_source, week_slider,
+                                               week_select)
+    all_play_callback.args = dict(source=all_play_source, slider=week_slider)
 
-            # e.g., 12-team league, 2nd highest scorer would lose one matchup --> 1 - (1 * 1/11) = .909 expected wins
-            ew_this_week = 1 - (i * (1/(number_teams - 1)))
+    # force bokeh to update figures
+    plot1_wrap.children[0] = plot1
 
-            # determine new expected wins total and store
-            cumul_ew = tgt_team.exp_wins[week - 1]
-            new_cumul_ew = cumul_ew + ew_this_week
-            tgt_team.exp_wins.append(new_cumul_ew)
+    # notify user of success
+    lg_id_message.text = '<b><p style="color: green;">League accessed successfully.</p></b>'
 
+    plot2_wrap.children[0] = plot2
 
-def league_id_handler(attr, old, new):
-    # todo docstring
+    table_wrap.children[0] = initialize_ew_table(table_source)
 
-    global league_obj, num_teams, week_num, owners, owners_list, team_objs, weeks, owner_to_idx
-    global plot1, plot2, line_colors, backup_sc_data, backup_ew_data, legend_labels
-    global sc_sources, ew_sources, sc_renderers, ew_renderers
-    global layout
+    all_play_wrap.children[0] = initialize_all_play_figure(season, all_play_source)
 
-    league_obj, num_teams, week_num, owners, owners_list, team_objs, weeks, owner_to_idx = retrieve_lg_info(int(new), int(year_input.value))
+    # schedule luck is only worked out when asked for
+    luck_wrap.children[0] = Div(width=800, height=500)
+    luck_button.disabled = False
 
-    plot1 = initialize_sc_figure(league_obj, week_num)
-    plot2 = initialize_ew_figure(league_obj, week_num)
+    # a league's history covers every season of it, so only another league needs it cleared; that includes a
+    # history still loading, which switching season within the league mustn't cancel
+    if history_league_id is None or int(history_league_id) != int(season.league_id):
+        clear_history()
 
-    line_colors = get_line_colors(num_teams)
+    # the simulations take about a second, so they run off the IO loop and the tab fills in when they finish
+    odds_wrap.children[0] = Div(text='<b><p style="color: #fcbf16;">Simulating the rest of the season...</p></b>')
+    odds_future = run_in_background(get_playoff_odds, season)
+    odds_future.add_done_callback(lambda f: doc.add_next_tick_callback(partial(show_playoff_odds, new_season, f)))
 
-    sc_sources = get_sc_sources(weeks, team_objs, owners, week_num, num_teams)
-    sc_renderers = plot_sc_data(team_objs, sc_sources, line_colors)
+    # comparisons toggle muting on the new renderers in the browser
+    compare_callback.args = dict(sc_legend=plot1.legend[0], ew_legend=plot2.legend[0], teams_select=teams_select,
+                                 button=comp_button)
 
-    compile_expected_wins(league_obj, team_objs, weeks, owner_to_idx, num_teams)
+    teams_select.disabled = False
+    teams_select.value = []
+    teams_select.options = list(season.owners)
+    comp_button.disabled = False
+    comp_button.button_type = 'danger'
+    comp_button.label = 'Compare'
+    week_select.options = [str(week) for week in season.weeks]
 
-    ew_sources = get_ew_sources(weeks, team_objs, owners, week_num, num_teams)
-    ew_renderers = plot_ew_data(team_objs, ew_sources, line_colors)
+    # a slider can't run from week 1 to week 1, so until a second week is played it spans two and stays disabled
+    week_slider.end = max(2, week_num)
+    week_slider.value = (1, max(1, week_num))
+    week_select.value = str(week_num)
+    week_slider.disabled = week_num < 2
 
-    # force bokeh to update figures
-    plot1_wrap.children[0] = plot1
 
-    # notify user of success
-    lg_id_message.text = '<b><p style="color: green;">League accessed successfully.</p></b>'
+@session_stage('show_playoff_odds')
+def show_playoff_odds(odds_season, future):
+    """Fills in the Playoff Odds tab once its simulations finish, unless another league is shown by then
+    :param odds_season: structures.LeagueSeason the odds were simulated for
+    :param future: concurrent.futures.Future from league_cache.run_in_background()
+    """
 
-    plot2_wrap.children[0] = plot2
+    if odds_season is not season:
+        return
 
-    table_wrap.children[0] = initialize_ew_table(team_objs, week_num, num_teams)
+    try:
+        odds = future.result()
 
-    # will use to avoid re-computation of data after comparisons
-    backup_sc_data = [[[], []] for _ in range(num_teams)]
-    backup_ew_data = [[[], []] for _ in range(num_teams)]
-    legend_labels = ['' for _ in range(num_teams)]
+    except Exception:
+        logger.exception('Playoff odds of league {} ({}) failed'.format(season.league_id, season.year))
+        odds_wrap.children[0] = Div(text='<b><p style="color: red;">Could not simulate the rest of the season.</p></b>')
+        return
 
-    team1_dd.disabled = False
-    team2_dd.disabled = False
-    team1_dd.label = 'Team 1 - Select'
-    team2_dd.label = 'Team 2 - Select'
-    team1_dd.menu = owners_list
-    team2_dd.menu = owners_list
-    comp_button.button_type = 'danger'
-    week_slider.end = week_num
-    week_slider.value = (1, week_num)
+    odds_wrap.children[0] = initialize_odds_table(season, odds)
 
 
-def week_slider_handler(attr, old, new):
-    # todo docstring
+@session_stage('show_schedule_luck')
+def show_schedule_luck(luck_season, future):
+    """Fills in the Schedule Luck tab once its schedules are evaluated, unless another league is shown by then
+    :param luck_season: structures.LeagueSeason the schedules were sampled for
+    :param future: concurrent.futures.Future from league_cache.run_in_background()
+    """
 
-    start_wk, end_wk = week_slider.value
+    if luck_season is not season:
+        return
 
-    # don't attempt to filter teams unless two teams are selected
-    if comp_button.button_type == 'warning':
-        selected_tm_idxs = [owner_to_idx[str(team1_dd.label)], owner_to_idx[str(team2_dd.label)]]
-    else:
-        selected_tm_idxs = [i for i in range(num_teams)]
+    # the button comes back either way, so a failed run can be tried again
+    luck_button.disabled = False
 
-    # values passed from widget are sometimes floats (e.g. 10.0000000002)
-    start_wk = round(start_wk)
-    end_wk = round(end_wk)
+    try:
+        luck = future.result()
 
-    for i in range(len(sc_renderers)):
+    except Exception:
+        logger.exception('Schedule luck of league {} ({}) failed'.format(season.league_id, season.year))
+        luck_wrap.children[0] = Div(text='<b><p style="color: red;">Could not replay the other schedules.</p></b>')
+        return
 
-        if i in selected_tm_idxs:
+    luck_wrap.children[0] = initialize_luck_table(season, luck)
 
-            selected_wks = weeks[start_wk - 1: end_wk]
-            selected_scores = team_objs[i].scores[start_wk - 1:end_wk]
-            selected_ew = team_objs[i].exp_wins[start_wk:end_wk + 1]
-            owner = [owners[i]] * (end_wk - start_wk + 1)
 
-            rect_r, sc_line_r = sc_renderers[i]
-            ew_line_r, x_r = ew_renderers[i]
+@session_stage('luck_handler')
+def luck_handler():
+    """Samples alternative schedules for the league on show, off the IO loop"""
 
-            rect_r.data_source.data = dict(x=selected_wks, y=selected_scores, owner=owner)
-            sc_line_r.data_source.data = dict(x=selected_wks, y=selected_scores, owner=owner)
-            ew_line_r.data_source.data = dict(x=selected_wks, y=selected_ew, owner=owner)
-            x_r.data_source.data = dict(x=selected_wks, y=selected_ew, owner=owner)
+    if season is None:
+        return
 
+    luck_button.disabled = True
+    luck_wrap.children[0] = Div(text='<b><p style="color: #fcbf16;">Replaying scores against other '
+                                     'schedules...</p></b>')
 
-def team1_select_handler(attr, old, new):
-    # todo docstring
+    luck_season = season
+    future = run_in_background(get_schedule_luck, luck_season)
+    future.add_done_callback(lambda f: doc.add_next_tick_callback(partial(show_schedule_luck, luck_season, f)))
 
-    team1_dd.label = str(team1_dd.value)
 
-    if 'Select' not in team1_dd.label and 'Select' not in team2_dd.label and comp_button.button_type == 'danger':
-        comp_button.button_type = 'success'
+def clear_history():
+    """Empties the All-Time tab and drops any history still loading"""
 
+    global history, pending_history, history_league_id
 
-def team2_select_handler(attr, old, new):
-    # todo docstring
+    if pending_history is not None:
+        pending_history.set()
 
-    team2_dd.label = str(team2_dd.value)
+    history = pending_history = history_league_id = None
+    history_wrap.children[0] = Div(width=1000, height=600)
+    history_button.disabled = False
 
-    if 'Select' not in team1_dd.label and 'Select' not in team2_dd.label and comp_button.button_type == 'danger':
-        comp_button.button_type = 'success'
 
+@session_stage('history_handler')
+def history_handler():
+    """Starts loading every season of the league on show at once; the All-Time tab fills in once they arrive"""
 
-def compare_button_handler():
-    # todo docstring
+    global pending_history, history_league_id
 
-    global sc_renderers
-    global ew_renderers
+    if season is None:
+        return
 
-    team1_dd.disabled = True
-    team2_dd.disabled = True
+    cancel = threading.Event()
+    pending_history = cancel
+    league_id = history_league_id = season.league_id
 
-    selected_tm_idxs = [owner_to_idx[str(team1_dd.label)], owner_to_idx[str(team2_dd.label)]]
+    history_button.disabled = True
+    history_wrap.children[0] = Div(text=get_history_message(0, None))
 
-    num_rend = len(sc_renderers)
+    # runs on a loader thread, like a single season's progress
+    def progress(done, total):
+        doc.add_next_tick_callback(partial(update_history_progress, cancel, done, total))
 
-    for i in range(num_rend):
+    future = load_history_in_background(league_id, history_years(current_season()), progress=progress,
+                                        cancel=cancel)
+    future.add_done_callback(lambda f: doc.add_next_tick_callback(partial(show_history, cancel, league_id, f)))
 
-        if i not in selected_tm_idxs:
 
-            for j in range(2):
+def get_history_message(done, total):
+    """Returns the message shown while a league's seasons are loading
+    :param done: int, seasons finished so far
+    :param total: int, seasons looked for; None before any has finished
+    :return: string, html for the All-Time tab
+    """
 
-                # save data to restore when comparison done
-                backup_sc_data[i][j] = sc_renderers[i][j].data_source.data
-                backup_ew_data[i][j] = ew_renderers[i][j].data_source.data
+    message = 'Loading every season of the league'
 
-                # empty data fields hide glyphs from the plot
-                sc_renderers[i][j].data_source.data = dict(x=[], y=[], owner=[])
-                ew_renderers[i][j].data_source.data = dict(x=[], y=[], owner=[])
+    if total:
+        message += ' ({} of {})'.format(done, total)
 
-            # save label for recovery after comparison
-            legend_labels[i] = plot1.legend[0].items[i].label
+    return '<b><p style="color: #fcbf16;">{}...</p></b>'.format(message)
 
-            # empty labels for legend items hide entries
-            plot1.legend[0].items[i].label = None
-            plot2.legend[0].items[i].label = None
 
-    comp_button.button_type = 'warning'
-    comp_button.label = 'Clear'
+def update_history_progress(cancel, done, total):
+    """Shows how many seasons have loaded, unless the history has been dropped since"""
 
+    if not cancel.is_set():
+        history_wrap.children[0] = Div(text=get_history_message(done, total))
 
-def clear_button_handler():
-    # todo docstring
 
-    global sc_renderers
-    global ew_renderers
+@session_stage('show_history')
+def show_history(cancel, league_id, future):
+    """Fills in the All-Time tab once every season has loaded, unless the history has been dropped since
+    :param cancel: threading.Event belonging to the history's load
+    :param league_id: int or str
+    :param future: concurrent.futures.Future from league_cache.load_history_in_background()
+    """
 
-    selected_tm_idxs = [owner_to_idx[str(team1_dd.label)], owner_to_idx[str(team2_dd.label)]]
+    global history, pending_history
 
-    num_rend = len(sc_renderers)
+    if cancel.is_set():
+        return
 
-    for i in range(num_rend):
+    pending_history = None
 
-        if i not in selected_tm_idxs:
+    try:
+        new_history = FranchiseHistory(league_id, future.result())
 
-            for j in range(2):
+    except LoadCancelled:
+        return
 
-                # recover scores, expected wins data
-                sc_renderers[i][j].data_source.data = backup_sc_data[i][j]
-                ew_renderers[i][j].data_source.data = backup_ew_data[i][j]
+    except (PrivateLeagueException, InvalidLeagueException, UnknownLeagueException) as error:
+        history_wrap.children[0] = Div(text=get_error_message(error, league_id, ''))
+        history_button.disabled = False
+        return
 
-            # recover label from before comparison
-            plot1.legend[0].items[i].label = legend_labels[i]
-            plot2.legend[0].items[i].label = legend_labels[i]
+    except Exception as error:
+        logger.exception('History of league {} failed'.format(league_id))
+        history_wrap.children[0] = Div(text=get_error_message(error, league_id, ''))
+        history_button.disabled = False
+        return
 
-    # layout displays non-comparison state again
-    team1_dd.label = 'Team 1 - Select'
-    team2_dd.label = 'Team 2 - Select'
-    comp_button.button_type = 'danger'
-    comp_button.label = 'Compare'
+    if not new_history.seasons:
+        history_wrap.children[0] = Div(text='<b><p style="color: red;">No seasons found for league with id '
+                                            '{}.</p></b>'.format(league_id))
+        history_button.disabled = False
+        return
 
-    # force redraw using weeks slider
-    user_selection = week_slider.value
-    week_slider.value = (user_selection[0] + 1, user_selection[1])
-    week_slider.value = user_selection
+    history = new_history
 
-    team1_dd.disabled = False
-    team2_dd.disabled = False
+    history_wrap.children[0] = column(initialize_history_figure(history, get_history_source(history)),
+                                      initialize_history_table(history))
 
 
-def helper_handler():
+@session_stage('league_id_handler')
+def league_id_handler(attr, old, new):
     # todo docstring
 
-    # for dual functionality of compare / clear button
-    button_to_handler = {
-        'success': compare_button_handler,
-        'warning': clear_button_handler
-    }
-
-    if comp_button.button_type in ['success', 'warning']:
-        button_to_handler[comp_button.button_type]()
+    show_league(int(new), int(year_input.value))
 
 
+@session_stage('season_handler')
 def season_handler(attr, old, new):
     # todo docstring
 
-    global league_obj, num_teams, week_num, owners, owners_list, team_objs, weeks, owner_to_idx
-    global plot1, plot2, line_colors, backup_sc_data, backup_ew_data, legend_labels
-    global sc_sources, ew_sources, sc_renderers, ew_renderers
-    global layout
-
-    league_id = lg_id_input.value
-
-    league_obj, num_teams, week_num, owners, owners_list, team_objs, weeks, owner_to_idx = retrieve_lg_info(league_id, int(new))
-
-    plot1 = initialize_sc_figure(league_obj, week_num)
-    plot2 = initialize_ew_figure(league_obj, week_num)
+    show_league(lg_id_input.value, int(new))
 
-    line_colors = get_line_colors(num_teams)
 
-    sc_sources = get_sc_sources(weeks, team_objs, owners, week_num, num_teams)
-    sc_renderers = plot_sc_data(team_objs, sc_sources, line_colors)
+def release_session():
+    """Stops this session's background work and lets go of everything it built, once its page is closed
 
-    compile_expected_wins(league_obj, team_objs, weeks, owner_to_idx, num_teams)
-
-    ew_sources = get_ew_sources(weeks, team_objs, owners, week_num, num_teams)
-    ew_renderers = plot_ew_data(team_objs, ew_sources, line_colors)
-
-    # force bokeh to update figures
-    plot1_wrap.children[0] = plot1
-
-    # notify user of success
-    lg_id_message.text = '<b><p style="color: green;">League accessed successfully.</p></b>'
+    League-seasons are shared with other sessions through the cache, so dropping them here only frees the
+    ones no other session or cache entry still holds.
+    """
 
-    plot2_wrap.children[0] = plot2
+    global season, history, history_league_id, pending_load, pending_history, plot1, plot2, line_colors
+    global sc_source, ew_source, sc_renderers, ew_renderers, all_play_source, table_source
 
-    ew_table = initialize_ew_table(team_objs, week_num, num_teams)
+    # loads and simulations still running give up, or are ignored once they finish
+    for cancel in (pending_load, pending_history):
+        if cancel is not None:
+            cancel.set()
 
-    table_wrap.children[0] = ew_table
+    season = history = history_league_id = pending_load = pending_history = None
+    plot1 = plot2 = line_colors = None
+    sc_source = ew_source = sc_renderers = ew_renderers = all_play_source = table_source = None
 
-    # will use to avoid re-computation of data after comparisons
-    backup_sc_data = [[[], []] for _ in range(num_teams)]
-    backup_ew_data = [[[], []] for _ in range(num_teams)]
-    legend_labels = ['' for _ in range(num_teams)]
+    for callback in (week_range_callback, all_play_callback, compare_callback):
+        callback.args = {}
 
-    team1_dd.disabled = False
-    team2_dd.disabled = False
-    team1_dd.label = 'Team 1 - Select'
-    team2_dd.label = 'Team 2 - Select'
-    team1_dd.menu = owners_list
-    team2_dd.menu = owners_list
-    comp_button.button_type = 'danger'
-    week_slider.end = week_num
-    week_slider.value = (1, week_num)
+    doc.clear()
 
 # TODO add Google Analytics Script here
 ga_view_callback = CustomJS(code='''
@@ -570,77 +694,146 @@ ga_view_callback = CustomJS(code='''
 # TODO use callback somewhere
 
 
+# handlers hand work to other threads, which must reach this session's document explicitly
+doc = curdoc()
+
+# set when the page was opened with ?profile=1 and the server has FFL_PROFILE_DIR set
+session_profile = get_session_profile(doc.session_context)
+
+# cancellation event of the league load this session is waiting on, if any
+pending_load = None
+
+# every season of the league on show, once the All-Time tab has loaded them, and the event cancelling that load
+history = None
+pending_history = None
+
+# league the All-Time tab shows or is loading, if any
+history_league_id = None
+
 lg_id_input = TextInput(value='1667721', title='League ID (from URL):')
 
-lg_id_message = Div(text='<b><p style="color: green;">League accessed successfully.</p></b>')
+lg_id_message = Div(text='')
 
-september_month = 9
-today = datetime.today()
+default_yr = str(current_season())
 
-if today.month < september_month:
-    default_yr = str(today.year - 1)
-else:
-    default_yr = str(today.year)
+# the page is sent straight away with empty placeholders; display_season() fills them once the league is loaded
+season = None
 
-league_obj, num_teams, week_num, owners, owners_list, team_objs, weeks, owner_to_idx = retrieve_lg_info(int(lg_id_input.value), default_yr)
+teams_select = MultiSelect(title='Teams to Compare:', options=[], size=6, disabled=True)
+comp_button = Button(label='Compare', button_type='danger', disabled=True)
 
-team1_dd = Dropdown(label='Team 1 - Select', menu=owners_list)
-team2_dd = Dropdown(label='Team 2 - Select', menu=owners_list)
-comp_button = Button(label='Compare', button_type='danger')
+# compare / clear mutes every non-selected team entirely in the browser, for any number of teams
+compare_callback = CustomJS(code='''
+    var comparing = button.label == 'Clear';
+    var selected = teams_select.value;
+    var legends = [sc_legend, ew_legend];
 
-week_slider = RangeSlider(title='Weeks', start=1, end=week_num, value=(1, week_num), step=1)
-year_input = TextInput(value=str(default_yr), title='Season:')
+    if (!comparing && selected.length < 2) {
+        return;
+    }
 
-plot1 = initialize_sc_figure(league_obj, week_num)
-plot2 = initialize_ew_figure(league_obj, week_num)
+    // legend items are in the same order as the select options
+    for (var l = 0; l < legends.length; l++) {
+        var items = legends[l].items;
 
-plot1_wrap = column(children=[plot1])
-plot2_wrap = column(children=[plot2])
+        for (var i = 0; i < items.length; i++) {
+            var mute = !comparing && selected.indexOf(teams_select.options[i]) < 0;
 
-line_colors = get_line_colors(num_teams)
+            for (var j = 0; j < items[i].renderers.length; j++) {
+                items[i].renderers[j].muted = mute;
+            }
+        }
+    }
 
-sc_sources = get_sc_sources(weeks, team_objs, owners, week_num, num_teams)
+    teams_select.disabled = !comparing;
+    button.label = comparing ? 'Compare' : 'Clear';
+    button.button_type = comparing ? (selected.length < 2 ? 'danger' : 'success') : 'warning';
+''')
+
+# enable comparing once at least two teams are picked
+teams_select_callback = CustomJS(args=dict(button=comp_button), code='''
+    if (button.label == 'Compare') {
+        button.button_type = cb_obj.value.length < 2 ? 'danger' : 'success';
+    }
+''')
 
-# will use to avoid re-computation of data after comparisons
-backup_sc_data = [[[], []] for _ in range(num_teams)]
-backup_ew_data = [[[], []] for _ in range(num_teams)]
-legend_labels = ['' for _ in range(num_teams)]
+# the slider can't have start == end, so it starts out spanning two weeks until a league arrives
+week_slider = RangeSlider(title='Weeks', start=1, end=2, value=(1, 2), step=1, disabled=True)
+
+# week range filtering and the Summary table for the selected weeks run in the browser
+week_filter = make_week_filter(week_slider)
+week_range_callback = make_week_range_callback()
+
+# the Summary tab's week picker moves the end of the slider's window, which redraws the table
+week_select = Select(title='Standings After Week:', options=[], value='')
+week_select_callback = make_week_select_callback(week_slider)
+# all-play records over the selected weeks are totalled in the browser from running totals
+all_play_callback = CustomJS(code='''
+    var start_wk = Math.round(slider.value[0]);
+    var end_wk = Math.round(slider.value[1]);
+    var number_weeks = end_wk - start_wk + 1;
+    var data = source.data;
+
+    for (var i = 0; i < data['owner'].length; i++) {
+        var wins = data['wins_cum'][i][end_wk] - data['wins_cum'][i][start_wk - 1];
+        var ties = data['ties_cum'][i][end_wk] - data['ties_cum'][i][start_wk - 1];
+
+        data['pct'][i] = (wins + ties / 2) / number_weeks;
+        data['record'][i] = wins + '-' + (number_weeks - wins - ties) + '-' + ties;
+    }
 
-sc_renderers = plot_sc_data(team_objs, sc_sources, line_colors)
+    source.change.emit();
+''')
+year_input = TextInput(value=str(default_yr), title='Season:')
 
-compile_expected_wins(league_obj, team_objs, weeks, owner_to_idx, num_teams)
+plot1 = plot2 = None
+line_colors = None
+sc_source = ew_source = None
+sc_renderers = ew_renderers = None
+all_play_source = None
+table_source = None
 
-ew_sources = get_ew_sources(weeks, team_objs, owners, week_num, num_teams)
+plot1_wrap = column(children=[Div(width=1000, height=600)])
+plot2_wrap = column(children=[Div(width=1000, height=600)])
+table_wrap = column(children=[Div(width=600, height=500)])
+odds_wrap = column(children=[Div(width=1000, height=500)])
+all_play_wrap = column(children=[Div(width=1000, height=600)])
 
-expected_wins_table = initialize_ew_table(team_objs, week_num, num_teams)
-table_wrap = column(children=[expected_wins_table])
+luck_button = Button(label='Replay Against Other Schedules', button_type='primary', width=300, disabled=True)
+luck_wrap = column(children=[Div(width=800, height=500)])
 
-ew_renderers = plot_ew_data(team_objs, ew_sources, line_colors)
+history_button = Button(label='Load All Seasons', button_type='primary', width=300, disabled=True)
+history_wrap = column(children=[Div(width=1000, height=600)])
 
 # register callback handlers to respond to changes in widget values
 lg_id_input.on_change('value', league_id_handler)
 lg_id_input.js_on_change('value', ga_view_callback)
-week_slider.on_change('value', week_slider_handler)
-team1_dd.on_change('value', team1_select_handler)
-team2_dd.on_change('value', team2_select_handler)
-comp_button.on_click(helper_handler)
+week_slider.js_on_change('value', week_range_callback)
+week_slider.js_on_change('value', all_play_callback)
+week_select.js_on_change('value', week_select_callback)
+teams_select.js_on_change('value', teams_select_callback)
+comp_button.js_on_click(compare_callback)
 year_input.on_change('value', season_handler)
+luck_button.on_click(luck_handler)
+history_button.on_click(history_handler)
 
 # arrange layout
 tab1 = Panel(child=plot1_wrap, title='Scores')
 tab2 = Panel(child=plot2_wrap, title='Expected Wins')
-tab3 = Panel(child=table_wrap, title='Summary')
+tab3 = Panel(child=column(week_select, table_wrap), title='Summary')
+tab4 = Panel(child=odds_wrap, title='Playoff Odds')
+tab5 = Panel(child=all_play_wrap, title='All-Play')
+tab6 = Panel(child=column(luck_button, luck_wrap), title='Schedule Luck')
+tab7 = Panel(child=column(history_button, history_wrap), title='All-Time')
 
-figures = Tabs(tabs=[tab1, tab2, tab3], width=500)
+figures = Tabs(tabs=[tab1, tab2, tab3, tab4, tab5, tab6, tab7], width=500)
 
-compare_widgets = column(team1_dd, team2_dd, comp_button)
+compare_widgets = column(teams_select, comp_button)
 
 wid_spac1 = Spacer(height=30)
 wid_spac2 = Spacer(height=30)
 wid_spac3 = Spacer(height=30)
 
-lg_id_message.text = '<b><p style="color: green;">League accessed successfully.</p></b>'
-
 all_widgets = column(lg_id_input, lg_id_message, wid_spac1, compare_widgets, wid_spac2, week_slider, wid_spac3, year_input)
 
 page_title = Div(text="""<strong><h1 style="font-size: 2.5em;">ESPN Fantasy Football League Explorer</h1></strong>""",
@@ -650,5 +843,11 @@ main_area = row(all_widgets, figures)
 
 layout = column(page_title, main_area)
 
-curdoc().add_root(layout)
-curdoc().title = 'ESPN Fantasy Football League Explorer'
+doc.add_root(layout)
+doc.title = 'ESPN Fantasy Football League Explorer'
+
+# the server calls release_session() once this page is closed
+register_session(doc, release_session)
+
+# a league another session already loaded is shown right away; otherwise it arrives after the first paint
+show_league(int(lg_id_input.value), default_yr)
@@ -0,0 +1,465 @@
+import os
+import logging
+import threading
+import time
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from espnff import UnknownLeagueException
+from league_data import LoadCancelled, current_season, load_league_season
+from metrics import registry, resident_bytes, timed
+from shared_cache import default_shared_cache
+
+
+# bokeh re-runs explore.py for every session, but imported modules are loaded once per process,
+# so anything kept here is shared by all sessions on this process
+CACHE_MAX_LEAGUES = int(os.environ.get('FFL_CACHE_MAX_LEAGUES', 32))
+
+# seconds before an in-progress season is fetched again
+CACHE_LIVE_TTL = int(os.environ.get('FFL_CACHE_LIVE_TTL', 300))
+
+# league loads run off the server's IO loop on this many threads, shared by all sessions
+LOAD_WORKERS = int(os.environ.get('FFL_LOAD_WORKERS', 4))
+
+# an All-Time load asks for many seasons at once, so it gets threads of its own rather than queueing every
+# session's single-season loads behind it
+HISTORY_LOAD_WORKERS = int(os.environ.get('FFL_HISTORY_LOAD_WORKERS', 2))
+
+# resident memory, in MB, past which each process evicts cached league-seasons; 0 for no limit
+MEMORY_BUDGET_MB = int(os.environ.get('FFL_MEMORY_BUDGET_MB', 0))
+
+# share of the memory budget the cached league-seasons are cut back to once the process is over it; the rest is
+# the interpreter, bokeh documents and session state, which evicting leagues can't free
+CACHE_MEMORY_SHARE = float(os.environ.get('FFL_CACHE_MEMORY_SHARE', 0.25))
+
+# how often a request waiting on another's load checks whether it has been cancelled itself
+WAIT_POLL_INTERVAL = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One load in progress, shared by every request for the same league-season"""
+
+    def __init__(self):
+        self.future = Future()
+        self.listeners = []
+        self.last_progress = None
+
+    def progress(self, done, total):
+        self.last_progress = (done, total)
+
+        for listener in list(self.listeners):
+            listener(done, total)
+
+
+class LeagueCache:
+    """LRU cache of compiled league-seasons keyed by (league_id, year)
+
+    Completed seasons never expire; seasons still in progress expire after live_ttl seconds so the
+    current week gets refreshed. Concurrent misses for the same league-season share a single load.
+
+    With a shared cache, a miss first looks for a copy compiled by another server process, and anything
+    loaded here is published for the others.
+
+    With a memory budget, least recently used league-seasons are also evicted whenever the process grows
+    past it, until the cache holds no more than its share of the budget. Sessions showing an evicted season
+    keep their reference to it; it is only freed once they let go.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_LEAGUES, live_ttl=CACHE_LIVE_TTL, shared=None,
+                 memory_budget=MEMORY_BUDGET_MB * 1024 * 1024):
+        """
+        :param max_size: int, league-seasons kept in this process
+        :param live_ttl: int, seconds an in-progress season is kept
+        :param shared: object with get_entry(league_id, year), put(league_id, year, data, expires) and
+        invalidate(league_id, year), as shared_cache.SharedLeagueCache or shared_cache.InProcessSharedCache;
+        None to keep loads to this process
+        :param memory_budget: int, resident bytes of the process past which entries are evicted; 0 for none
+        """
+
+        self.max_size = max_size
+        self.live_ttl = live_ttl
+        self.shared = shared
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.misses = 0
+
+        # entries dropped to get back under the memory budget
+        self.budget_evictions = 0
+
+        # misses answered by another process's copy in the shared cache
+        self.shared_hits = 0
+
+        # misses that waited on a load another request had already started
+        self.coalesced = 0
+
+        # (league_id, year) -> (data, expiry time or None), least recently used first
+        self._entries = OrderedDict()
+
+        # (league_id, year) -> _Flight for loads still running
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(league_id, year):
+        # widget values arrive as strings
+        return int(league_id), int(year)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+    def in_flight(self):
+        """Returns the number of league-seasons currently being loaded"""
+
+        return len(self._in_flight)
+
+    def _lookup(self, key):
+        # caller holds the lock
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        data, expires = entry
+
+        if expires is not None and expires <= time.time():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return data
+
+    def get(self, league_id, year):
+        """Returns the cached data for a league-season, or None if absent or expired"""
+
+        with self._lock:
+            return self._lookup(self._key(league_id, year))
+
+    def _expiry(self, data):
+        return None if data.complete else time.time() + self.live_ttl
+
+    def put(self, league_id, year, data, expires=None):
+        """Stores data for a league-season, evicting the least recently used entries past max_size
+        :param expires: time.time() when the entry goes stale; defaults to live_ttl from now for a season in progress
+        """
+
+        key = self._key(league_id, year)
+        expires = expires or self._expiry(data)
+
+        with self._lock:
+            self._entries[key] = (data, expires)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        self.enforce_memory_budget()
+
+    def nbytes(self):
+        """Returns the memory held by the cached league-seasons, as counted by LeagueSeason.nbytes"""
+
+        with self._lock:
+            return sum(data.nbytes for data, _ in self._entries.values())
+
+    def enforce_memory_budget(self, resident=None):
+        """Evicts least recently used entries while the process is over its memory budget
+
+        Most of a process's memory isn't the cache's to free, so rather than chasing the whole excess, entries
+        are dropped until the cache's own memory is within CACHE_MEMORY_SHARE of the budget. Seasons mapped
+        from the shared cache are left in place, since evicting them frees nothing.
+
+        :param resident: int, resident bytes of the process; measured if not given
+        :return: int, number of entries evicted
+        """
+
+        if not self.memory_budget:
+            return 0
+
+        resident = resident_bytes() if resident is None else resident
+
+        if resident is None or resident <= self.memory_budget:
+            return 0
+
+        target = int(self.memory_budget * CACHE_MEMORY_SHARE)
+        freed = evicted = 0
+
+        with self._lock:
+            held = sum(data.nbytes for data, _ in self._entries.values())
+
+            # the most recently used season is kept; it's usually the one just loaded for a session
+            for key in list(self._entries)[:-1]:
+                if held - freed <= target:
+                    break
+
+                data = self._entries[key][0]
+
+                if not data.nbytes:
+                    continue
+
+                del self._entries[key]
+                freed += data.nbytes
+                evicted += 1
+
+            self.budget_evictions += evicted
+
+        if evicted:
+            logger.info('Evicted {} league-seasons ({} bytes) to get back under the memory budget'.format(evicted,
+                                                                                                      freed))
+
+        return evicted
+
+    def get_or_load(self, league_id, year, loader=load_league_season, progress=None, cancel=None, **loader_kwargs):
+        """Returns the cached data for a league-season, loading and storing it on a miss
+
+        If the same league-season is already being loaded, waits for that load and shares its result (or
+        exception) instead of starting another one.
+
+        :param league_id: int or str
+        :param year: int or str
+        :param loader: callable(league_id, year, progress=, cancel=, **loader_kwargs), builds the data to cache;
+        exceptions are not cached
+        :param progress: callable(done, total), optional; receives progress of whichever load is serving this request
+        :param cancel: threading.Event, optional; set it to stop waiting. A shared load is only abandoned when
+        the request that started it is cancelled, and the requests still waiting then take it over
+        :param loader_kwargs: passed through to the loader on a miss
+        :return: the cached data
+        """
+
+        key = self._key(league_id, year)
+
+        while True:
+            with self._lock:
+                data = self._lookup(key)
+
+                if data is not None:
+                    self.hits += 1
+                    return data
+
+                flight = self._in_flight.get(key)
+                leader = flight is None
+
+                if leader:
+                    flight = self._in_flight[key] = _Flight()
+                    self.misses += 1
+
+                else:
+                    self.coalesced += 1
+
+                if progress is not None:
+                    flight.listeners.append(progress)
+
+            if leader:
+                return self._run_flight(key, flight, loader, cancel, loader_kwargs)
+
+            try:
+                # catch up on progress made before this request joined
+                if progress is not None and flight.last_progress is not None:
+                    progress(*flight.last_progress)
+
+                while True:
+                    try:
+                        return flight.future.result(timeout=WAIT_POLL_INTERVAL)
+
+                    except TimeoutError:
+                        if cancel is not None and cancel.is_set():
+                            raise LoadCancelled()
+
+                    except LoadCancelled:
+                        if cancel is not None and cancel.is_set():
+                            raise
+
+                        # the request that started the load gave up; go round again to start it anew, or to join
+                        # whichever waiting request got there first
+                        break
+
+            finally:
+                if progress is not None:
+                    flight.listeners.remove(progress)
+
+    def _run_flight(self, key, flight, loader, cancel, loader_kwargs):
+        # runs the load for every request waiting on the flight, then hands them its outcome
+        try:
+            data = expires = None
+
+            # a copy from another process keeps the expiry it was published with, rather than a fresh one from now
+            if self.shared is not None:
+                with timed('shared_cache_read'):
+                    data, expires = self.shared.get_entry(*key)
+
+            if data is not None:
+                self.shared_hits += 1
+
+            else:
+                data = loader(*key, progress=flight.progress, cancel=cancel, **loader_kwargs)
+                self._publish(key, data)
+
+            self.put(*key, data=data, expires=expires)
+
+        # whatever fails, the flight is ended and its waiters get the outcome, or they would wait on it forever
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+
+            flight.future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+
+        flight.future.set_result(data)
+
+        return data
+
+    def _publish(self, key, data):
+        if self.shared is None:
+            return
+
+        try:
+            with timed('shared_cache_write'):
+                self.shared.put(*key, data, expires=self._expiry(data))
+
+        # the load itself succeeded; other processes will just fetch it themselves
+        except OSError:
+            logger.exception('Could not share league {} ({})'.format(*key))
+
+    def collect_metrics(self):
+        """Returns this cache's counters as samples for metrics.MetricsRegistry.register_collector()"""
+
+        return [
+            ('ffl_league_cache_hits_total', 'counter', 'League-seasons served from this process', self.hits),
+            ('ffl_league_cache_misses_total', 'counter', 'League-seasons this process had to look for', self.misses),
+            ('ffl_league_cache_shared_hits_total', 'counter', 'Misses answered by another process', self.shared_hits),
+            ('ffl_league_cache_coalesced_total', 'counter', 'Misses that joined a load already running',
+             self.coalesced),
+            ('ffl_league_cache_entries', 'gauge', 'League-seasons cached in this process', len(self)),
+            ('ffl_league_cache_loads_in_flight', 'gauge', 'League-seasons being loaded', self.in_flight()),
+            ('ffl_league_cache_bytes', 'gauge', 'Memory held by cached league-seasons', self.nbytes()),
+            ('ffl_league_cache_budget_evictions_total', 'counter', 'League-seasons evicted for the memory budget',
+             self.budget_evictions),
+            ('ffl_memory_budget_bytes', 'gauge', 'Resident memory past which leagues are evicted, 0 for none',
+             self.memory_budget),
+        ]
+
+    def invalidate(self, league_id, year):
+        with self._lock:
+            self._entries.pop(self._key(league_id, year), None)
+
+        if self.shared is not None:
+            self.shared.invalidate(league_id, year)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# the process-wide cache used by every session, backed by the cache shared with the other server processes
+league_cache = LeagueCache(shared=default_shared_cache())
+registry.register_collector(league_cache.collect_metrics)
+
+_load_executor = ThreadPoolExecutor(max_workers=LOAD_WORKERS)
+_history_executor = ThreadPoolExecutor(max_workers=HISTORY_LOAD_WORKERS)
+
+
+def load_in_background(league_id, year, progress=None, cancel=None):
+    """Starts getting a league-season from the cache on a worker thread
+    :param league_id: int or str
+    :param year: int or str
+    :param progress: callable(done, total), optional; called on the worker thread as weeks are fetched
+    :param cancel: threading.Event, optional; set it to abandon the load
+    :return: concurrent.futures.Future resolving to the structures.LeagueSeason
+    """
+
+    return _load_executor.submit(league_cache.get_or_load, league_id, year, progress=progress, cancel=cancel)
+
+
+def run_in_background(fn, *args):
+    """Runs fn(*args) on the loader threads, off the server's IO loop
+    :return: concurrent.futures.Future resolving to fn's result
+    """
+
+    return _load_executor.submit(fn, *args)
+
+
+def _load_error(future):
+    # future.exception() raises CancelledError for a load cancelled before it started, e.g. as the executor shuts
+    # down; that is reported like any other abandoned load
+    if future.cancelled():
+        return LoadCancelled()
+
+    return future.exception()
+
+
+# (league_id, year) of past seasons ESPN said never existed; they can't appear later, so aren't asked for again
+_missing_seasons = set()
+_missing_seasons_lock = threading.Lock()
+
+
+def load_history_in_background(league_id, years, progress=None, cancel=None):
+    """Starts getting several seasons of a league, each from the cache like load_in_background() but on
+    HISTORY_LOAD_WORKERS threads of their own
+    :param league_id: int or str
+    :param years: iterable of int seasons, e.g. from league_data.history_years(); ones that don't exist are skipped
+    :param progress: callable(done, total), optional; called on a worker thread as each season finishes
+    :param cancel: threading.Event, optional; set it to abandon every season's load
+    :return: concurrent.futures.Future resolving to a list of the structures.LeagueSeason found, oldest first;
+    fails with the first other exception a season's load raised
+    """
+
+    result = Future()
+
+    with _missing_seasons_lock:
+        years = [int(year) for year in years if (int(league_id), int(year)) not in _missing_seasons]
+
+    if not years:
+        result.set_result([])
+        return result
+
+    futures = [_history_executor.submit(league_cache.get_or_load, league_id, year, cancel=cancel) for year in years]
+    finished = []
+    finished_lock = threading.Lock()
+
+    def season_done(year, future):
+        if isinstance(_load_error(future), UnknownLeagueException) and year < current_season():
+            with _missing_seasons_lock:
+                _missing_seasons.add((int(league_id), year))
+
+        # reported under the lock so the count never goes backwards
+        with finished_lock:
+            finished.append(year)
+            done = len(finished)
+
+            if progress is not None:
+                try:
+                    progress(done, len(futures))
+
+                # a broken progress report mustn't keep the last season from resolving the result
+                except Exception:
+                    logger.exception('History progress callback failed')
+
+        if done == len(futures):
+            collect()
+
+    def collect():
+        seasons = []
+
+        for future in futures:
+            error = _load_error(future)
+
+            if error is None:
+                seasons.append(future.result())
+
+            elif not isinstance(error, UnknownLeagueException):
+                result.set_exception(error)
+                return
+
+        result.set_result(seasons)
+
+    for year, future in zip(years, futures):
+        future.add_done_callback(partial(season_done, year))
+
+    return result
@@ -0,0 +1,297 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+from espnff import League, UnknownLeagueException
+from metrics import instrumented, timed
+from scoreboard_store import OFFLINE_MODE, default_store
+from structures import LeagueSeason
+
+# upper bound on simultaneous scoreboard requests to ESPN for one league
+SCOREBOARD_WORKERS = int(os.environ.get('FFL_SCOREBOARD_WORKERS', 8))
+
+# seasons looked for, counting back from the latest, when a league's history is asked for
+HISTORY_SEASONS = int(os.environ.get('FFL_HISTORY_SEASONS', 10))
+
+
+class LoadCancelled(Exception):
+    """Raised inside a load once whoever asked for it no longer wants the result"""
+
+
+def current_season(today=None):
+    """Returns the most recent season that has started
+    :param today: datetime, defaults to now
+    :return: int, the season year; seasons start in september
+    """
+
+    september_month = 9
+    today = today or datetime.today()
+
+    if today.month < september_month:
+        return today.year - 1
+
+    return today.year
+
+
+def history_years(latest_year, seasons=HISTORY_SEASONS):
+    """Returns the seasons to look for when loading a league's history
+    :param latest_year: int, most recent season
+    :param seasons: int, how many seasons back to look
+    :return: list of ints, oldest first; espnff has no way to list a league's seasons, so some may not exist
+    """
+
+    return list(range(int(latest_year) - seasons + 1, int(latest_year) + 1))
+
+
+def get_latest_week(lg_obj):
+    """Returns the last week with a result; not available to just pull from league object"""
+
+    return lg_obj.teams[0].wins + lg_obj.teams[0].losses
+
+
+def _fetch_concurrently(lg_obj, weeks, max_workers, on_week=None, cancel=None):
+
+    def fetch(wk):
+        # requests still queued behind the pool are skipped once the load is abandoned
+        if cancel is not None and cancel.is_set():
+            raise LoadCancelled('Load of league {} ({}) was cancelled'.format(lg_obj.league_id, lg_obj.year))
+
+        with timed('fetch_scoreboard'):
+            return lg_obj.scoreboard(week=wk)
+
+    if not weeks:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(weeks))) as executor:
+        futures = [executor.submit(fetch, wk) for wk in weeks]
+
+        try:
+            for future in as_completed(futures):
+                future.result()
+
+                if on_week is not None:
+                    on_week()
+
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        # merged in submission order no matter which request finished first
+        return [future.result() for future in futures]
+
+
+def fetch_scoreboards(lg_obj, weeks, max_workers=SCOREBOARD_WORKERS, store=None, progress=None, cancel=None):
+    """Fetches the scoreboards for several weeks concurrently
+    :param lg_obj: a League(league_id, year) object for espnff
+    :param weeks: iterable of ints, weeks of the season
+    :param max_workers: int, most requests in flight at once
+    :param store: scoreboard_store.ScoreboardStore, optional; finished weeks are served from it and
+    newly fetched weeks are saved to it
+    :param progress: callable(done, total), optional; called on the calling thread as each week arrives
+    :param cancel: threading.Event, optional; once set, weeks not yet requested raise LoadCancelled
+    :return: list of lists of espnff matchups, in the same order as weeks
+    """
+
+    weeks = list(weeks)
+
+    stored = {}
+
+    if store is not None:
+        with timed('store_read'):
+            stored = store.load_weeks(lg_obj.league_id, lg_obj.year, weeks, lg_obj.teams)
+
+    missing = [wk for wk in weeks if wk not in stored]
+
+    done = [len(stored)]
+
+    def on_week():
+        done[0] += 1
+        progress(done[0], len(weeks))
+
+    fetched = _fetch_concurrently(lg_obj, missing, max_workers, on_week if progress is not None else None, cancel)
+
+    if store is None:
+        return fetched
+
+    # the latest week can still see stat corrections until the season is over, so it is revalidated
+    latest_week = get_latest_week(lg_obj)
+    final_week = latest_week if is_season_complete(lg_obj, lg_obj.year, latest_week) else latest_week - 1
+
+    for wk, matchups in zip(missing, fetched):
+        store.save_week(lg_obj.league_id, lg_obj.year, wk, matchups, complete=wk <= final_week)
+        stored[wk] = matchups
+
+    return [stored[wk] for wk in weeks]
+
+
+def scores_from_matchups(matchups):
+    """Returns a list of each team's owner and score for one week's matchups
+    :param matchups: list of espnff matchups from League.scoreboard()
+    :return: a list of lists; [[owner, score], ... ] sorted highest to lowest
+    """
+
+    week_scores = {}
+    for matchup in matchups:
+        home = [matchup.home_team, matchup.home_score]
+        away = [matchup.away_team, matchup.away_score]
+        week_scores[home[0].owner] = home[1]
+        week_scores[away[0].owner] = away[1]
+
+    # dict to list of lists
+    scores = map(list, week_scores.items())
+
+    # a list of lists [owner, score] for current week, highest to lowest score
+    return sorted(scores, reverse=True, key=lambda x: x[1])
+
+
+def get_scores(lg_obj, wk_num):
+    """Returns a list of each team's owner and score for the selected week
+    :param lg_obj: a League(league_id, year) object for espnff
+    :param wk_num: int, week of the season
+    :return: a list of lists; [[owner, score], ... ] sorted highest to lowest
+    """
+
+    return scores_from_matchups(fetch_scoreboards(lg_obj, [wk_num])[0])
+
+
+def build_score_matrix(scoreboards, team_to_idx, number_teams):
+    """Returns every team's score for each fetched week as a dense array
+    :param scoreboards: list of lists of espnff matchups, one list per week
+    :param team_to_idx: dict, espn team id to row index
+    :param number_teams: int
+    :return: float array of shape (number_teams, len(scoreboards))
+    """
+
+    scores = np.zeros((number_teams, len(scoreboards)))
+
+    for col, matchups in enumerate(scoreboards):
+        for matchup in matchups:
+            scores[team_to_idx[matchup.home_team.team_id], col] = matchup.home_score
+
+            # byes have no away team
+            if matchup.away_team is not None:
+                scores[team_to_idx[matchup.away_team.team_id], col] = matchup.away_score
+
+    return scores
+
+
+def build_pairing_matrix(scoreboards, team_to_idx, number_teams):
+    """Returns who played whom in each fetched week
+    :param scoreboards: list of lists of espnff matchups, one list per week
+    :param team_to_idx: dict, espn team id to row index
+    :param number_teams: int
+    :return: int array of shape (number_teams, len(scoreboards)) of opponent rows; -1 for byes
+    """
+
+    opponents = np.full((number_teams, len(scoreboards)), -1, dtype=int)
+
+    for col, matchups in enumerate(scoreboards):
+        for matchup in matchups:
+            if matchup.away_team is None:
+                continue
+
+            home = team_to_idx[matchup.home_team.team_id]
+            away = team_to_idx[matchup.away_team.team_id]
+
+            opponents[home, col] = away
+            opponents[away, col] = home
+
+    return opponents
+
+
+def build_opponent_matrix(teams, team_to_idx, reg_season_weeks):
+    """Returns each team's regular season opponents as row indices
+    :param teams: espnff teams, whose schedule lists the opposing team for each week
+    :param team_to_idx: dict, espn team id to row index
+    :param reg_season_weeks: int
+    :return: int array of shape (len(teams), reg_season_weeks); -1 for byes and weeks missing from the schedule
+    """
+
+    opponents = np.full((len(teams), reg_season_weeks), -1, dtype=int)
+
+    for team in teams:
+        row = team_to_idx[team.team_id]
+
+        for col, opponent in enumerate(team.schedule[:reg_season_weeks]):
+            # espnff lists a team as its own opponent on a bye
+            if opponent.team_id != team.team_id:
+                opponents[row, col] = team_to_idx[opponent.team_id]
+
+    return opponents
+
+
+def is_season_complete(league, year, latest_week):
+    """Whether the regular season's results can no longer change
+    :param league: a League(league_id, year) object for espnff
+    :param year: int
+    :param latest_week: int, last week with a result
+    :return: bool
+    """
+
+    return int(year) < current_season() or latest_week >= league.settings.reg_season_count
+
+
+@instrumented('open_league')
+def open_league(league_id, year, store=None):
+    """Returns the league-season from ESPN, or from the store when running offline
+    :param league_id: int
+    :param year: int
+    :param store: scoreboard_store.ScoreboardStore, optional; settings and teams fetched from ESPN are saved to it
+    :return: a League(league_id, year) object for espnff, or an equivalent scoreboard_store.StoredLeague
+    :raises: the espnff exceptions raised by League(league_id, year)
+    """
+
+    if OFFLINE_MODE:
+        league = store.load_league(league_id, year) if store is not None else None
+
+        if league is None:
+            raise UnknownLeagueException('League {} ({}) is not in the offline store'.format(league_id, year))
+
+        return league
+
+    league = League(league_id, year)
+
+    if store is not None:
+        store.save_league(league)
+
+    return league
+
+
+@instrumented('load_league_season')
+def load_league_season(league_id, year, store=None, progress=None, cancel=None):
+    """Fetches a league-season and compiles its expected wins
+    :param league_id: int
+    :param year: int
+    :param store: scoreboard_store.ScoreboardStore, defaults to the process-wide store
+    :param progress: callable(done, total), optional; reports weeks fetched so far
+    :param cancel: threading.Event, optional; set it to abandon the load with LoadCancelled
+    :return: structures.LeagueSeason
+    :raises: the espnff exceptions raised by League(league_id, year)
+    """
+
+    store = store or default_store()
+    league = open_league(league_id, year, store)
+
+    teams = league.teams
+    latest_week = get_latest_week(league)
+
+    team_ids = [tm.team_id for tm in teams]
+    team_to_idx = {team_id: idx for idx, team_id in enumerate(team_ids)}
+
+    # a stored league already reads its weeks from the store
+    week_store = None if OFFLINE_MODE else store
+
+    # network round trips dominate, so request every week up front
+    scoreboards = fetch_scoreboards(league, range(1, latest_week + 1), store=week_store, progress=progress,
+                                    cancel=cancel)
+    scores = build_score_matrix(scoreboards, team_to_idx, len(teams))
+
+    # weeks already played use the pairings from their scoreboards; the schedule fills in the rest
+    opponents = build_opponent_matrix(teams, team_to_idx, max(league.settings.reg_season_count, latest_week))
+    opponents[:, :latest_week] = build_pairing_matrix(scoreboards, team_to_idx, len(teams))
+
+    with timed('compile'):
+        return LeagueSeason(league_id, year, league.settings.name, team_ids, [tm.owner for tm in teams], scores,
+                            [tm.wins for tm in teams], is_season_complete(league, year, latest_week),
+                            opponents=opponents, playoff_teams=league.settings.playoff_team_count)
@@ -0,0 +1,366 @@
+"""Figures, tables and browser-side callbacks for the Scores, Expected Wins and Summary tabs.
+
+Shared by the explorer and the pre-rendered reports in static_reports.py, so neither needs a server to
+filter weeks or redraw the Summary table.
+"""
+from bokeh.plotting import figure, ColumnDataSource
+from bokeh.models import HoverTool, ResetTool, SaveTool, WheelZoomTool, BoxZoomTool, PanTool, Legend
+from bokeh.models import CDSView, IndexFilter, CustomJSFilter
+from bokeh.models.widgets import DataTable, TableColumn, NumberFormatter
+from bokeh.models.tickers import FixedTicker
+from bokeh.palettes import all_palettes
+from bokeh.models.callbacks import CustomJS
+import numpy as np
+from metrics import instrumented
+
+
+def get_line_colors(number_teams):
+    # todo docstring
+    # todo - this is hacky - refactor
+    # the paired palette only comes in 3 to 12 colors; bigger leagues cycle through category20 instead
+    if number_teams > 12:
+        palette = all_palettes['Category20'][20]
+        return [palette[i % len(palette)] for i in range(number_teams)]
+
+    colors = list(all_palettes['Paired'][max(number_teams, 3)])[:number_teams]
+
+    colors[0] = '#7fe8cd'
+
+    if len(colors) >= 5:
+        colors[4] = '#828081'
+
+    if len(colors) >= 7:
+        colors[6] = '#000000'
+
+    if len(colors) >= 9:
+        colors[8] = '#592724'
+
+    if len(colors) >= 11:
+        colors[10] = '#0f4c30'
+
+    return colors
+
+
+@instrumented('initialize_sc_figure')
+def initialize_sc_figure(season):
+    # todo docstring
+
+    sc_hover = HoverTool(tooltips=[
+        ('Week', '@x'),
+        ('Owner', '@owner'),
+        ('Score', '@y{*00.00}'),
+    ])
+
+    # try plotting just scores first
+    plot = figure(plot_height=600, plot_width=1000,
+                  title='{} - {} Regular Season'.format(season.name, season.year),
+                  x_axis_label='Week',
+                  y_axis_label='Scores',
+                  tools=[sc_hover, ResetTool(), BoxZoomTool(), WheelZoomTool(), SaveTool(), PanTool()])
+
+    plot.xaxis.ticker = FixedTicker(ticks=season.weeks.tolist())
+
+    return plot
+
+
+@instrumented('initialize_ew_figure')
+def initialize_ew_figure(season):
+    # todo docstring
+
+    ew_hover = HoverTool(tooltips=[
+        ('Week', '@x'),
+        ('Owner', '@owner'),
+        ('Expected Wins', '@y{*0.000}'),
+    ])
+
+    # plotting wins and expected wins in the second tab
+    plot = figure(plot_height=600, plot_width=1000,
+                  title='{} - {} Regular Season'.format(season.name, season.year),
+                  x_axis_label='Week',
+                  y_axis_label='Expected Wins',
+                  tools=[ew_hover, ResetTool(), BoxZoomTool(), WheelZoomTool(), SaveTool(), PanTool()])
+
+    plot.xaxis.ticker = FixedTicker(ticks=season.weeks.tolist())
+
+    return plot
+
+
+@instrumented('initialize_ew_table')
+def initialize_ew_table(table_source):
+    # todo docstring
+
+    table_columns = [
+        TableColumn(field='rank', title='Rank'),
+        TableColumn(field='move', title='Movement', formatter=NumberFormatter(format='+0')),
+        TableColumn(field='owner', title='Owner'),
+        TableColumn(field='wins', title='Wins'),
+        TableColumn(field='ew', title='Expected Wins'),
+        TableColumn(field='diff', title='Difference')
+    ]
+
+    return DataTable(source=table_source, columns=table_columns, width=600, height=500, sortable=True)
+
+
+def get_long_source(season, matrix):
+    """Returns one ColumnDataSource holding every team's weekly values, rows grouped by team
+    :param season: structures.LeagueSeason
+    :param matrix: (teams, weeks) array, e.g. scores
+    :return: ColumnDataSource with x (week), y (value) and owner columns; team i's rows are
+    i * weeks through (i + 1) * weeks - 1
+    """
+
+    number_teams, number_weeks = matrix.shape
+
+    return ColumnDataSource(dict(
+        x=np.tile(season.weeks, number_teams),
+        y=matrix.ravel(),
+        owner=[owner for owner in season.owners for _ in range(number_weeks)]
+    ))
+
+
+@instrumented('get_sc_source')
+def get_sc_source(season):
+    # todo docstring
+
+    return get_long_source(season, season.scores)
+
+
+@instrumented('get_ew_source')
+def get_ew_source(season):
+    """Returns the expected wins source; y is the running total from the first selected week
+    :param season: structures.LeagueSeason
+    :return: ColumnDataSource as from get_long_source(), plus y_season, the running total from week 1
+    that the browser rebases y from when the selected weeks change
+    """
+
+    # expected wins; column 0 of the cumulative matrix is the zero before week 1
+    source = get_long_source(season, season.cumul_ew[:, 1:])
+
+    # only the browser rebases y, so the server keeps a single array for both columns
+    source.data['y_season'] = source.data['y']
+
+    return source
+
+
+def get_team_view(source, season, idx, week_filter):
+    """Returns a view of one team's rows in a get_long_source() source, limited to the selected weeks
+    by week_filter, from make_week_filter()
+    """
+
+    rows = list(range(idx * season.latest_week, (idx + 1) * season.latest_week))
+
+    return CDSView(source=source, filters=[IndexFilter(indices=rows), week_filter])
+
+
+@instrumented('get_table_sources')
+def get_table_sources(season, start_week, end_week):
+    """Returns the Summary table's source for a window of weeks, best expected wins first
+    :param season: structures.LeagueSeason
+    :param start_week: int, first week included
+    :param end_week: int, last week included
+    :return: ColumnDataSource
+    """
+
+    return ColumnDataSource(season.window_table(start_week, end_week))
+
+
+def get_team_totals_source(season):
+    """Returns each team's running totals, so the browser can fill the Summary table for any window
+    :param season: structures.LeagueSeason
+    :return: ColumnDataSource, one row per team; wins_cum is empty when the schedule isn't known, and
+    season_wins is shown for every window instead
+    """
+
+    return ColumnDataSource(dict(
+        owner=list(season.owners),
+        ew_cum=season.cumul_ew.tolist(),
+        wins_cum=season.cumul_wins.tolist() if season.has_schedule else [[]] * season.number_teams,
+        season_wins=season.wins.tolist()
+    ))
+
+
+def get_standings_source(season):
+    """Returns the precomputed standings of every window of weeks
+    :param season: structures.LeagueSeason
+    :return: ColumnDataSource, one row per start week; row start - 1 holds rank[end][team] and
+    order[end], the team rows best first, for each end week
+    """
+
+    return ColumnDataSource(dict(
+        rank=season.standings.tolist(),
+        order=season.standings_order.tolist()
+    ))
+
+
+@instrumented('plot_sc_data')
+def plot_sc_data(plot, season, score_source, colors, week_filter):
+    # todo docstring
+
+    sc_rend_list = []
+    sc_legend_items = []
+
+    for idx, owner in enumerate(season.owners):
+        first_name = owner.split(' ')[0]
+        view = get_team_view(score_source, season, idx, week_filter)
+
+        r = plot.rect('x', 'y', source=score_source, view=view, width=.5, height=1.2, fill_color=colors[idx], fill_alpha=0.95,
+                      line_color=colors[idx], muted_color=colors[idx], muted_alpha=0.05, hover_alpha=1,
+                      hover_color=colors[idx], hover_line_alpha=1)
+
+        l = plot.line('x', 'y', source=score_source, view=view, line_color='black', line_alpha=0.08, line_dash='dashed',
+                      muted_color=colors[idx], muted_alpha=0.05, hover_color=colors[idx], hover_alpha=1)
+
+        sc_rend_list.append((r, l))
+        sc_legend_items.append(('{}  '.format(first_name), [r, l]))
+
+    plot.legend.location = 'top_center'
+    plot.legend.orientation = 'horizontal'
+
+    sc_legend = Legend(items=sc_legend_items, location=(0, 13), orientation='horizontal')
+
+    plot.add_layout(sc_legend, 'above')
+    plot.legend.click_policy = 'mute'
+    plot.legend.border_line_alpha = 0
+
+    return sc_rend_list
+
+
+@instrumented('plot_ew_data')
+def plot_ew_data(plot, season, exp_wins_source, colors, week_filter):
+    # todo docstring
+
+    ew_rend_list = []
+    ew_legend_items = []
+
+    for idx, owner in enumerate(season.owners):
+
+        f_name = owner.split(' ')[0]
+        view = get_team_view(exp_wins_source, season, idx, week_filter)
+
+        l = plot.line('x', 'y', source=exp_wins_source, view=view, line_color=colors[idx], line_alpha=0.95,
+                      muted_color=colors[idx], muted_alpha=0.05, line_width=1.5)
+
+        x = plot.square('x', 'y', size=4, source=exp_wins_source, view=view, fill_color=colors[idx], line_alpha=0.95,
+                        muted_color=colors[idx], muted_alpha=0.05, line_color=colors[idx], line_width=1.5)
+
+        ew_rend_list.append((l, x))
+        ew_legend_items.append(('{}  '.format(f_name), [l, x]))
+
+    plot.legend.location = 'top_center'
+    plot.legend.orientation = 'horizontal'
+
+    ew_legend = Legend(items=ew_legend_items, location=(0, 13), orientation='horizontal')
+
+    plot.add_layout(ew_legend, 'above')
+    plot.legend.click_policy = 'mute'
+    plot.legend.border_line_alpha = 0
+
+    return ew_rend_list
+
+
+def make_week_filter(slider):
+    """Returns a filter keeping the rows of a get_long_source() source within the slider's weeks
+
+    Week range filtering runs in the browser; every team's view shares this filter.
+    """
+
+    return CustomJSFilter(args=dict(slider=slider), code='''
+    // values passed from widget are sometimes floats (e.g. 10.0000000002)
+    var start_wk = Math.round(slider.value[0]);
+    var end_wk = Math.round(slider.value[1]);
+    var weeks = source.data['x'];
+    var keep = new Array(weeks.length);
+
+    for (var i = 0; i < weeks.length; i++) {
+        keep[i] = weeks[i] >= start_wk && weeks[i] <= end_wk;
+    }
+
+    return keep;
+''')
+
+
+def make_week_range_callback():
+    """Returns the slider callback that rebases expected wins and redraws the Summary table in the browser;
+    its args are set from week_range_args() once a league-season is shown
+    """
+
+    # views only recompute their filters when their source changes
+    return CustomJS(code='''
+    var start_wk = Math.round(slider.value[0]);
+    var end_wk = Math.round(slider.value[1]);
+    // taken from the data rather than slider.end, which is past the last week while only one has been played
+    var number_weeks = team_source.data['ew_cum'][0].length - 1;
+
+    // expected wins lines restart from zero at the first selected week; rows are grouped by team
+    var ew = ew_source.data;
+
+    for (var i = 0; i < ew['y'].length; i++) {
+        var first_row = i - (i % number_weeks);
+        var base = start_wk > 1 ? ew['y_season'][first_row + start_wk - 2] : 0;
+
+        ew['y'][i] = ew['y_season'][i] - base;
+    }
+
+    // summary table for the selected weeks; standings are precomputed, so this is only lookups
+    var before = start_wk - 1;
+    var totals = team_source.data;
+    var ranks = standings_source.data['rank'][before];
+    var order = standings_source.data['order'][before][end_wk];
+
+    // the table always has one row per team, so its columns are overwritten in place; assigning a new data
+    // object would send the whole table to the server on every step of a drag
+    var data = table_source.data;
+
+    for (var k = 0; k < order.length; k++) {
+        var i = order[k];
+        var wins_cum = totals['wins_cum'][i];
+        var exp_wins = totals['ew_cum'][i][end_wk] - totals['ew_cum'][i][before];
+        var wins = wins_cum.length ? wins_cum[end_wk] - wins_cum[before] : totals['season_wins'][i];
+
+        data['rank'][k] = ranks[end_wk][i];
+        data['move'][k] = end_wk > start_wk ? ranks[end_wk - 1][i] - ranks[end_wk][i] : 0;
+        data['owner'][k] = totals['owner'][i];
+        data['wins'][k] = wins;
+        data['ew'][k] = Math.round(exp_wins * 1000) / 1000;
+        data['diff'][k] = Math.round((wins - exp_wins) * 1000) / 1000;
+    }
+
+    // the picker's value is deliberately shared with the server: if the server kept the week it last set,
+    // setting that week again for the next league would be no change and never reach the browser. Only an
+    // actual change of end week is sent, not every step of a drag
+    if (week_select.value != String(end_wk)) {
+        week_select.value = String(end_wk);
+    }
+
+    table_source.change.emit();
+    sc_source.change.emit();
+    ew_source.change.emit();
+''')
+
+
+def week_range_args(season, sc_source, ew_source, table_source, slider, week_select):
+    """Returns the args of a make_week_range_callback() callback for a league-season
+    :param season: structures.LeagueSeason
+    :param sc_source: ColumnDataSource from get_sc_source()
+    :param ew_source: ColumnDataSource from get_ew_source()
+    :param table_source: ColumnDataSource from get_table_sources()
+    :param slider: the week RangeSlider
+    :param week_select: the Summary tab's week Select
+    :return: dict
+    """
+
+    return dict(sc_source=sc_source, ew_source=ew_source, table_source=table_source,
+                team_source=get_team_totals_source(season), standings_source=get_standings_source(season),
+                slider=slider, week_select=week_select)
+
+
+def make_week_select_callback(slider):
+    """Returns the Summary tab week picker's callback, which moves the end of the slider's window"""
+
+    return CustomJS(args=dict(slider=slider), code='''
+    var week = parseInt(cb_obj.value);
+
+    if (!isNaN(week) && week != Math.round(slider.value[1])) {
+        slider.value = [Math.min(Math.round(slider.value[0]), week), week];
+    }
+''')
@@ -0,0 +1,153 @@
+"""Non-interactive power rankings for many leagues and seasons at once.
+
+Backfills every missing week (or recomputes them with --recompute) for each league / season pair, with the
+leagues spread over a pool of processes. Each league's weeks are appended to its rankings store as soon as
+that league finishes, and a summary line is printed per league in the order they complete.
+
+    python batch_rankings.py --leagues 1667721 123456 --seasons 2016 2017 --weeks 1-13
+"""
+import os
+import sys
+import time
+import argparse
+from multiprocessing import Pool
+from rankings_store import RankingsStore, find_league_dir
+
+# modules shared with the explorer live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from league_data import current_season, load_league_season
+
+
+LEAGUES_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'leagues')
+
+
+def parse_week_range(text):
+    """Parse a week range argument
+    :param text: string, e.g. '3-10', '5' or 'all'
+    :return: tuple of (first week, last week), or None for every completed week
+    """
+
+    if text == 'all':
+        return None
+
+    first, _, last = text.partition('-')
+
+    return int(first), int(last or first)
+
+
+def backfill_season(season, store, weeks, recompute=False):
+    """Append each week's expected wins and season totals to the store
+    :param season: structures.LeagueSeason
+    :param store: rankings_store.RankingsStore for the same league-season
+    :param weeks: iterable of ints; weeks not yet played are skipped
+    :param recompute: bool, rewrite weeks that are already in the store
+    :return: list of weeks written
+    """
+
+    owners = dict(zip(season.team_ids, season.owners))
+    written = []
+
+    for week in weeks:
+        if week > season.latest_week:
+            break
+
+        if week in store and not recompute:
+            continue
+
+        # weekly_ew column 0 is week 1; cumul_ew column k is the total through week k
+        ew = dict(zip(season.team_ids, season.weekly_ew[:, week - 1].tolist()))
+        totals = dict(zip(season.team_ids, season.cumul_ew[:, week].tolist()))
+
+        store.append_week(week, ew, totals, owners)
+        written.append(week)
+
+    return written
+
+
+def run_job(job):
+    """Backfill one league-season; runs in a worker process
+    :param job: tuple of (league id, season, week range or None, leagues root, recompute)
+    :return: tuple of (league id, season, weeks written, error message or None)
+    """
+
+    league_id, year, week_range, leagues_root, recompute = job
+
+    try:
+        season = load_league_season(league_id, year)
+        store = RankingsStore(find_league_dir(leagues_root, league_id, season.name), year)
+
+        first, last = week_range or (1, season.latest_week)
+
+        return league_id, year, backfill_season(season, store, range(first, last + 1), recompute), None
+
+    # one broken league shouldn't stop the rest of the batch
+    except Exception as e:
+        return league_id, year, [], '{}: {}'.format(type(e).__name__, e)
+
+
+def run_batch(jobs, processes=None, timeout=None):
+    """Run jobs over a process pool, yielding each result as soon as it is ready
+    :param jobs: list of run_job() argument tuples
+    :param processes: int, pool size; defaults to the number of cpus
+    :param timeout: seconds before unfinished leagues are abandoned, or None to wait indefinitely
+    :return: generator of run_job() results, in completion order
+    """
+
+    pool = Pool(processes)
+    pending = {pool.apply_async(run_job, (job,)): job for job in jobs}
+    deadline = time.time() + timeout if timeout else None
+
+    try:
+        while pending:
+            for result in [r for r in pending if r.ready()]:
+                del pending[result]
+                yield result.get()
+
+            if deadline is not None and time.time() > deadline:
+                break
+
+            time.sleep(0.1)
+
+        for league_id, year, _, _, _ in pending.values():
+            yield league_id, year, [], 'timed out after {} seconds'.format(timeout)
+
+    finally:
+        # finished leagues are already on disk; stuck workers are killed rather than waited on
+        pool.terminate()
+        pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute power rankings (expected wins) for many leagues.')
+    parser.add_argument('--leagues', type=int, nargs='+', required=True, help='league ids (see any league url)')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[current_season()], help='seasons to rank')
+    parser.add_argument('--weeks', type=parse_week_range, default=None,
+                        help="week range such as 1-13, or 'all' completed weeks (default)")
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: cpu count)')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds to wait for the whole batch')
+    parser.add_argument('--recompute', action='store_true', help='rewrite weeks that were already saved')
+    parser.add_argument('--leagues-root', default=LEAGUES_ROOT, help='directory of league rankings')
+    args = parser.parse_args(argv)
+
+    jobs = [(league_id, year, args.weeks, args.leagues_root, args.recompute)
+            for league_id in args.leagues for year in args.seasons]
+
+    failures = 0
+
+    for league_id, year, written, error in run_batch(jobs, args.processes, args.timeout):
+        if error is not None:
+            failures += 1
+            print('{} ({}): FAILED - {}'.format(league_id, year, error))
+
+        elif written:
+            print('{} ({}): saved weeks {}'.format(league_id, year, ', '.join(str(week) for week in written)))
+
+        else:
+            print('{} ({}): already up to date'.format(league_id, year))
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,75 +1,65 @@
 import os
+import sys
 import glob
-import csv
+import numpy as np
 from espnff import League
+from rankings_store import RankingsStore, LEGACY_SEASON
+
+# modules shared with the explorer live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expected_wins import weekly_expected_wins
+from league_data import current_season, fetch_scoreboards, scores_from_matchups, build_score_matrix
+from league_data import build_pairing_matrix
+from matchups import power_rankings
+from scoreboard_store import default_store
 
 
 def create_league(message):
     """Get input from user to fill out the name and members of a new league
     :param message: string, to prompt the user to create the new league
-    :return: dict, expected wins (set to 0.0) for each team in the league
+    :return: tuple of the league name and league id
     """
 
     lg_name = input(message).strip()
 
     lg_id = int(input('Please enter the league id (see the url in any league page): ').strip())
 
-    # create a directory to contain power rankings files for this league
+    # create a directory to contain the power rankings store for this league; weeks are appended as they're run
     path_to_league = os.path.join('leagues', '{} ({})'.format(lg_name, lg_id))
     os.mkdir(path_to_league)
 
-    espn_league = League(lg_id, 2017)
-
-    # list of owner names as given by their espn accounts
-    owners = [tm.owner for tm in espn_league.teams]
-
-    # key value pairs of an owner and his cumulative expected wins for the season; start with zero
-    expected_wins_dict = dict([(owner, 0.0) for owner in owners])
+    return lg_name, lg_id
 
-    # avoid creating file with one or more spaces, so silently replace with hyphen
-    rankings_filepath = os.path.join(path_to_league, '{}-00.csv'.format(lg_name.replace(' ', '-')))
 
-    # write owner, value to this first file
-    with open(rankings_filepath, 'w') as f:
-        writer = csv.writer(f)
-        writer.writerows(expected_wins_dict.items())
-
-    return lg_name, lg_id, expected_wins_dict
-
-
-def get_league_files(lg_name, lg_id):
-    """Return all of the files associated with this league.
+def get_league_dir(lg_name, lg_id):
+    """Return the directory holding this league's rankings.
     :param lg_name: string
     :param lg_id: int
-    :return: list of filepaths to all league files; meant to be assigned to a dictonary key
-    matching the name of the league.
+    :return: path to the league directory
     """
 
-    league_files = glob.glob(os.path.join('leagues', '{} ({})'.format(lg_name, lg_id), '*'))
-    league_files.sort(reverse=True)
+    return os.path.join('leagues', '{} ({})'.format(lg_name, lg_id))
 
-    return league_files
 
+def get_legacy_files(league_dir):
+    """Return the weekly <League>-NN.csv files written by earlier versions of this script.
+    :param league_dir: path to the league directory
+    :return: list of filepaths, oldest week first
+    """
 
-def get_current_scores(league_obj, week_num):
-    """Returns a list of each team's owner and score for the selected week
+    return sorted(glob.glob(os.path.join(league_dir, '*.csv')))
+
+
+def get_season_scoreboards(league_obj, week_num):
+    """Returns every week's matchups through the selected week
     :param league_obj: a League(league_id, year) object for espnff
     :param week_num: int, week of the season
-    :return: a list of lists; [[owner, score], ... ] sorted highest to lowest
+    :return: list of lists of espnff matchups, one list per week starting with week 1
     """
 
-    week_scores = {}
-    for matchup in league_obj.scoreboard(week=week_num):
-        home = [matchup.home_team, matchup.home_score]
-        away = [matchup.away_team, matchup.away_score]
-        week_scores[home[0].owner] = home[1]
-        week_scores[away[0].owner] = away[1]
-
-    # dict to list of lists
-    scores = map(list, week_scores.items())
-
-    # a list of lists [owner, score] for current week, highest to lowest score
-    return sorted(scores, reverse=True, key=lambda x: x[1])
+    # finished weeks come from the local store rather than ESPN
+    return fetch_scoreboards(league_obj, range(1, week_num + 1), store=default_store())
 
 
 print('Welcome to the FFL Power Rankings (Expected Wins) Calculator!')
@@ -78,28 +68,19 @@ league_names = os.listdir('leagues')
 
 # first time through the program, need a league on which to operate
 if len(league_names) == 0:
+    create_league('No previously-created leagues found. Please enter a name for a new league: ')
 
-    league_name, league_id, expected_wins = create_league('No previously-created leagues found. Please enter a name '
-                                                          'for a new league: ')
 
-# indicates that reading from file is required later
-else:
-    expected_wins = None
-
-
-# gather existing files for each league; a dictionary of lists, most recent file first
+# gather the id of each existing league, keyed by name
 leagues = {}
 league_dirs = os.listdir('leagues')
 
-
-# compile and sort all files for the league
 for l_name in league_dirs:
     league_name = l_name.split('(')[0].strip()
     league_id = int(l_name.split('(')[-1].split(')')[0])
 
     # only use league name so users don't need to enter full string when selecting
-    curr_lg_files = get_league_files(league_name, league_id)
-    leagues[league_name] = curr_lg_files
+    leagues[league_name] = league_id
 
 
 # display existing leagues
@@ -112,16 +93,14 @@ while True:
     input_string = input('Please select a league by name, or enter "create" to make a new one: ').strip()
 
     if input_string.lower() == 'create':
-        league_name, league_id, expected_wins = create_league('Please enter the name for the new league: ')
-        leagues[league_name] = get_league_files(league_name, league_id)
+        league_name, league_id = create_league('Please enter the name for the new league: ')
+        leagues[league_name] = league_id
         break
 
-    # determine which number to assign the new file
     elif leagues.get(input_string, None) is not None:
 
-        # extract from selected league's directory
         league_name = input_string
-        league_id = int(leagues[input_string][0].split('(')[-1].split(')')[0])
+        league_id = leagues[input_string]
 
         print('Selected {}'.format(input_string))
         break
@@ -129,46 +108,54 @@ while True:
     else:
         print('That league could not be found.')
 
-# use the most recent file from which to pull values
-latest_rankings = leagues[league_name][0]
-
-# no need to read from file if first run with a league (data already loaded)
-if expected_wins is None:
-
-    # read in the most recent (cumulative) expected win values
-    with open(latest_rankings, 'r') as infile:
-        r = csv.reader(infile)
-        expected_wins = {row[0]: float(row[1]) for row in r if row}
 
+season_input = input('Select a season (default {}): '.format(current_season())).strip()
+season = int(season_input) if season_input else current_season()
 
 week_num = int(input('Select a week to operate on: ').strip())
 
 # used to pull data straight from ESPN league
-league_obj = League(league_id, 2017)
+league_obj = League(league_id, season)
+
+owner_to_team_id = {team.owner: team.team_id for team in league_obj.teams}
+
+league_dir = get_league_dir(league_name, league_id)
+rankings = RankingsStore(league_dir, season)
+
+# carry over the per-week csv files from before the store existed
+legacy_files = get_legacy_files(league_dir)
+if len(rankings) == 0 and legacy_files and season == LEGACY_SEASON:
+    print('Imported {} weeks of previous rankings.'.format(rankings.import_csv_files(legacy_files, owner_to_team_id)))
+
+# cumulative expected win values through the previous week
+previous_totals = rankings.totals(week_num - 1)
+
+if previous_totals is None:
+    sys.exit('Week {} has not been run yet; the latest week saved is {}.'.format(week_num - 1, rankings.latest_week()))
 
-sorted_scores = get_current_scores(league_obj, week_num)
+scoreboards = get_season_scoreboards(league_obj, week_num)
+sorted_scores = scores_from_matchups(scoreboards[-1])
 
-# for expected wins calculation
-num_teams = len(sorted_scores)
+# one-week (teams x 1) score matrix, rows in the same order as sorted_scores
+ew_this_week = weekly_expected_wins(np.array([[pair[1]] for pair in sorted_scores]))[:, 0]
+
+weekly_ew = {}
 
 # add expected number of wins for this week to the season-long cumulative value
 for idx, pair in enumerate(sorted_scores):
+    team_id = owner_to_team_id[pair[0]]
+    weekly_ew[team_id] = ew_this_week[idx]
 
-    # e.g., 12-team league, 2nd highest scorer would lose one matchup --> 1 - (1 * 1/11) = .909 expected wins
-    ew_this_week = 1 - (idx * (1/(num_teams - 1)))
-
-    sorted_scores[idx][1] = expected_wins[pair[0]] + ew_this_week
+    sorted_scores[idx][1] = previous_totals.get(team_id, 0.0) + ew_this_week[idx]
 
 
 # display the new rankings
 
 sorted_exp_wins = sorted(sorted_scores, key=lambda x: x[1], reverse=True)
 
-new_wk_num = int(latest_rankings[-6:-4]) + 1
-
 owners_wins = {team.owner: team.wins for team in league_obj.teams}
 
-print('Power Rankings / Expected Wins: Week {}'.format(new_wk_num))
+print('Power Rankings / Expected Wins: Week {}'.format(week_num))
 print('{0: >4} | {1: >19} | {2: >13} | {3: >11} | {4: >6}'.format('Rank', 'Owner', 'Expected Wins',
                                                                   'Actual Wins', '+/-'))
 
@@ -188,29 +175,20 @@ for idx, pair in enumerate(sorted_exp_wins):
         print('{0: >4} | {1: >19} | {2: >13.3f} | {3: >11} | {4: >+6.3f}'.format(idx + 1, pair[0], pair[1], curr_aw, curr_aw - pair[1]))
         prev_ew = curr_ew
 
-print('\nESPN Power Rankings:')
-for row in league_obj.power_rankings(week_num):
-    print('{0: >19} | {1: >5}'.format(row[1].owner, row[0]))
+# ESPN's power rankings, worked out from the same matchups instead of another request
+team_to_idx = {team.team_id: idx for idx, team in enumerate(league_obj.teams)}
+season_scores = build_score_matrix(scoreboards, team_to_idx, len(league_obj.teams))
+season_opponents = build_pairing_matrix(scoreboards, team_to_idx, len(league_obj.teams))
 
+print('\nESPN Power Rankings:')
+for idx, points in power_rankings(season_scores, season_opponents, week_num):
+    print('{0: >19} | {1: >5.2f}'.format(league_obj.teams[idx].owner, points))
 
-# update expected wins dictionary
-for pair in sorted_scores:
-    expected_wins[pair[0]] = '{0:.6f}'.format(pair[1])  # round to 6 decimal places
-
-# values are now updated, need to save to a new file for this week
-
-# determine proper filename
-if new_wk_num < 10:
-    new_file = latest_rankings[0:-6] + '0' + str(new_wk_num) + '.csv'
-else:
-    new_file = latest_rankings[0:-6] + str(new_wk_num) + '.csv'
 
-# save weekly files to corresponding league folder
-new_filepath = os.path.join(new_file)
+# values are now updated; append this week to the league's rankings store
+new_totals = {owner_to_team_id[owner]: total for owner, total in sorted_scores}
+team_owners = {team_id: owner for owner, team_id in owner_to_team_id.items()}
 
-# write owner,value to new file
-with open(new_filepath, 'w') as file:
-    w = csv.writer(file)
-    w.writerows(expected_wins.items())
+rankings.append_week(week_num, weekly_ew, new_totals, team_owners)
 
 print('\n(Week saved successfully.)')
@@ -0,0 +1,179 @@
+import os
+import re
+import csv
+import json
+import logging
+
+
+# one file per season, one record per line; a week recomputed later is appended again and the newest record wins
+RANKINGS_FILENAME = 'rankings-{}.jsonl'
+
+# legacy weekly files look like <League-Name>-NN.csv, and were all written for this season
+LEGACY_FILE_PATTERN = re.compile(r'-(\d+)\.csv$')
+LEGACY_SEASON = 2017
+
+# league directories are named <League Name> (<league id>)
+LEAGUE_DIR_PATTERN = re.compile(r'\((\d+)\)$')
+
+logger = logging.getLogger(__name__)
+
+
+def find_league_dir(leagues_root, league_id, lg_name):
+    """Return the directory holding a league's rankings, creating it if there is none yet
+    :param leagues_root: path to the directory of all leagues
+    :param league_id: int
+    :param lg_name: string, used to name a new directory
+    :return: path to the league directory
+    """
+
+    for dir_name in os.listdir(leagues_root):
+        match = LEAGUE_DIR_PATTERN.search(dir_name)
+
+        if match is not None and int(match.group(1)) == int(league_id):
+            return os.path.join(leagues_root, dir_name)
+
+    # path separators in a league name would nest directories
+    path_to_league = os.path.join(leagues_root, '{} ({})'.format(lg_name.replace(os.sep, '-'), league_id))
+    os.makedirs(path_to_league, exist_ok=True)
+
+    return path_to_league
+
+
+class RankingsStore:
+    """Append-only store of a league-season's weekly expected wins, keyed by espn team id
+
+    Each record holds one week's expected wins ('ew') and the season totals through that week ('total'),
+    along with the owner names at the time. All records are indexed by week when the store is opened.
+    """
+
+    def __init__(self, league_dir, year):
+        self.year = year
+        self.path = os.path.join(league_dir, RANKINGS_FILENAME.format(year))
+
+        # week -> latest record for that week
+        self._index = {}
+
+        # set when an interrupted append left a partial last line, so the next record starts on a fresh one
+        self._torn_tail = False
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as infile:
+                for line in infile:
+                    self._torn_tail = not line.endswith('\n')
+
+                    try:
+                        record = json.loads(line)
+
+                    # an interrupted append leaves at most one partial line at the end
+                    except ValueError:
+                        continue
+
+                    self._index[record['week']] = record
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, week):
+        return week == 0 or week in self._index
+
+    def latest_week(self):
+        """Returns the last week with a record, 0 if there are none"""
+
+        return max(self._index, default=0)
+
+    def record(self, week):
+        """Returns the record for a week, or None"""
+
+        return self._index.get(week)
+
+    def totals(self, week):
+        """Returns cumulative expected wins through the given week
+        :param week: int, 0 for before the season
+        :return: dict, team id to expected wins; empty for week 0, None if the week has no record
+        """
+
+        if week == 0:
+            return {}
+
+        record = self._index.get(week)
+
+        if record is None:
+            return None
+
+        return {int(team_id): total for team_id, total in record['total'].items()}
+
+    def append_week(self, week, ew, totals, owners):
+        """Atomically appends one week's results
+        :param week: int
+        :param ew: dict, team id to expected wins earned this week
+        :param totals: dict, team id to cumulative expected wins through this week
+        :param owners: dict, team id to owner name
+        """
+
+        record = {
+            'week': week,
+            'ew': {str(team_id): round(value, 6) for team_id, value in ew.items()},
+            'total': {str(team_id): round(value, 6) for team_id, value in totals.items()},
+            'owners': {str(team_id): owner for team_id, owner in owners.items()},
+        }
+
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        prefix = b'\n' if self._torn_tail else b''
+
+        # a single O_APPEND write either lands whole or is dropped as a partial line when read back
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, prefix + line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        self._torn_tail = False
+
+        self._index[week] = json.loads(line.decode('utf-8'))
+
+    def import_csv_files(self, filepaths, owner_to_team_id):
+        """Imports the legacy <League>-NN.csv files of cumulative owner,expected wins rows
+        :param filepaths: list of paths to the weekly files
+        :param owner_to_team_id: dict, owner name to espn team id; rows of other owners are skipped
+        :return: int, number of weeks imported
+        """
+
+        weekly_totals = {}
+
+        for filepath in filepaths:
+            match = LEGACY_FILE_PATTERN.search(filepath)
+
+            if match is None:
+                continue
+
+            totals = weekly_totals[int(match.group(1))] = {}
+
+            with open(filepath, 'r') as infile:
+                for row in csv.reader(infile):
+                    if not row:
+                        continue
+
+                    # owners who have since left the league have no team to file their totals under
+                    if row[0] not in owner_to_team_id:
+                        logger.warning('Skipping {} in {}: no longer in the league'.format(row[0], filepath))
+                        continue
+
+                    totals[owner_to_team_id[row[0]]] = float(row[1])
+
+        team_id_to_owner = {team_id: owner for owner, team_id in owner_to_team_id.items()}
+        previous = {}
+        imported = 0
+
+        for week in sorted(weekly_totals):
+            totals = weekly_totals[week]
+
+            # week 0 files only hold the starting zeros
+            if week > 0:
+                ew = {team_id: total - previous.get(team_id, 0.0) for team_id, total in totals.items()}
+                self.append_week(week, ew, totals, {team_id: team_id_to_owner[team_id] for team_id in totals})
+                imported += 1
+
+            previous = totals
+
+        return imported
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+# opponent matrices are (teams, weeks) rows of each team's opponent, with this for a bye or an unknown game
+NO_OPPONENT = -1
+
+
+def opponent_scores(scores, opponents):
+    """Returns the score of each team's opponent in every week
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of opponent rows
+    :return: float array shaped like scores; a team's own score where it had no opponent
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    playing = opponents >= 0
+
+    own_rows = np.arange(scores.shape[0])[:, None]
+    rows = np.where(playing, opponents, own_rows)
+
+    return scores[rows, np.arange(scores.shape[1])]
+
+
+def weekly_results(scores, opponents):
+    """Returns each team's actual result in every week
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of opponent rows
+    :return: tuple of int arrays (wins, losses, ties) shaped like scores; all zero for a week without a game
+    """
+
+    playing = opponents >= 0
+    theirs = opponent_scores(scores, opponents)
+
+    wins = (scores > theirs) & playing
+    losses = (scores < theirs) & playing
+    ties = (scores == theirs) & playing
+
+    return wins.astype(int), losses.astype(int), ties.astype(int)
+
+
+def margins_of_victory(scores, opponents):
+    """Returns each team's score minus its opponent's, 0 for a week without a game
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of opponent rows
+    :return: float array shaped like scores
+    """
+
+    return np.asarray(scores, dtype=float) - opponent_scores(scores, opponents)
+
+
+def power_points(scores, opponents, week):
+    """Returns ESPN's power ranking points through a week, as espnff's League.power_rankings() computes them
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of opponent rows
+    :param week: int, last week included
+    :return: float array, points per team, rounded to 2 places
+
+    80% two-step dominance (wins, plus the wins of the teams beaten), 15% average score and 5% average
+    margin of victory, with the averages truncated to whole numbers.
+    """
+
+    scores = np.asarray(scores, dtype=float)[:, :week]
+    opponents = opponents[:, :week]
+    number_teams = scores.shape[0]
+
+    wins = weekly_results(scores, opponents)[0]
+    margins = margins_of_victory(scores, opponents)
+
+    # beat[i, j] is how many times team i beat team j
+    beat = np.zeros((number_teams, number_teams))
+    rows = np.broadcast_to(np.arange(number_teams)[:, None], opponents.shape)
+    np.add.at(beat, (rows[wins > 0], opponents[wins > 0]), 1)
+
+    dominance = (beat.dot(beat) + beat).sum(axis=1)
+
+    points = dominance * 0.8 + np.trunc(scores.sum(axis=1) / week) * 0.15 + np.trunc(margins.sum(axis=1) / week) * 0.05
+
+    return np.round(points, 2)
+
+
+def power_rankings(scores, opponents, week):
+    """Returns teams in ESPN power ranking order through a week
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of opponent rows
+    :param week: int, last week included
+    :return: list of (row, points), highest points first; equal points keep row order, as espnff does
+    """
+
+    points = power_points(scores, opponents, week)
+    order = np.argsort(-points, kind='mergesort')
+
+    return [(int(row), float(points[row])) for row in order]
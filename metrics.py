@@ -0,0 +1,273 @@
+import os
+import time
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+
+# per-session cProfile dumps go here; sessions opt in with ?profile=1 on the page url. Empty turns profiling off
+PROFILE_DIR = os.environ.get('FFL_PROFILE_DIR', '')
+
+# upper bounds in seconds of the stage timing histogram buckets, as Prometheus expects them
+TIMING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the version of the Prometheus text format render() writes
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+
+def resident_bytes():
+    """Returns this process's resident memory, or None where /proc isn't available"""
+
+    try:
+        with open('/proc/self/statm', 'r') as infile:
+            return int(infile.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _StageTimings:
+    """Running totals of how long one stage took, one histogram bucket per TIMING_BUCKETS bound"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(TIMING_BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+
+        for i, bound in enumerate(TIMING_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRegistry:
+    """Stage timings, session counts and whatever other modules report, for one server process
+
+    Modules with counters of their own (e.g. the league cache) register a collector instead of reporting
+    every change; collectors are only called when the metrics are rendered.
+    """
+
+    def __init__(self):
+        # stage -> _StageTimings
+        self._stages = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+        self.active_sessions = 0
+        self.sessions_started = 0
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            timings = self._stages.get(stage)
+
+            if timings is None:
+                timings = self._stages[stage] = _StageTimings()
+
+            timings.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage, profile=None):
+        """Times the enclosed block under stage, whether or not it raises
+        :param stage: str, label the time is recorded under
+        :param profile: SessionProfile, optional; profiles the block as well
+        """
+
+        if profile is not None:
+            profile.enable()
+
+        start = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+            if profile is not None:
+                profile.disable()
+
+    def session_started(self):
+        with self._lock:
+            self.active_sessions += 1
+            self.sessions_started += 1
+
+    def session_ended(self):
+        with self._lock:
+            self.active_sessions -= 1
+
+    def register_collector(self, collector):
+        """Adds a source of metrics to render()
+        :param collector: callable() returning an iterable of (name, type, help, value) samples, where
+        type is 'counter' or 'gauge'
+        """
+
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Returns every metric in the Prometheus text format
+        :return: string
+        """
+
+        with self._lock:
+            stages = sorted((stage, timings.count, timings.total, list(timings.buckets))
+                            for stage, timings in self._stages.items())
+            collectors = list(self._collectors)
+            samples = [
+                ('ffl_sessions_active', 'gauge', 'Sessions open on this process', self.active_sessions),
+                ('ffl_sessions_total', 'counter', 'Sessions started on this process', self.sessions_started),
+            ]
+
+        resident = resident_bytes()
+
+        if resident is not None:
+            samples.append(('ffl_process_resident_bytes', 'gauge', 'Resident memory of this process', resident))
+
+        for collector in collectors:
+            try:
+                samples.extend(collector())
+
+            # one broken collector shouldn't take the whole endpoint down
+            except Exception:
+                logger.exception('Metrics collector {!r} failed'.format(collector))
+
+        lines = [
+            '# HELP ffl_stage_seconds Time spent in each stage of loading and showing a league',
+            '# TYPE ffl_stage_seconds histogram',
+        ]
+
+        for stage, count, total, buckets in stages:
+            for bound, bucket_count in zip(TIMING_BUCKETS, buckets):
+                lines.append('ffl_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(stage, bound, bucket_count))
+
+            lines.append('ffl_stage_seconds_bucket{{stage="{}",le="+Inf"}} {}'.format(stage, count))
+            lines.append('ffl_stage_seconds_sum{{stage="{}"}} {!r}'.format(stage, total))
+            lines.append('ffl_stage_seconds_count{{stage="{}"}} {}'.format(stage, count))
+
+        for name, kind, help_text, value in samples:
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            lines.append('{} {}'.format(name, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+# the process-wide registry every module reports to; /metrics renders it
+registry = MetricsRegistry()
+
+
+def timed(stage, profile=None):
+    """Times a block under stage in the process-wide registry; see MetricsRegistry.timed()"""
+
+    return registry.timed(stage, profile)
+
+
+def instrumented(stage):
+    """Decorator timing every call of a function under stage"""
+
+    def decorate(fn):
+        @wraps(fn)
+        def timed_fn(*args, **kwargs):
+            with registry.timed(stage):
+                return fn(*args, **kwargs)
+
+        return timed_fn
+
+    return decorate
+
+
+class SessionProfile:
+    """cProfile of the server-side work done for one session, written out when the session ends
+
+    Only work on the server's IO loop is profiled; loads and simulations on worker threads show up in
+    the stage timings instead. Nested timed blocks keep the profiler running until the outermost ends.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.profile = cProfile.Profile()
+        self._depth = 0
+
+    def enable(self):
+        if self._depth == 0:
+            self.profile.enable()
+
+        self._depth += 1
+
+    def disable(self):
+        self._depth -= 1
+
+        if self._depth == 0:
+            self.profile.disable()
+
+    def dump(self, directory=PROFILE_DIR):
+        """Writes the profile to <directory>/<session id>.prof, readable with pstats or snakeviz
+        :return: path written
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '{}.prof'.format(self.session_id))
+        self.profile.dump_stats(path)
+
+        return path
+
+
+# session id -> SessionProfile for sessions being profiled
+_session_profiles = {}
+_session_profiles_lock = threading.Lock()
+
+
+def start_session_profile(session_context):
+    """Starts profiling a session if profiling is on and the page asked for it with ?profile=1
+    :param session_context: bokeh SessionContext of the new session
+    :return: SessionProfile, or None if the session isn't profiled
+    """
+
+    if not PROFILE_DIR or session_context is None or session_context.request is None:
+        return None
+
+    if session_context.request.arguments.get('profile') not in ([b'1'], ['1']):
+        return None
+
+    profile = SessionProfile(session_context.id)
+
+    with _session_profiles_lock:
+        _session_profiles[session_context.id] = profile
+
+    return profile
+
+
+def get_session_profile(session_context):
+    """Returns the SessionProfile of a session, or None if it isn't being profiled"""
+
+    if session_context is None:
+        return None
+
+    with _session_profiles_lock:
+        return _session_profiles.get(session_context.id)
+
+
+def finish_session_profile(session_context):
+    """Writes out and forgets a session's profile, if it had one
+    :return: path written, or None
+    """
+
+    with _session_profiles_lock:
+        profile = _session_profiles.pop(session_context.id, None)
+
+    if profile is None:
+        return None
+
+    try:
+        return profile.dump()
+
+    except OSError:
+        logger.exception('Could not write the profile of session {}'.format(session_context.id))
+        return None
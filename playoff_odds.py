@@ -0,0 +1,147 @@
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from metrics import instrumented
+
+
+# simulations per call for the explorer
+PLAYOFF_SIMS = int(os.environ.get('FFL_PLAYOFF_SIMS', 100000))
+
+# worker processes to spread simulations over; 0 runs them in the calling process
+SIM_PROCESSES = int(os.environ.get('FFL_SIM_PROCESSES', 0))
+
+# simulations drawn at once; bounds memory at roughly batch * teams * remaining weeks floats
+SIM_BATCH = 20000
+
+
+def estimate_score_distributions(scores):
+    """Returns the mean and standard deviation of each team's weekly score
+    :param scores: (teams, weeks) array of weekly scores
+    :return: tuple of (teams,) arrays; teams with fewer than two weeks use the league-wide spread
+    """
+
+    number_teams, number_weeks = scores.shape
+
+    if number_weeks == 0:
+        return np.zeros(number_teams), np.zeros(number_teams)
+
+    means = scores.mean(axis=1)
+
+    if number_weeks < 2:
+        return means, np.full(number_teams, scores.std())
+
+    return means, scores.std(axis=1, ddof=1)
+
+
+def simulate_seed_counts(means, stds, opponents, wins, points, n_sims, seed=None):
+    """Plays out the remaining schedule n_sims times and counts how often each team lands in each seed
+    :param means: (teams,) array of expected weekly scores
+    :param stds: (teams,) array of weekly score standard deviations
+    :param opponents: (teams, remaining weeks) int array of opponent rows, -1 for a bye
+    :param wins: (teams,) array of wins so far
+    :param points: (teams,) array of points scored so far, the tiebreaker on equal wins
+    :param n_sims: int
+    :param seed: int, optional; seeds the random draws
+    :return: (teams, teams) int array; [i, s] is the number of simulations team i finished in seed s + 1
+    """
+
+    rng = np.random.RandomState(seed)
+    number_teams, number_weeks = opponents.shape
+
+    playing = opponents >= 0
+    opponent_rows = np.where(playing, opponents, 0)
+    week_cols = np.arange(number_weeks)
+
+    counts = np.zeros(number_teams * number_teams, dtype=np.int64)
+    seed_slots = np.arange(number_teams)
+
+    for start in range(0, n_sims, SIM_BATCH):
+        batch = min(SIM_BATCH, n_sims - start)
+
+        # (batch, teams, weeks) scores for every remaining week
+        sim_scores = means[:, None] + stds[:, None] * rng.standard_normal((batch, number_teams, number_weeks))
+        opp_scores = sim_scores[:, opponent_rows, week_cols]
+
+        sim_wins = ((sim_scores > opp_scores) + 0.5 * (sim_scores == opp_scores)) * playing
+        final_wins = wins + sim_wins.sum(axis=-1)
+        final_points = points + sim_scores.sum(axis=-1)
+
+        # most wins first, points for breaking ties
+        standings = np.lexsort((-final_points, -final_wins), axis=-1)
+
+        counts += np.bincount((standings * number_teams + seed_slots).ravel(), minlength=counts.size)
+
+    return counts.reshape(number_teams, number_teams)
+
+
+def _simulate_chunk(args):
+    # process pool entry point
+    return simulate_seed_counts(*args)
+
+
+_sim_pool = None
+_sim_pool_lock = threading.Lock()
+
+
+def get_sim_pool(processes):
+    """Returns the process pool shared by the simulations, started on first use"""
+
+    global _sim_pool
+
+    with _sim_pool_lock:
+        if _sim_pool is None:
+            _sim_pool = ProcessPoolExecutor(max_workers=processes)
+
+    return _sim_pool
+
+
+@instrumented('playoff_odds')
+def simulate_playoff_odds(season, n_sims=PLAYOFF_SIMS, processes=SIM_PROCESSES, seed=None):
+    """Returns each team's probability of finishing the regular season in each seed
+    :param season: structures.LeagueSeason
+    :param n_sims: int, number of simulated seasons
+    :param processes: int, worker processes to split the simulations over; 0 for none
+    :param seed: int, optional; makes the result reproducible for a given number of processes
+    :return: (teams, teams) float array; [i, s] is the probability team i finishes in seed s + 1
+    """
+
+    means, stds = estimate_score_distributions(season.scores)
+    opponents = season.opponents[:, season.latest_week:]
+    wins = season.wins.astype(float)
+    points = season.scores.sum(axis=1)
+
+    if processes < 2 or opponents.shape[1] == 0:
+        counts = simulate_seed_counts(means, stds, opponents, wins, points, n_sims, seed)
+
+    else:
+        chunk_seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=processes)
+        chunk_sizes = [n_sims // processes + (i < n_sims % processes) for i in range(processes)]
+        jobs = [(means, stds, opponents, wins, points, size, int(chunk_seed))
+                for size, chunk_seed in zip(chunk_sizes, chunk_seeds)]
+
+        counts = sum(get_sim_pool(processes).map(_simulate_chunk, jobs))
+
+    return counts / float(n_sims)
+
+
+# league-season -> odds; league-seasons are shared between sessions and never modified, so neither are the odds
+_odds_memo = weakref.WeakKeyDictionary()
+_odds_memo_lock = threading.Lock()
+
+
+def get_playoff_odds(season):
+    """Returns simulate_playoff_odds() for a league-season, computing it only once per season object"""
+
+    with _odds_memo_lock:
+        odds = _odds_memo.get(season)
+
+    if odds is None:
+        odds = simulate_playoff_odds(season)
+        odds.flags.writeable = False
+
+        with _odds_memo_lock:
+            _odds_memo[season] = odds
+
+    return odds
@@ -0,0 +1,170 @@
+"""Lightweight HTTP access to a league's standings, served by serve.py next to the explorer.
+
+    GET /api/rankings/<league_id>/<year>?week=<week>&format=json|csv
+
+Returns the Summary table through the given week (the latest by default), with the weekly scores and
+running expected wins behind it. Responses carry an ETag worked out from the league data without
+rendering anything, so a client polling with If-None-Match gets a bare 304 until a new week arrives.
+"""
+import io
+import csv
+import json
+import hashlib
+import threading
+import weakref
+from tornado import gen
+from tornado.web import RequestHandler
+from espnff import PrivateLeagueException, InvalidLeagueException, UnknownLeagueException
+from league_cache import league_cache, load_in_background
+from metrics import timed
+
+FORMATS = {
+    'json': 'application/json; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+# league-season -> digest of its data; seasons are never modified, so neither is the digest
+_digest_memo = weakref.WeakKeyDictionary()
+_digest_memo_lock = threading.Lock()
+
+
+def season_digest(season):
+    """Returns a hash of everything a league-season's rankings are built from, computed once per season object"""
+
+    with _digest_memo_lock:
+        digest = _digest_memo.get(season)
+
+    if digest is None:
+        hasher = hashlib.sha1()
+        # completion changes the payload even when the scores don't, e.g. once the last week is final
+        hasher.update(json.dumps([season.name, season.owners, bool(season.complete),
+                                  season.playoff_teams]).encode('utf-8'))
+
+        for array in (season.scores, season.wins, season.opponents):
+            hasher.update(array.tobytes())
+
+        digest = hasher.hexdigest()
+
+        with _digest_memo_lock:
+            _digest_memo[season] = digest
+
+    return digest
+
+
+def rankings_etag(season, week, fmt):
+    """Returns the ETag of a rankings response, as a quoted string
+    :param season: structures.LeagueSeason
+    :param week: int, last week included
+    :param fmt: str, key of FORMATS
+    """
+
+    return '"{}-{}-{}"'.format(season_digest(season)[:20], week, fmt)
+
+
+def rankings_data(season, week):
+    """Returns the rankings of a league-season through a week
+    :param season: structures.LeagueSeason
+    :param week: int, last week included
+    :return: dict; rankings holds one dict per team, best expected wins first, and scores / expected_wins
+    hold each owner's weekly scores and running expected wins through week, in owners order
+    """
+
+    table = season.window_table(1, week)
+
+    return dict(
+        league_id=int(season.league_id),
+        year=int(season.year),
+        name=season.name,
+        week=week,
+        complete=bool(season.complete and week == season.latest_week),
+        rankings=[dict(zip(table, values)) for values in zip(*table.values())],
+        owners=list(season.owners),
+        scores=season.scores[:, :week].tolist(),
+        expected_wins=season.cumul_ew[:, 1:week + 1].round(3).tolist()
+    )
+
+
+def rankings_csv(data):
+    """Returns rankings_data() as csv: a row per team in rankings order, followed by its weekly scores and
+    running expected wins
+    """
+
+    weeks = range(1, data['week'] + 1)
+    owner_rows = {owner: idx for idx, owner in enumerate(data['owners'])}
+    columns = list(data['rankings'][0]) if data['rankings'] else []
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns + ['score_{}'.format(wk) for wk in weeks] + ['ew_{}'.format(wk) for wk in weeks])
+
+    for ranking in data['rankings']:
+        idx = owner_rows[ranking['owner']]
+        writer.writerow([ranking[col] for col in columns] + data['scores'][idx] + data['expected_wins'][idx])
+
+    return out.getvalue()
+
+
+class RankingsHandler(RequestHandler):
+    """Serves rankings_data() for /api/rankings/<league_id>/<year> as json or csv"""
+
+    def compute_etag(self):
+        # set before the body is rendered, so tornado doesn't hash the body for one
+        return None
+
+    def send_json_error(self, status, message):
+        self.set_status(status)
+        self.set_header('Content-Type', FORMATS['json'])
+        self.finish(json.dumps(dict(error=message)))
+
+    @gen.coroutine
+    def get(self, league_id, year):
+        fmt = self.get_argument('format', 'json')
+
+        if fmt not in FORMATS:
+            self.send_json_error(400, 'format must be one of {}'.format(', '.join(sorted(FORMATS))))
+            return
+
+        # the same cache the explorer uses, which in turn looks in the cache shared between processes
+        season = league_cache.get(league_id, year)
+
+        if season is None:
+            try:
+                season = yield load_in_background(league_id, year)
+
+            except PrivateLeagueException:
+                self.send_json_error(403, 'League {} is not viewable by the public'.format(league_id))
+                return
+
+            except (InvalidLeagueException, UnknownLeagueException):
+                self.send_json_error(404, '{} season of league {} does not exist'.format(year, league_id))
+                return
+
+        try:
+            week = int(self.get_argument('week', season.latest_week))
+
+        except ValueError:
+            week = 0
+
+        if season.latest_week == 0:
+            self.send_json_error(404, 'No weeks of the {} season have been played'.format(year))
+            return
+
+        if not 1 <= week <= season.latest_week:
+            self.send_json_error(400, 'week must be from 1 to {}'.format(season.latest_week))
+            return
+
+        self.set_header('ETag', rankings_etag(season, week, fmt))
+        self.set_header('Cache-Control', 'no-cache')
+
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+
+        with timed('api_rankings'):
+            data = rankings_data(season, week)
+            body = json.dumps(data) if fmt == 'json' else rankings_csv(data)
+
+        self.set_header('Content-Type', FORMATS[fmt])
+        self.finish(body)
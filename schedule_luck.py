@@ -0,0 +1,170 @@
+import os
+import threading
+import weakref
+import numpy as np
+from metrics import instrumented
+from playoff_odds import SIM_PROCESSES, get_sim_pool
+
+
+# alternative schedules sampled per call for the explorer
+SCHEDULE_SAMPLES = int(os.environ.get('FFL_SCHEDULE_SAMPLES', 20000))
+
+# schedules evaluated at once; bounds memory at roughly batch * teams * weeks values
+SCHEDULE_BATCH = 5000
+
+
+def relabel_schedules(opponents, perms):
+    """Returns the league's schedule with its teams shuffled between schedule slots
+    :param opponents: (teams, weeks) int array of opponent rows, -1 for a bye
+    :param perms: (batch, teams) int array; team i plays the schedule of the team in row perms[b, i]
+    :return: (batch, teams, weeks) int array of opponent rows, -1 for a bye
+
+    Every relabelling of a valid schedule is itself valid: each team still has one game (or bye) a week.
+    """
+
+    batch = perms.shape[0]
+
+    # inverse[b, slot] is the team playing slot's schedule
+    inverse = np.argsort(perms, axis=-1)
+
+    slot_opponents = opponents[perms]
+    byes = slot_opponents < 0
+
+    relabelled = inverse[np.arange(batch)[:, None, None], np.where(byes, 0, slot_opponents)]
+
+    return np.where(byes, -1, relabelled)
+
+
+def random_pairings(rng, batch, number_teams, number_weeks):
+    """Returns schedules of independent random pairings, for leagues whose real schedule isn't known
+    :param rng: np.random.RandomState
+    :param batch: int
+    :param number_teams: int
+    :param number_weeks: int
+    :return: (batch, teams, weeks) int array of opponent rows, -1 for a bye with an odd number of teams
+    """
+
+    # shuffled teams play in consecutive pairs; with an odd count the last one sits out
+    order = np.argsort(rng.random_sample((batch, number_weeks, number_teams)), axis=-1)
+    paired = number_teams - number_teams % 2
+
+    partners = np.full(order.shape, -1, dtype=int)
+    partners[..., 0:paired:2] = order[..., 1:paired:2]
+    partners[..., 1:paired:2] = order[..., 0:paired:2]
+
+    opponents = np.empty(order.shape, dtype=int)
+    np.put_along_axis(opponents, order, partners, axis=-1)
+
+    return np.swapaxes(opponents, -1, -2)
+
+
+def sample_win_counts(scores, opponents, n_samples, seed=None):
+    """Replays every team's scores against sampled alternative schedules
+    :param scores: (teams, weeks) array of weekly scores
+    :param opponents: (teams, weeks) int array of the real opponent rows for those weeks, -1 for a bye or
+    unknown; if no opponent is known at all, schedules of random pairings are sampled instead
+    :param n_samples: int
+    :param seed: int, optional; seeds the sampling
+    :return: (teams, 2 * weeks + 1) int array; [i, k] is the number of schedules giving team i k / 2 wins
+    """
+
+    rng = np.random.RandomState(seed)
+    number_teams, number_weeks = scores.shape
+    known_schedule = (opponents >= 0).any()
+
+    bins = 2 * number_weeks + 1
+    counts = np.zeros(number_teams * bins, dtype=np.int64)
+    offsets = np.arange(number_teams) * bins
+    week_cols = np.arange(number_weeks)
+
+    for start in range(0, n_samples, SCHEDULE_BATCH):
+        batch = min(SCHEDULE_BATCH, n_samples - start)
+
+        if known_schedule:
+            perms = np.argsort(rng.random_sample((batch, number_teams)), axis=-1)
+            schedules = relabel_schedules(opponents, perms)
+
+        else:
+            schedules = random_pairings(rng, batch, number_teams, number_weeks)
+
+        playing = schedules >= 0
+        opp_scores = scores[np.where(playing, schedules, 0), week_cols]
+
+        # doubled so a tie's half win stays an integer
+        double_wins = (2 * (scores > opp_scores) + (scores == opp_scores)) * playing
+
+        counts += np.bincount((double_wins.sum(axis=-1) + offsets).ravel(), minlength=counts.size)
+
+    return counts.reshape(number_teams, bins)
+
+
+def _sample_chunk(args):
+    # process pool entry point
+    return sample_win_counts(*args)
+
+
+@instrumented('schedule_luck')
+def simulate_schedule_luck(season, n_samples=SCHEDULE_SAMPLES, processes=SIM_PROCESSES, seed=None):
+    """Returns the distribution of wins each team would have had under other schedules
+    :param season: structures.LeagueSeason
+    :param n_samples: int, number of sampled schedules
+    :param processes: int, worker processes to split the samples over; 0 for none
+    :param seed: int, optional; makes the result reproducible for a given number of processes
+    :return: (teams, 2 * weeks + 1) float array; [i, k] is the share of schedules giving team i k / 2 wins
+    """
+
+    opponents = season.opponents[:, :season.latest_week]
+
+    if processes < 2:
+        counts = sample_win_counts(season.scores, opponents, n_samples, seed)
+
+    else:
+        chunk_seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=processes)
+        chunk_sizes = [n_samples // processes + (i < n_samples % processes) for i in range(processes)]
+        jobs = [(season.scores, opponents, size, int(chunk_seed))
+                for size, chunk_seed in zip(chunk_sizes, chunk_seeds)]
+
+        counts = sum(get_sim_pool(processes).map(_sample_chunk, jobs))
+
+    return counts / float(n_samples)
+
+
+def summarize_schedule_luck(season, distribution):
+    """Returns summary statistics of a simulate_schedule_luck() distribution
+    :param season: structures.LeagueSeason
+    :param distribution: (teams, 2 * weeks + 1) array from simulate_schedule_luck()
+    :return: dict of (teams,) arrays: mean, low and high (5th / 95th percentile wins), and luck, the share
+    of schedules that would have given fewer wins than the team actually has
+    """
+
+    win_values = np.arange(distribution.shape[1]) / 2
+    cumulative = np.cumsum(distribution, axis=1)
+
+    # percentiles are the first win total reaching the wanted share of schedules
+    low = win_values[np.argmax(cumulative >= 0.05, axis=1)]
+    high = win_values[np.argmax(cumulative >= 0.95, axis=1)]
+
+    fewer = np.where(win_values[None, :] < season.wins[:, None], distribution, 0).sum(axis=1)
+
+    return dict(mean=distribution.dot(win_values), low=low, high=high, luck=fewer)
+
+
+# league-season -> distribution, as for playoff odds
+_luck_memo = weakref.WeakKeyDictionary()
+_luck_memo_lock = threading.Lock()
+
+
+def get_schedule_luck(season):
+    """Returns simulate_schedule_luck() for a league-season, computing it only once per season object"""
+
+    with _luck_memo_lock:
+        distribution = _luck_memo.get(season)
+
+    if distribution is None:
+        distribution = simulate_schedule_luck(season)
+        distribution.flags.writeable = False
+
+        with _luck_memo_lock:
+            _luck_memo[season] = distribution
+
+    return distribution
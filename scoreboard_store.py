@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+
+
+# finished weeks never change, so they are kept on disk and served from here instead of ESPN
+STORE_PATH = os.environ.get('FFL_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'ffl_store.sqlite3'))
+
+# run entirely from the store, without contacting ESPN
+OFFLINE_MODE = os.environ.get('FFL_OFFLINE', '0') not in ('', '0')
+
+
+# stand-ins for the espnff objects, with the attributes the rest of the app reads
+StoredTeam = namedtuple('StoredTeam', ['team_id', 'owner', 'team_name', 'wins', 'losses', 'schedule'])
+StoredSettings = namedtuple('StoredSettings', ['name', 'team_count', 'reg_season_count', 'final_season_count',
+                                               'playoff_team_count'])
+StoredMatchup = namedtuple('StoredMatchup', ['home_team', 'home_score', 'away_team', 'away_score'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leagues (
+    league_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    team_count INTEGER NOT NULL,
+    reg_season_count INTEGER NOT NULL,
+    final_season_count INTEGER NOT NULL,
+    playoff_team_count INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (league_id, year)
+);
+CREATE TABLE IF NOT EXISTS teams (
+    league_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    team_name TEXT NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    PRIMARY KEY (league_id, year, team_id)
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    league_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    opponent_id INTEGER NOT NULL,
+    PRIMARY KEY (league_id, year, team_id, week)
+);
+CREATE TABLE IF NOT EXISTS weeks (
+    league_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (league_id, year, week)
+);
+CREATE TABLE IF NOT EXISTS matchups (
+    league_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    home_id INTEGER NOT NULL,
+    home_score REAL NOT NULL,
+    away_id INTEGER,
+    away_score REAL,
+    PRIMARY KEY (league_id, year, week, slot)
+);
+'''
+
+
+class StoredLeague:
+    """A league-season read back from the store; quacks like espnff's League for offline use"""
+
+    def __init__(self, store, league_id, year, settings, teams):
+        self.store = store
+        self.league_id = league_id
+        self.year = year
+        self.settings = settings
+        self.teams = teams
+
+    def __repr__(self):
+        return 'StoredLeague({}, {})'.format(self.league_id, self.year)
+
+    def scoreboard(self, week=None):
+        matchups = self.store.load_weeks(self.league_id, self.year, [week], self.teams, include_live=True)
+
+        return matchups.get(week, [])
+
+
+class ScoreboardStore:
+    """SQLite store of league settings, teams and weekly matchups keyed by (league_id, year, week)
+
+    A connection is opened per call, so one store can be used from worker threads and forked processes.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+
+        with self._connect() as conn:
+            # readers in other processes don't block on a writer
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30))
+
+    def save_league(self, league):
+        """Records a league's settings and teams, replacing what was stored before
+        :param league: a League(league_id, year) object for espnff
+        """
+
+        league_id, year = int(league.league_id), int(league.year)
+        settings = league.settings
+
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO leagues VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (league_id, year, settings.name, settings.team_count, settings.reg_season_count,
+                          settings.final_season_count, settings.playoff_team_count, time.time()))
+            conn.execute('DELETE FROM teams WHERE league_id = ? AND year = ?', (league_id, year))
+            conn.executemany('INSERT INTO teams VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             [(league_id, year, tm.team_id, tm.owner, tm.team_name, tm.wins, tm.losses)
+                              for tm in league.teams])
+            conn.execute('DELETE FROM schedules WHERE league_id = ? AND year = ?', (league_id, year))
+            conn.executemany('INSERT INTO schedules VALUES (?, ?, ?, ?, ?)',
+                             [(league_id, year, tm.team_id, wk, opponent.team_id)
+                              for tm in league.teams for wk, opponent in enumerate(tm.schedule, 1)])
+
+    def load_league(self, league_id, year):
+        """Returns the stored league-season as a StoredLeague, or None if it was never saved"""
+
+        league_id, year = int(league_id), int(year)
+
+        with self._connect() as conn:
+            row = conn.execute('SELECT name, team_count, reg_season_count, final_season_count, playoff_team_count '
+                               'FROM leagues WHERE league_id = ? AND year = ?', (league_id, year)).fetchone()
+
+            if row is None:
+                return None
+
+            teams = [StoredTeam(*tm, schedule=[]) for tm in conn.execute(
+                'SELECT team_id, owner, team_name, wins, losses FROM teams '
+                'WHERE league_id = ? AND year = ? ORDER BY team_id', (league_id, year))]
+
+            # opponents are team objects, as in espnff; leagues stored before schedules were kept have none
+            id_to_team = {tm.team_id: tm for tm in teams}
+
+            for team_id, opponent_id in conn.execute(
+                    'SELECT team_id, opponent_id FROM schedules WHERE league_id = ? AND year = ? ORDER BY week',
+                    (league_id, year)):
+                id_to_team[team_id].schedule.append(id_to_team[opponent_id])
+
+        return StoredLeague(self, league_id, year, StoredSettings(*row), teams)
+
+    def save_week(self, league_id, year, week, matchups, complete):
+        """Records one week's matchups in a single transaction
+        :param league_id: int
+        :param year: int
+        :param week: int
+        :param matchups: list of espnff matchups from League.scoreboard()
+        :param complete: bool, whether the week's scores are final
+        """
+
+        league_id, year = int(league_id), int(year)
+
+        rows = [(league_id, year, week, slot, m.home_team.team_id, m.home_score,
+                 m.away_team.team_id if m.away_team is not None else None, m.away_score)
+                for slot, m in enumerate(matchups)]
+
+        with self._connect() as conn, conn:
+            conn.execute('DELETE FROM matchups WHERE league_id = ? AND year = ? AND week = ?',
+                         (league_id, year, week))
+            conn.executemany('INSERT INTO matchups VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('INSERT OR REPLACE INTO weeks VALUES (?, ?, ?, ?, ?)',
+                         (league_id, year, week, int(complete), time.time()))
+
+    def load_weeks(self, league_id, year, weeks, teams, include_live=False):
+        """Returns the stored matchups for the requested weeks
+        :param league_id: int
+        :param year: int
+        :param weeks: iterable of ints
+        :param teams: team objects with a team_id; stored ids are resolved to these
+        :param include_live: bool, also return weeks that were stored before their scores were final
+        :return: dict, week to list of StoredMatchup; weeks not in the store are absent
+        """
+
+        league_id, year = int(league_id), int(year)
+        weeks = list(weeks)
+        id_to_team = {tm.team_id: tm for tm in teams}
+
+        if not weeks:
+            return {}
+
+        placeholders = ', '.join('?' * len(weeks))
+
+        with self._connect() as conn:
+            stored = [wk for wk, complete in conn.execute(
+                'SELECT week, complete FROM weeks WHERE league_id = ? AND year = ? AND week IN ({})'.format(placeholders),
+                [league_id, year] + weeks) if complete or include_live]
+
+            matchups = {wk: [] for wk in stored}
+
+            for wk, home_id, home_score, away_id, away_score in conn.execute(
+                    'SELECT week, home_id, home_score, away_id, away_score FROM matchups '
+                    'WHERE league_id = ? AND year = ? AND week IN ({}) ORDER BY week, slot'.format(placeholders),
+                    [league_id, year] + weeks):
+
+                if wk in matchups:
+                    matchups[wk].append(StoredMatchup(id_to_team[home_id], home_score,
+                                                      id_to_team.get(away_id), away_score))
+
+        return matchups
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_store():
+    """Returns the process-wide store at STORE_PATH, or None if storing is turned off (FFL_STORE_PATH='')"""
+
+    global _default_store
+
+    if not STORE_PATH:
+        return None
+
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ScoreboardStore(STORE_PATH)
+
+    return _default_store
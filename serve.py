@@ -0,0 +1,66 @@
+"""Runs the explorer on a bokeh server, with Prometheus metrics at /metrics, the rankings api from
+rankings_api.py at /api/rankings and the pre-rendered reports from static_reports.py at /reports alongside it.
+
+    python serve.py --port 5006 --allow-websocket-origin localhost:5006
+
+Takes the same options as the `bokeh serve` line it replaces in the Procfile. With more than one process each
+keeps its own metrics, and /metrics reports whichever process answers it.
+"""
+import os
+import sys
+import argparse
+from tornado.web import RequestHandler
+from bokeh.application import Application
+from bokeh.application.handlers import ScriptHandler, ServerLifecycleHandler
+from bokeh.server.server import Server
+from metrics import CONTENT_TYPE, registry
+from rankings_api import RankingsHandler
+from static_reports import REPORTS_DIR, ReportHandler
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class MetricsHandler(RequestHandler):
+    """Serves this process's metrics in the Prometheus text format"""
+
+    def get(self):
+        self.set_header('Content-Type', CONTENT_TYPE)
+        self.write(registry.render())
+
+
+def make_application():
+    """Returns the explorer app: explore.py run for every session, with the hooks in server_lifecycle.py"""
+
+    return Application(ScriptHandler(filename=os.path.join(APP_DIR, 'explore.py')),
+                       ServerLifecycleHandler(filename=os.path.join(APP_DIR, 'server_lifecycle.py')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the ESPN Fantasy Football League Explorer.')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5006)))
+    parser.add_argument('--address', default=None)
+    parser.add_argument('--allow-websocket-origin', action='append', default=None)
+    parser.add_argument('--num-procs', type=int, default=1, help='server processes; 0 for one per cpu')
+    parser.add_argument('--use-xheaders', action='store_true', help='trust X-Real-Ip / X-Forwarded-For')
+    args = parser.parse_args(argv)
+
+    extra_patterns = [
+        ('/metrics', MetricsHandler),
+        (r'/api/rankings/(\d+)/(\d+)', RankingsHandler),
+    ]
+
+    if REPORTS_DIR:
+        extra_patterns.append((r'/reports/(\d+)/(\d+)\.(html|json)', ReportHandler))
+
+    server = Server({'/explore': make_application()}, port=args.port, address=args.address,
+                    allow_websocket_origin=args.allow_websocket_origin, num_procs=args.num_procs,
+                    use_xheaders=args.use_xheaders, extra_patterns=extra_patterns)
+
+    server.start()
+    server.io_loop.start()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
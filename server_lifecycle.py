@@ -0,0 +1,22 @@
+"""Session hooks for the explorer, loaded by serve.py next to explore.py"""
+from league_cache import league_cache
+from metrics import registry, start_session_profile, finish_session_profile
+from sessions import end_session
+
+
+def on_session_created(session_context):
+    registry.session_started()
+
+    # make room before the new session starts building its page
+    league_cache.enforce_memory_budget()
+
+    # explore.py picks the profile up by session id once it runs
+    start_session_profile(session_context)
+
+
+def on_session_destroyed(session_context):
+    registry.session_ended()
+
+    # stops the session's background work and drops what it built; explore.py registered how
+    end_session(session_context)
+    finish_session_profile(session_context)
@@ -0,0 +1,84 @@
+import sys
+import weakref
+import threading
+import numpy as np
+from bokeh.models import ColumnDataSource
+from metrics import registry
+
+
+# session id -> document, and document -> weak reference to its cleanup callable, for the sessions open on this
+# process. Both are held weakly: the cleanup only runs where server_lifecycle.py is loaded, e.g. not under a plain
+# `bokeh serve explore.py`, and there the entries go away with the session's document instead of keeping it alive
+_sessions = weakref.WeakValueDictionary()
+_cleanups = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+def register_session(doc, cleanup):
+    """Has cleanup() run when the session showing doc ends
+    :param doc: bokeh Document of the session; documents without a session, e.g. in the benchmarks, are ignored
+    :param cleanup: callable(), releases whatever the session holds; the caller keeps it alive, e.g. as a function
+    of the session's own module
+    """
+
+    if doc.session_context is None:
+        return
+
+    with _sessions_lock:
+        _sessions[doc.session_context.id] = doc
+        _cleanups[doc] = weakref.ref(cleanup)
+
+
+def end_session(session_context):
+    """Runs the cleanup registered for a session that has ended, and forgets the session"""
+
+    with _sessions_lock:
+        doc = _sessions.pop(session_context.id, None)
+        cleanup_ref = _cleanups.pop(doc, None) if doc is not None else None
+
+    cleanup = cleanup_ref() if cleanup_ref is not None else None
+
+    if cleanup is not None:
+        cleanup()
+
+
+def _value_bytes(value):
+    # rough size of a column value, following nested lists
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_value_bytes(item) for item in value)
+
+    return sys.getsizeof(value)
+
+
+def session_data_bytes(doc):
+    """Returns an estimate of the memory held by a session's data sources
+
+    League-seasons themselves are shared by every session showing them and counted by the league cache
+    instead; this is what each session builds on top of them for its page.
+    """
+
+    return sum(_value_bytes(column) for source in doc.select(dict(type=ColumnDataSource))
+               for column in source.data.values())
+
+
+def collect_metrics():
+    """Returns the memory held by open sessions as samples for metrics.MetricsRegistry.register_collector()"""
+
+    with _sessions_lock:
+        docs = list(_sessions.values())
+
+    sizes = [session_data_bytes(doc) for doc in docs]
+
+    return [
+        ('ffl_session_data_bytes', 'gauge', 'Memory held by the data sources of every open session', sum(sizes)),
+        ('ffl_session_data_bytes_avg', 'gauge', 'Memory held by the data sources of an open session, on average',
+         sum(sizes) // len(sizes) if sizes else 0),
+        ('ffl_session_data_bytes_max', 'gauge', 'Memory held by the data sources of the largest open session',
+         max(sizes) if sizes else 0),
+    ]
+
+
+registry.register_collector(collect_metrics)
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import numpy as np
+from structures import LeagueSeason
+
+
+# every server process on the machine reads and writes compiled league-seasons here
+SHARED_CACHE_DIR = os.environ.get('FFL_SHARED_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                       'ffl_shared_cache'))
+
+# matrices written for each league-season, one .npy file apiece so they can be memory-mapped; the derived ones
+# are handed to LeagueSeason as they are instead of being worked out again in every process
+DERIVED_NAMES = ('weekly_ew', 'cumul_ew', 'ranks', 'standings', 'standings_order')
+ARRAY_NAMES = ('scores', 'wins', 'opponents') + DERIVED_NAMES
+
+# written into every index entry; entries of another format are ignored, and replaced by the next put()
+CACHE_FORMAT = 2
+
+# seconds before a version directory no index entry names is taken as abandoned rather than still being written
+STALE_VERSION_AGE = 300
+
+logger = logging.getLogger(__name__)
+
+
+class SharedLeagueCache:
+    """League-seasons compiled by any process, kept as memory-mapped columnar files
+
+    Each league-season is a directory of .npy matrices plus a small json index entry naming the current
+    directory, its metadata and when it expires. A new version is written to a fresh directory and the
+    index entry is swapped in with an atomic rename, so readers never see a half-written league; they map
+    the arrays read-only, so every process shares the same pages of memory.
+    """
+
+    def __init__(self, directory=SHARED_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.remove_stale_versions()
+
+    def _index_path(self, league_id, year):
+        return os.path.join(self.directory, '{}-{}.json'.format(int(league_id), int(year)))
+
+    def get(self, league_id, year):
+        """Returns the shared copy of a league-season, or None if absent or expired
+        :param league_id: int or str
+        :param year: int or str
+        :return: structures.LeagueSeason backed by memory-mapped arrays
+        """
+
+        return self.get_entry(league_id, year)[0]
+
+    def get_entry(self, league_id, year):
+        """Returns the shared copy of a league-season along with when it goes stale, as get() does
+        :param league_id: int or str
+        :param year: int or str
+        :return: tuple (structures.LeagueSeason, expires), expires being as given to put(); (None, None) if
+        absent or expired
+        """
+
+        try:
+            with open(self._index_path(league_id, year), 'r') as infile:
+                meta = json.load(infile)
+
+            if meta.get('format') != CACHE_FORMAT:
+                return None, None
+
+            if meta['expires'] is not None and meta['expires'] <= time.time():
+                return None, None
+
+            version_dir = os.path.join(self.directory, meta['version'])
+            arrays = {name: np.load(os.path.join(version_dir, name + '.npy'), mmap_mode='r') for name in ARRAY_NAMES}
+
+        # missing, or replaced by another process between reading the index and mapping the files
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+        season = LeagueSeason(meta['league_id'], meta['year'], meta['name'], meta['team_ids'], meta['owners'],
+                              arrays['scores'], arrays['wins'], meta['complete'],
+                              derived={name: arrays[name] for name in DERIVED_NAMES},
+                              opponents=arrays['opponents'], playoff_teams=meta['playoff_teams'])
+
+        return season, meta['expires']
+
+    def put(self, league_id, year, season, expires=None):
+        """Publishes a league-season to every process, replacing any previous version
+        :param league_id: int or str
+        :param year: int or str
+        :param season: structures.LeagueSeason
+        :param expires: time.time() after which the copy is stale, or None if it never is
+        """
+
+        index_path = self._index_path(league_id, year)
+        prefix = '{}-{}.'.format(int(league_id), int(year))
+        version_dir = tempfile.mkdtemp(prefix=prefix, dir=self.directory)
+
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(version_dir, name + '.npy'), np.ascontiguousarray(getattr(season, name)))
+
+        meta = {
+            'format': CACHE_FORMAT,
+            'version': os.path.basename(version_dir),
+            'league_id': int(season.league_id),
+            'year': int(season.year),
+            'name': season.name,
+            'team_ids': season.team_ids,
+            'owners': season.owners,
+            'complete': bool(season.complete),
+            'playoff_teams': season.playoff_teams,
+            'expires': expires,
+        }
+
+        previous = self._read_version(index_path)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'w') as outfile:
+            json.dump(meta, outfile)
+
+        os.replace(tmp_path, index_path)
+
+        # processes that already mapped the old version keep their open files; new readers only see this one
+        if previous is not None:
+            shutil.rmtree(os.path.join(self.directory, previous), ignore_errors=True)
+
+        # versions of this league-season lost to a concurrent put(), whose index entry this one replaced
+        self.remove_stale_versions(prefix)
+
+    def remove_stale_versions(self, prefix=''):
+        """Deletes version directories no index entry names, and temporary files left behind; e.g. from two
+        processes publishing the same league-season at once, or one dying part way through put()
+        :param prefix: str, only looks at the files of the league-season put() names with it
+        :return: int, number of files and directories removed
+        """
+
+        try:
+            names = [name for name in os.listdir(self.directory) if name.startswith(prefix)]
+
+        except OSError:
+            return 0
+
+        referenced = {self._read_version(os.path.join(self.directory, name)) for name in names
+                      if name.endswith('.json')}
+
+        # anything newer may belong to a put() still running in another process
+        cutoff = time.time() - STALE_VERSION_AGE
+        removed = 0
+
+        for name in names:
+            if name.endswith('.json') or name in referenced:
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+
+                else:
+                    os.remove(path)
+
+            # already removed by another process
+            except OSError:
+                continue
+
+            removed += 1
+
+        return removed
+
+    @staticmethod
+    def _read_version(index_path):
+        try:
+            with open(index_path, 'r') as infile:
+                return json.load(infile)['version']
+
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def invalidate(self, league_id, year):
+        try:
+            os.remove(self._index_path(league_id, year))
+        except FileNotFoundError:
+            pass
+
+
+class InProcessSharedCache:
+    """Stand-in for SharedLeagueCache keeping league-seasons in a dict, e.g. to share one between several
+    LeagueCaches in tests without touching the disk
+
+    The seasons themselves are kept rather than memory-mapped copies, but get_entry(), get(), put() and
+    invalidate() behave as SharedLeagueCache's do.
+    """
+
+    def __init__(self):
+        # (league_id, year) -> (season, expires)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, league_id, year):
+        return self.get_entry(league_id, year)[0]
+
+    def get_entry(self, league_id, year):
+        with self._lock:
+            entry = self._entries.get((int(league_id), int(year)))
+
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None, None
+
+        return entry
+
+    def put(self, league_id, year, season, expires=None):
+        with self._lock:
+            self._entries[(int(league_id), int(year))] = (season, expires)
+
+    def invalidate(self, league_id, year):
+        with self._lock:
+            self._entries.pop((int(league_id), int(year)), None)
+
+
+_default_shared_cache = None
+_default_shared_cache_lock = threading.Lock()
+
+
+def default_shared_cache():
+    """Returns the cache at SHARED_CACHE_DIR, or None if sharing is turned off (FFL_SHARED_CACHE_DIR='')"""
+
+    global _default_shared_cache
+
+    if not SHARED_CACHE_DIR:
+        return None
+
+    with _default_shared_cache_lock:
+        if _default_shared_cache is None:
+            try:
+                _default_shared_cache = SharedLeagueCache(SHARED_CACHE_DIR)
+
+            # e.g. a read-only filesystem; each process keeps its own cache instead
+            except OSError:
+                logger.exception('Shared league cache unavailable at {}'.format(SHARED_CACHE_DIR))
+                return None
+
+    return _default_shared_cache
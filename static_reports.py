@@ -0,0 +1,256 @@
+"""Pre-rendered, read-only reports of a league-season for visitors who only look at the charts.
+
+A report is the Scores, Expected Wins and Summary tabs as one standalone HTML page, plus the same document as
+JSON for embedding elsewhere. The week slider and Summary week picker still work, since filtering happens in
+the browser, but no server session is held. Reports are only rebuilt once a new week has been played, and are
+served as files by the /reports route of serve.py or by any static file server pointed at REPORTS_DIR.
+
+    python static_reports.py 1667721 2017 2016
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from tornado import gen
+from tornado.web import RequestHandler
+from bokeh.document import Document
+from bokeh.embed import file_html
+from bokeh.layouts import row, column
+from bokeh.models.widgets import Div, Panel, Tabs, RangeSlider, Select
+from bokeh.resources import CDN
+from espnff import PrivateLeagueException, InvalidLeagueException, UnknownLeagueException
+from league_cache import CACHE_LIVE_TTL, league_cache, load_in_background, run_in_background
+from league_figures import get_line_colors, initialize_sc_figure, initialize_ew_figure, initialize_ew_table
+from league_figures import get_sc_source, get_ew_source, get_table_sources, plot_sc_data, plot_ew_data
+from league_figures import make_week_filter, make_week_range_callback, make_week_select_callback, week_range_args
+from metrics import instrumented
+
+# reports are written here; an empty value turns the /reports route off
+REPORTS_DIR = os.environ.get('FFL_REPORTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'ffl_reports'))
+
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def report_paths(league_id, year, directory=REPORTS_DIR):
+    """Returns the files of a league-season's report
+    :return: dict of paths: html, json (the bokeh document) and meta (what the report was built from)
+    """
+
+    base = os.path.join(directory, '{}-{}'.format(int(league_id), int(year)))
+
+    return dict(html=base + '.html', json=base + '.json', meta=base + '.meta.json')
+
+
+def read_meta(path):
+    """Returns a report's metadata, or None if it hasn't been written"""
+
+    try:
+        with open(path, 'r') as infile:
+            return json.load(infile)
+
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomically(path, text):
+    # readers see the old file or the new one, never half of either
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path), suffix='.tmp', dir=os.path.dirname(path))
+
+    with os.fdopen(fd, 'w', encoding='utf-8') as outfile:
+        outfile.write(text)
+
+    os.replace(tmp_path, path)
+
+
+@instrumented('build_report')
+def build_report(season):
+    """Returns a standalone document of a league-season's Scores, Expected Wins and Summary tabs
+    :param season: structures.LeagueSeason with at least one week played
+    :return: bokeh Document
+    """
+
+    week_num = season.latest_week
+
+    # a slider can't run from week 1 to week 1, so a report one week in gets a disabled one spanning two
+    week_slider = RangeSlider(title='Weeks', start=1, end=max(2, week_num), value=(1, week_num), step=1,
+                              disabled=week_num < 2)
+    week_select = Select(title='Standings After Week:', options=[str(week) for week in season.weeks],
+                         value=str(week_num))
+    week_filter = make_week_filter(week_slider)
+
+    line_colors = get_line_colors(season.number_teams)
+
+    plot1 = initialize_sc_figure(season)
+    sc_source = get_sc_source(season)
+    plot_sc_data(plot1, season, sc_source, line_colors, week_filter)
+
+    plot2 = initialize_ew_figure(season)
+    ew_source = get_ew_source(season)
+    plot_ew_data(plot2, season, ew_source, line_colors, week_filter)
+
+    table_source = get_table_sources(season, 1, week_num)
+
+    week_range_callback = make_week_range_callback()
+    week_range_callback.args = week_range_args(season, sc_source, ew_source, table_source, week_slider,
+                                               week_select)
+
+    week_slider.js_on_change('value', week_range_callback)
+    week_select.js_on_change('value', make_week_select_callback(week_slider))
+
+    tab1 = Panel(child=plot1, title='Scores')
+    tab2 = Panel(child=plot2, title='Expected Wins')
+    tab3 = Panel(child=column(week_select, initialize_ew_table(table_source)), title='Summary')
+
+    page_title = Div(text='<strong><h1 style="font-size: 2.5em;">{} - {} Season</h1></strong>'.format(
+        season.name, season.year), width=700, height=50)
+
+    doc = Document()
+    doc.add_root(column(page_title, row(week_slider, Tabs(tabs=[tab1, tab2, tab3], width=500))))
+    doc.title = '{} - {} Season'.format(season.name, season.year)
+
+    return doc
+
+
+def write_report(season, directory=REPORTS_DIR):
+    """Renders a league-season's report and writes its files, replacing any previous version
+    :param season: structures.LeagueSeason with at least one week played
+    :param directory: str
+    :return: dict of the paths written, as report_paths()
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    paths = report_paths(season.league_id, season.year, directory)
+    doc = build_report(season)
+
+    _write_atomically(paths['html'], file_html(doc, CDN, doc.title))
+    _write_atomically(paths['json'], doc.to_json_string())
+
+    # written last, so a report is only taken as current once both files are in place
+    now = time.time()
+    _write_atomically(paths['meta'], json.dumps(dict(league_id=int(season.league_id), year=int(season.year),
+                                                     latest_week=season.latest_week,
+                                                     complete=bool(season.complete), rendered=now, checked=now)))
+
+    return paths
+
+
+def needs_check(meta, now=None):
+    """Whether a report may be out of date: it is missing, or its season was in progress and hasn't been looked
+    at for as long as the league cache keeps a season in progress
+    """
+
+    now = now or time.time()
+
+    return meta is None or (not meta['complete'] and meta['checked'] + CACHE_LIVE_TTL <= now)
+
+
+def ensure_report(season, directory=REPORTS_DIR):
+    """Writes a league-season's report unless the one on disk already covers every week played
+    :param season: structures.LeagueSeason with at least one week played
+    :param directory: str
+    :return: bool, whether the report was rendered
+    """
+
+    paths = report_paths(season.league_id, season.year, directory)
+    meta = read_meta(paths['meta'])
+
+    if meta is not None and meta['latest_week'] == season.latest_week and meta['complete'] == bool(season.complete):
+        meta['checked'] = time.time()
+        _write_atomically(paths['meta'], json.dumps(meta))
+
+        return False
+
+    write_report(season, directory)
+
+    return True
+
+
+class ReportHandler(RequestHandler):
+    """Serves /reports/<league_id>/<year>.html (or .json), bringing the report up to date first if needed"""
+
+    def send_report_error(self, status, message):
+        self.set_status(status)
+        self.finish('<p>{}</p>'.format(message))
+
+    @gen.coroutine
+    def get(self, league_id, year, ext):
+        paths = report_paths(league_id, year)
+
+        if needs_check(read_meta(paths['meta'])):
+            season = league_cache.get(league_id, year)
+
+            try:
+                if season is None:
+                    season = yield load_in_background(league_id, year)
+
+            except PrivateLeagueException:
+                self.send_report_error(403, 'League {} is not viewable by the public.'.format(league_id))
+                return
+
+            except (InvalidLeagueException, UnknownLeagueException):
+                self.send_report_error(404, '{} season of league {} does not exist.'.format(year, league_id))
+                return
+
+            except Exception:
+                logger.exception('League {} ({}) could not be loaded for its report'.format(league_id, year))
+                self.send_report_error(503, 'League {} could not be loaded right now.'.format(league_id))
+                return
+
+            if season.latest_week == 0:
+                self.send_report_error(404, 'No weeks of the {} season have been played.'.format(year))
+                return
+
+            # rendering takes a moment, so it stays off the IO loop like the league loads
+            try:
+                yield run_in_background(ensure_report, season)
+
+            # an older copy may still be on disk, and is served below if so
+            except Exception:
+                logger.exception('Report of league {} ({}) could not be rendered'.format(league_id, year))
+
+        try:
+            with open(paths[ext], 'rb') as infile:
+                body = infile.read()
+
+        # never rendered, or left incomplete by a failed render or an interrupted run of main()
+        except OSError:
+            self.send_report_error(503, 'The report of the {} season of league {} is not available right '
+                                        'now.'.format(year, league_id))
+            return
+
+        # tornado adds an ETag from the body, so unchanged reports are answered with a 304
+        self.set_header('Content-Type', CONTENT_TYPES[ext])
+        self.finish(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-render league reports for read-only visitors.')
+    parser.add_argument('league_id', type=int)
+    parser.add_argument('years', type=int, nargs='+')
+    parser.add_argument('--force', action='store_true', help='render even if the report is up to date')
+    args = parser.parse_args(argv)
+
+    for year in args.years:
+        season = league_cache.get_or_load(args.league_id, year)
+
+        if season.latest_week == 0:
+            print('{} {}: no weeks played yet'.format(args.league_id, year))
+            continue
+
+        rendered = write_report(season) if args.force else ensure_report(season)
+        print('{} {}: {}'.format(args.league_id, year, 'rendered' if rendered else 'up to date'))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
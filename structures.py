@@ -1,5 +1,294 @@
+import numpy as np
+from expected_wins import weekly_expected_wins, weekly_ranks, cumulative_expected_wins, window_totals, standings_ranks
+from expected_wins import all_play_records
+from matchups import weekly_results, margins_of_victory, power_rankings
+
+
+def _read_only(array, dtype=float):
+    # already-protected arrays, e.g. memory-mapped from the shared cache, are kept as they are rather than copied
+    if isinstance(array, np.ndarray) and not array.flags.writeable and array.dtype == dtype:
+        return array
+
+    # league data is shared between sessions, so guard against accidental in-place edits
+    array = np.array(array, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
 class Team:
-    def __init__(self, owner, scores):
-        self.owner = owner
-        self.scores = scores
-        self.exp_wins = [0]
+    """A lightweight view of one team's row in its LeagueSeason's arrays"""
+
+    __slots__ = ('season', 'idx')
+
+    def __init__(self, season, idx):
+        self.season = season
+        self.idx = idx
+
+    def __repr__(self):
+        return 'Team({})'.format(self.owner)
+
+    @property
+    def owner(self):
+        return self.season.owners[self.idx]
+
+    @property
+    def team_id(self):
+        return self.season.team_ids[self.idx]
+
+    @property
+    def scores(self):
+        # score for each week; index 0 is week 1
+        return self.season.scores[self.idx]
+
+    @property
+    def exp_wins(self):
+        # cumulative expected wins; index k is the total through week k, so index 0 is always 0
+        return self.season.cumul_ew[self.idx]
+
+    @property
+    def ranks(self):
+        return self.season.ranks[self.idx]
+
+    @property
+    def wins(self):
+        return self.season.wins[self.idx]
+
+
+class LeagueSeason:
+    """All of the data for one league-season, held as (teams, weeks) arrays
+
+    Rows follow the order of owners / team_ids; column k of scores, weekly_ew and ranks is week k + 1,
+    while column k of cumul_ew is the total through week k. Column k of opponents is the row of each team's
+    opponent in week k + 1 for the whole regular season, played or not.
+    """
+
+    def __init__(self, league_id, year, name, team_ids, owners, scores, wins, complete, derived=None,
+                 opponents=None, playoff_teams=0):
+        """
+        :param league_id: int
+        :param year: int
+        :param name: string, league name
+        :param team_ids: list of espn team ids
+        :param owners: list of owner names as given by their espn accounts
+        :param scores: (teams, weeks) array-like of weekly scores
+        :param wins: list of actual wins per team
+        :param complete: bool, whether the regular season is over
+        :param derived: dict, optional; precomputed weekly_ew, cumul_ew and ranks arrays to use as they are, and
+        optionally standings and standings_order
+        :param opponents: (teams, regular season weeks) array-like of opponent rows, -1 for a bye or an
+        unknown opponent; defaults to no known schedule
+        :param playoff_teams: int, number of teams that make the playoffs
+        """
+
+        self.league_id = league_id
+        self.year = year
+        self.name = name
+        self.team_ids = list(team_ids)
+        self.owners = list(owners)
+        self.complete = complete
+
+        self.scores = _read_only(scores)
+        self.wins = _read_only(wins, dtype=int)
+        if derived is None:
+            derived = dict(weekly_ew=weekly_expected_wins(self.scores))
+            derived['cumul_ew'] = cumulative_expected_wins(derived['weekly_ew'])
+            derived['ranks'] = weekly_ranks(self.scores)
+
+        self.weekly_ew = _read_only(derived['weekly_ew'])
+        self.cumul_ew = _read_only(derived['cumul_ew'])
+        self.ranks = _read_only(derived['ranks'])
+
+        if opponents is None:
+            opponents = np.full((self.scores.shape[0], self.scores.shape[1]), -1)
+
+        self.opponents = _read_only(opponents, dtype=int)
+        self.playoff_teams = playoff_teams
+
+        # actual results week by week, when the pairings are known; a tie is half a win
+        played = self.opponents[:, :self.scores.shape[1]]
+        self.has_schedule = bool((played >= 0).any())
+
+        wins, losses, ties = weekly_results(self.scores, played)
+
+        self.weekly_losses = _read_only(losses, dtype=int)
+        self.weekly_ties = _read_only(ties, dtype=int)
+        self.weekly_wins = _read_only(wins + 0.5 * ties)
+        self.margins = _read_only(margins_of_victory(self.scores, played))
+        # same running totals as expected wins, so any window is a difference of two columns
+        self.cumul_wins = _read_only(cumulative_expected_wins(self.weekly_wins))
+
+        # standings for every window of weeks, so any table is a lookup; [start - 1, end] is weeks start to end.
+        # They are the season's biggest arrays, so a copy from the shared cache maps them rather than rebuilding
+        if 'standings' in derived:
+            standings, standings_order = derived['standings'], derived['standings_order']
+
+        else:
+            window_ew = window_totals(self.cumul_ew)
+            standings = standings_ranks(window_ew)
+
+            # rows best first for each window; stable so equal totals keep team order
+            standings_order = np.argsort(-window_ew, axis=-1, kind='mergesort')
+
+        self.standings = _read_only(standings, dtype=int)
+        self.standings_order = _read_only(standings_order, dtype=int)
+
+        # valid regular season weeks, to be used as plot x values
+        self.weeks = _read_only(np.arange(1, self.scores.shape[1] + 1), dtype=int)
+
+        # given the name of an owner, returns the row where its data is found
+        self.owner_index = {owner: idx for idx, owner in enumerate(self.owners)}
+
+        self.teams = [Team(self, idx) for idx in range(len(self.owners))]
+
+    def __repr__(self):
+        return 'LeagueSeason({}, {})'.format(self.league_id, self.year)
+
+    @property
+    def number_teams(self):
+        return self.scores.shape[0]
+
+    @property
+    def latest_week(self):
+        return self.scores.shape[1]
+
+    @property
+    def reg_season_weeks(self):
+        return max(self.opponents.shape[1], self.latest_week)
+
+    @property
+    def nbytes(self):
+        """Memory held by this season's arrays, not counting those mapped from the shared cache"""
+
+        return sum(value.nbytes for value in vars(self).values()
+                   if isinstance(value, np.ndarray) and not isinstance(value, np.memmap))
+
+    def window_expected_wins(self, start, end):
+        """Returns each team's expected wins over weeks start through end, inclusive"""
+
+        return self.cumul_ew[:, end] - self.cumul_ew[:, start - 1]
+
+    def window_wins(self, start, end):
+        """Returns each team's actual wins over weeks start through end, inclusive
+
+        Without a known schedule only season totals are available, so those are returned for any window.
+        """
+
+        if not self.has_schedule:
+            return self.wins.astype(float)
+
+        return self.cumul_wins[:, end] - self.cumul_wins[:, start - 1]
+
+    def window_table(self, start, end):
+        """Returns the Summary table for weeks start through end, best expected wins first
+        :return: dict of lists: rank, move (places gained with week end), owner, wins, ew and diff (wins - ew)
+        """
+
+        ew = self.window_expected_wins(start, end)
+        wins = self.window_wins(start, end)
+
+        # standings are precomputed for every window, so no sorting here
+        order = self.window_order(start, end)
+
+        return dict(
+            rank=self.window_ranks(start, end)[order].tolist(),
+            move=self.rank_movement(start, end)[order].tolist(),
+            owner=[self.owners[i] for i in order],
+            wins=wins[order].tolist(),
+            ew=np.round(ew[order], 3).tolist(),
+            diff=np.round(wins[order] - ew[order], 3).tolist()
+        )
+
+    def power_rankings(self, week):
+        """Returns ESPN's power rankings through a week, without asking ESPN
+        :param week: int
+        :return: list of (row, points), highest points first; see matchups.power_points()
+        """
+
+        return power_rankings(self.scores, self.opponents, week)
+
+    def window_ranks(self, start, end):
+        """Returns each team's rank by expected wins over weeks start through end; tied teams share the best rank"""
+
+        return self.standings[start - 1, end]
+
+    def window_order(self, start, end):
+        """Returns team rows ordered by expected wins over weeks start through end, best first"""
+
+        return self.standings_order[start - 1, end]
+
+    def rank_movement(self, start, end):
+        """Returns how many places each team rose in the standings with week end added, 0 for a one week window"""
+
+        if end <= start:
+            return np.zeros(self.number_teams, dtype=int)
+
+        return self.standings[start - 1, end - 1] - self.standings[start - 1, end]
+
+
+class FranchiseHistory:
+    """Several seasons of one league lined up by owner, held as (owners, seasons) arrays
+
+    Rows follow owners in the order they first appear; column k is years[k], oldest first. Owners are the
+    stable identity across seasons, since espn team ids are handed out again when a team changes hands.
+    Entries for seasons an owner didn't play are NaN, and count as 0 in the running totals.
+    """
+
+    def __init__(self, league_id, seasons):
+        """
+        :param league_id: int
+        :param seasons: iterable of LeagueSeason of the league; seasons without a week played are left out
+        """
+
+        self.league_id = league_id
+        self.seasons = sorted((s for s in seasons if s.latest_week), key=lambda s: int(s.year))
+        self.years = [int(s.year) for s in self.seasons]
+        self.name = self.seasons[-1].name if self.seasons else ''
+
+        self.owners = []
+        self.owner_index = {}
+
+        for season in self.seasons:
+            for owner in season.owners:
+                if owner not in self.owner_index:
+                    self.owner_index[owner] = len(self.owners)
+                    self.owners.append(owner)
+
+        shape = (len(self.owners), len(self.seasons))
+        wins, expected_wins = np.full(shape, np.nan), np.full(shape, np.nan)
+        ap_wins, ap_losses, ap_ties = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+
+        for col, season in enumerate(self.seasons):
+            rows = [self.owner_index[owner] for owner in season.owners]
+            records = all_play_records(season.scores)
+
+            wins[rows, col] = season.wins
+            expected_wins[rows, col] = season.cumul_ew[:, -1]
+            ap_wins[rows, col] = records[0].sum(axis=-1)
+            ap_losses[rows, col] = records[1].sum(axis=-1)
+            ap_ties[rows, col] = records[2].sum(axis=-1)
+
+        self.wins = _read_only(wins)
+        self.expected_wins = _read_only(expected_wins)
+        self.all_play_wins = _read_only(ap_wins)
+        self.all_play_losses = _read_only(ap_losses)
+        self.all_play_ties = _read_only(ap_ties)
+
+        # wins above (or below) what the owner's scores earned against the whole league
+        self.luck = _read_only(wins - expected_wins)
+
+        # running totals through each season
+        self.cumul_wins = _read_only(np.cumsum(np.nan_to_num(wins), axis=-1))
+        self.cumul_expected_wins = _read_only(np.cumsum(np.nan_to_num(expected_wins), axis=-1))
+
+    def __repr__(self):
+        return 'FranchiseHistory({}, {})'.format(self.league_id, self.years)
+
+    @property
+    def number_owners(self):
+        return len(self.owners)
+
+    @property
+    def played(self):
+        """(owners, seasons) bool array of the seasons each owner took part in"""
+
+        return ~np.isnan(self.wins)
@@ -0,0 +1,26 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the modules under test live at the top of the repo and in manager_script/, rather than in a package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'manager_script'))
+sys.path.insert(0, REPO_DIR)
+
+from structures import LeagueSeason
+
+
+@pytest.fixture
+def make_season():
+    """Returns a function building a LeagueSeason from a (teams, weeks) score matrix"""
+
+    def build(scores, league_id=1, year=2017, complete=True, opponents=None):
+        scores = np.asarray(scores, dtype=float)
+        number_teams = scores.shape[0]
+
+        return LeagueSeason(league_id, year, 'Test League', list(range(1, number_teams + 1)),
+                            ['Owner {}'.format(i) for i in range(number_teams)], scores, [0] * number_teams,
+                            complete, opponents=opponents)
+
+    return build
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from expected_wins import (weekly_ranks, weekly_expected_wins, cumulative_expected_wins, head_to_head,
+                           all_play_matrix, all_play_records, window_totals, standings_ranks)
+
+
+def brute_force_expected_wins(scores):
+    # each team's all-play win fraction, week by week, a tie counting half
+    number_teams, number_weeks = scores.shape
+    ew = np.zeros(scores.shape)
+
+    for week in range(number_weeks):
+        for team in range(number_teams):
+            for other in range(number_teams):
+                mine, theirs = scores[team, week], scores[other, week]
+
+                if other != team:
+                    ew[team, week] += (mine > theirs) + 0.5 * (mine == theirs)
+
+    return ew / (number_teams - 1)
+
+
+@pytest.fixture
+def tied_scores():
+    # small integer scores, so most weeks have ties
+    return np.random.RandomState(7).randint(0, 5, size=(10, 13)).astype(float)
+
+
+def test_ties_share_the_win():
+    ew = weekly_expected_wins([[10], [10], [5]])
+
+    np.testing.assert_allclose(ew[:, 0], [0.75, 0.75, 0])
+
+
+def test_expected_wins_match_brute_force(tied_scores):
+    np.testing.assert_allclose(weekly_expected_wins(tied_scores), brute_force_expected_wins(tied_scores))
+
+
+def test_ties_share_the_average_rank():
+    ranks = weekly_ranks([[10], [10], [5], [12]])
+
+    np.testing.assert_allclose(ranks[:, 0], [2.5, 2.5, 4, 1])
+
+
+def test_stacked_seasons_are_ranked_separately(tied_scores):
+    stacked = np.stack([tied_scores, tied_scores[::-1]])
+    ew = weekly_expected_wins(stacked)
+
+    np.testing.assert_allclose(ew[0], weekly_expected_wins(tied_scores))
+    np.testing.assert_allclose(ew[1], weekly_expected_wins(tied_scores[::-1]))
+
+
+def test_cumulative_expected_wins_start_from_zero(tied_scores):
+    weekly = weekly_expected_wins(tied_scores)
+    cumul = cumulative_expected_wins(weekly)
+
+    assert cumul.shape == (10, 14)
+    np.testing.assert_allclose(cumul[:, 0], 0)
+    np.testing.assert_allclose(cumul[:, -1], weekly.sum(axis=1))
+
+
+def test_all_play_records_add_up(tied_scores):
+    wins, losses, ties = all_play_records(tied_scores)
+
+    np.testing.assert_array_equal(wins + losses + ties, 9)
+    np.testing.assert_allclose((wins + ties / 2) / 9, weekly_expected_wins(tied_scores))
+
+
+def test_head_to_head_is_never_against_itself(tied_scores):
+    wins, ties = head_to_head(tied_scores)
+
+    assert not wins[np.arange(10), np.arange(10)].any()
+    assert not ties[np.arange(10), np.arange(10)].any()
+    np.testing.assert_array_equal(ties, np.swapaxes(ties, 0, 1))
+
+
+@pytest.mark.parametrize('start, end', [(1, 13), (1, 1), (4, 9), (13, 13)])
+def test_all_play_matrix_covers_the_window(tied_scores, start, end):
+    wins, losses, ties = all_play_matrix(tied_scores, start, end)
+    window = tied_scores[:, start - 1:end]
+
+    for team in range(10):
+        for other in range(10):
+            if team == other:
+                continue
+
+            assert wins[team, other] == (window[team] > window[other]).sum()
+            assert losses[team, other] == (window[team] < window[other]).sum()
+            assert ties[team, other] == (window[team] == window[other]).sum()
+
+
+def test_window_totals_difference_running_totals(tied_scores):
+    cumul = cumulative_expected_wins(weekly_expected_wins(tied_scores))
+    totals = window_totals(cumul)
+
+    np.testing.assert_allclose(totals[3, 9], cumul[:, 9] - cumul[:, 3])
+    np.testing.assert_allclose(totals[0, 13], cumul[:, 13])
+
+
+def test_standings_ties_share_the_best_rank():
+    np.testing.assert_array_equal(standings_ranks(np.array([3.0, 5.0, 3.0, 1.0])), [2, 1, 2, 4])
+
+    # totals equal but for floating point noise are still tied
+    np.testing.assert_array_equal(standings_ranks(np.array([0.1 + 0.2, 0.3])), [1, 1])
@@ -0,0 +1,157 @@
+import threading
+import time
+import pytest
+
+pytest.importorskip('espnff')
+
+import league_cache
+from league_cache import LeagueCache
+from league_data import LoadCancelled
+
+TIMEOUT = 5
+
+
+class FakeSeason:
+    def __init__(self, nbytes=0, complete=True):
+        self.nbytes = nbytes
+        self.complete = complete
+
+
+class BlockingLoader:
+    """Loader that holds every load until released, and gives up once its load is cancelled"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.calls = 0
+
+    def __call__(self, league_id, year, progress=None, cancel=None):
+        self.calls += 1
+        self.started.release()
+
+        while not self.release.wait(0.01):
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled()
+
+        return FakeSeason()
+
+
+def run(fn, results, name):
+    def target():
+        try:
+            results[name] = fn()
+
+        except Exception as e:
+            results[name] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+
+    return thread
+
+
+def wait_for(condition):
+    deadline = time.time() + TIMEOUT
+
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = LeagueCache()
+    loader = BlockingLoader()
+    results = {}
+
+    threads = [run(lambda: cache.get_or_load(1, 2017, loader), results, 'leader')]
+    assert loader.started.acquire(timeout=TIMEOUT)
+
+    threads += [run(lambda: cache.get_or_load('1', '2017', loader), results, i) for i in range(3)]
+    wait_for(lambda: cache.coalesced == 3)
+
+    loader.release.set()
+
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert loader.calls == 1
+    assert len({id(season) for season in results.values()}) == 1
+    assert cache.in_flight() == 0
+    assert cache.get(1, 2017) is results['leader']
+
+
+def test_waiting_request_takes_over_from_a_cancelled_leader():
+    cache = LeagueCache()
+    loader = BlockingLoader()
+    leader_cancel = threading.Event()
+    results = {}
+
+    leader = run(lambda: cache.get_or_load(1, 2017, loader, cancel=leader_cancel), results, 'leader')
+    assert loader.started.acquire(timeout=TIMEOUT)
+
+    follower = run(lambda: cache.get_or_load(1, 2017, loader), results, 'follower')
+    wait_for(lambda: cache.coalesced == 1)
+
+    leader_cancel.set()
+    leader.join(TIMEOUT)
+
+    # the follower starts the load again itself
+    assert loader.started.acquire(timeout=TIMEOUT)
+    loader.release.set()
+    follower.join(TIMEOUT)
+
+    assert isinstance(results['leader'], LoadCancelled)
+    assert isinstance(results['follower'], FakeSeason)
+    assert loader.calls == 2
+    assert cache.in_flight() == 0
+
+
+def test_cancelled_waiting_request_leaves_the_load_running():
+    cache = LeagueCache()
+    loader = BlockingLoader()
+    follower_cancel = threading.Event()
+    results = {}
+
+    leader = run(lambda: cache.get_or_load(1, 2017, loader), results, 'leader')
+    assert loader.started.acquire(timeout=TIMEOUT)
+
+    follower = run(lambda: cache.get_or_load(1, 2017, loader, cancel=follower_cancel), results, 'follower')
+    wait_for(lambda: cache.coalesced == 1)
+
+    follower_cancel.set()
+    follower.join(TIMEOUT)
+    loader.release.set()
+    leader.join(TIMEOUT)
+
+    assert isinstance(results['follower'], LoadCancelled)
+    assert isinstance(results['leader'], FakeSeason)
+    assert loader.calls == 1
+
+
+def test_failed_load_ends_the_flight_and_is_not_cached():
+    cache = LeagueCache()
+
+    def loader(league_id, year, progress=None, cancel=None):
+        raise ValueError('espn is down')
+
+    with pytest.raises(ValueError):
+        cache.get_or_load(1, 2017, loader)
+
+    assert cache.in_flight() == 0
+    assert cache.get(1, 2017) is None
+
+
+def test_memory_budget_trims_the_cache_to_its_share(monkeypatch):
+    monkeypatch.setattr(league_cache, 'CACHE_MEMORY_SHARE', 0.25)
+    cache = LeagueCache(memory_budget=1000)
+
+    for year in range(2010, 2015):
+        cache._entries[(1, year)] = (FakeSeason(nbytes=100), None)
+
+    # mapped from the shared cache, so evicting it would free nothing
+    cache._entries[(1, 2009)] = (FakeSeason(nbytes=0), None)
+    cache._entries.move_to_end((1, 2009), last=False)
+
+    assert cache.enforce_memory_budget(resident=900) == 0
+    assert cache.enforce_memory_budget(resident=5000) == 3
+    assert list(cache._entries) == [(1, 2009), (1, 2013), (1, 2014)]
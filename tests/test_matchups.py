@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from matchups import NO_OPPONENT, weekly_results, margins_of_victory, power_points, power_rankings
+
+
+def round_robin(number_teams, number_weeks):
+    # (teams, weeks) opponent rows of a circle-method schedule, repeated as needed
+    slots = list(range(number_teams))
+    opponents = np.empty((number_teams, number_weeks), dtype=int)
+
+    for week in range(number_weeks):
+        for i in range(number_teams // 2):
+            home, away = slots[i], slots[-1 - i]
+            opponents[home, week] = away
+            opponents[away, week] = home
+
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+
+    return opponents
+
+
+def espnff_power_points(scores, opponents, week):
+    # League.power_rankings() and utils.power_points() of espnff, written out loop by loop
+    number_teams = scores.shape[0]
+    win_matrix = np.zeros((number_teams, number_teams))
+
+    for team in range(number_teams):
+        for wk in range(week):
+            opp = opponents[team, wk]
+            mov = scores[team, wk] - scores[opp, wk]
+
+            if mov > 0:
+                win_matrix[team, opp] += 1
+
+    dominance = win_matrix.dot(win_matrix) + win_matrix
+    points = []
+
+    for team in range(number_teams):
+        avg_score = sum(scores[team, :week]) / week
+        avg_mov = sum(scores[team, wk] - scores[opponents[team, wk], wk] for wk in range(week)) / week
+        points.append(float('{0:.2f}'.format(int(sum(dominance[team])) * 0.8 + int(avg_score) * 0.15 +
+                                             int(avg_mov) * 0.05)))
+
+    return points
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('week', [1, 6, 13])
+def test_power_points_match_espnff(seed, week):
+    rng = np.random.RandomState(seed)
+
+    # whole and half points, so ties come up too
+    scores = np.round(rng.normal(100, 25, size=(10, 13)) * 2) / 2
+    opponents = round_robin(10, 13)
+
+    np.testing.assert_allclose(power_points(scores, opponents, week), espnff_power_points(scores, opponents, week))
+
+
+def test_power_rankings_keep_row_order_for_equal_points():
+    scores = np.array([[100.0], [100.0], [100.0], [100.0]])
+    opponents = round_robin(4, 1)
+
+    assert [row for row, _ in power_rankings(scores, opponents, 1)] == [0, 1, 2, 3]
+
+
+def test_results_and_margins_skip_weeks_without_a_game():
+    scores = np.array([[100.0, 80.0], [90.0, 80.0], [70.0, 60.0]])
+    opponents = np.array([[1, 1], [0, 0], [NO_OPPONENT, NO_OPPONENT]])
+
+    wins, losses, ties = weekly_results(scores, opponents)
+
+    np.testing.assert_array_equal(wins, [[1, 0], [0, 0], [0, 0]])
+    np.testing.assert_array_equal(losses, [[0, 0], [1, 0], [0, 0]])
+    np.testing.assert_array_equal(ties, [[0, 1], [0, 1], [0, 0]])
+    np.testing.assert_allclose(margins_of_victory(scores, opponents), [[10, 0], [-10, 0], [0, 0]])
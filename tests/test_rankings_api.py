@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import pytest
+
+pytest.importorskip('tornado')
+pytest.importorskip('espnff')
+
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+from league_cache import league_cache
+from rankings_api import RankingsHandler, rankings_etag
+from structures import LeagueSeason
+
+SCORES = [[100, 90, 80], [90, 95, 80], [80, 70, 120], [70, 60, 60]]
+
+
+def make_season(complete=True, scores=SCORES):
+    return LeagueSeason(1, 2017, 'Test League', [1, 2, 3, 4], ['A', 'B', 'C', 'D'], scores, [2, 2, 1, 1],
+                        complete, opponents=[[1, 2, 3], [0, 3, 2], [3, 0, 1], [2, 1, 0]])
+
+
+def test_etag_follows_the_data():
+    season = make_season()
+
+    assert rankings_etag(season, 3, 'json') == rankings_etag(make_season(), 3, 'json')
+    assert rankings_etag(season, 3, 'json') != rankings_etag(season, 2, 'json')
+    assert rankings_etag(season, 3, 'json') != rankings_etag(season, 3, 'csv')
+
+    # the same scores, but the season has since finished
+    assert rankings_etag(make_season(complete=False), 3, 'json') != rankings_etag(season, 3, 'json')
+
+    rescored = [row[:] for row in SCORES]
+    rescored[0][2] += 1
+    assert rankings_etag(make_season(scores=rescored), 3, 'json') != rankings_etag(season, 3, 'json')
+
+
+class RankingsHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return Application([(r'/api/rankings/(\d+)/(\d+)', RankingsHandler)])
+
+    def setUp(self):
+        super(RankingsHandlerTest, self).setUp()
+        league_cache.put(1, 2017, make_season())
+
+    def tearDown(self):
+        league_cache.clear()
+        super(RankingsHandlerTest, self).tearDown()
+
+    def test_json_rankings_carry_an_etag(self):
+        response = self.fetch('/api/rankings/1/2017?week=2')
+        data = json.loads(response.body.decode('utf-8'))
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(data['week'], 2)
+        self.assertEqual(len(data['rankings']), 4)
+        self.assertEqual(response.headers['ETag'], rankings_etag(make_season(), 2, 'json'))
+
+    def test_unchanged_rankings_are_answered_with_304(self):
+        etag = self.fetch('/api/rankings/1/2017').headers['ETag']
+        response = self.fetch('/api/rankings/1/2017', headers={'If-None-Match': etag})
+
+        self.assertEqual(response.code, 304)
+        self.assertEqual(response.body, b'')
+
+    def test_a_stale_etag_gets_the_full_response(self):
+        etag = self.fetch('/api/rankings/1/2017?week=2').headers['ETag']
+        response = self.fetch('/api/rankings/1/2017', headers={'If-None-Match': etag})
+
+        self.assertEqual(response.code, 200)
+
+    def test_csv_has_a_row_per_team(self):
+        response = self.fetch('/api/rankings/1/2017?format=csv')
+        rows = list(csv.reader(io.StringIO(response.body.decode('utf-8'))))
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(len(rows), 5)
+        self.assertIn('score_3', rows[0])
+
+    def test_bad_requests_are_rejected(self):
+        self.assertEqual(self.fetch('/api/rankings/1/2017?format=xml').code, 400)
+        self.assertEqual(self.fetch('/api/rankings/1/2017?week=9').code, 400)
@@ -0,0 +1,75 @@
+import json
+import pytest
+from rankings_store import RankingsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RankingsStore(str(tmp_path), 2017)
+
+
+def test_records_are_read_back(tmp_path, store):
+    store.append_week(1, {1: 0.5, 2: 0.5}, {1: 0.5, 2: 0.5}, {1: 'A', 2: 'B'})
+    store.append_week(2, {1: 1.0, 2: 0.0}, {1: 1.5, 2: 0.5}, {1: 'A', 2: 'B'})
+
+    reopened = RankingsStore(str(tmp_path), 2017)
+
+    assert len(reopened) == 2
+    assert reopened.latest_week() == 2
+    assert reopened.totals(2) == {1: 1.5, 2: 0.5}
+    assert reopened.totals(0) == {}
+    assert reopened.totals(3) is None
+
+
+def test_a_recomputed_week_replaces_the_earlier_record(tmp_path, store):
+    store.append_week(1, {1: 0.5}, {1: 0.5}, {1: 'A'})
+    store.append_week(1, {1: 0.25}, {1: 0.25}, {1: 'A'})
+
+    assert RankingsStore(str(tmp_path), 2017).totals(1) == {1: 0.25}
+
+
+def test_a_torn_last_line_is_skipped_and_written_past(tmp_path, store):
+    store.append_week(1, {1: 0.5}, {1: 0.5}, {1: 'A'})
+
+    # an append interrupted part way through its line
+    with open(store.path, 'a') as outfile:
+        outfile.write('{"week": 2, "ew": {"1"')
+
+    torn = RankingsStore(str(tmp_path), 2017)
+
+    assert torn.latest_week() == 1
+
+    torn.append_week(2, {1: 1.0}, {1: 1.5}, {1: 'A'})
+    reopened = RankingsStore(str(tmp_path), 2017)
+
+    assert reopened.latest_week() == 2
+    assert reopened.totals(2) == {1: 1.5}
+
+    with open(store.path, 'r') as infile:
+        lines = infile.read().splitlines()
+
+    assert json.loads(lines[-1])['week'] == 2
+
+
+def test_csv_import_turns_running_totals_into_weeks(tmp_path, store):
+    weeks = {0: 'A,0\nB,0\n', 1: 'A,0.75\nB,0.25\n', 2: 'A,1.25\nB,0.75\n\n'}
+    paths = []
+
+    for week, text in weeks.items():
+        path = tmp_path / 'My-League-{:02d}.csv'.format(week)
+        path.write_text(text)
+        paths.append(str(path))
+
+    assert store.import_csv_files(paths + [str(tmp_path / 'notes.txt')], {'A': 1, 'B': 2}) == 2
+
+    assert store.totals(2) == {1: 1.25, 2: 0.75}
+    assert store.record(2)['ew'] == {'1': 0.5, '2': 0.5}
+    assert store.record(2)['owners'] == {'1': 'A', '2': 'B'}
+
+
+def test_csv_import_skips_owners_who_left(tmp_path, store):
+    path = tmp_path / 'My-League-01.csv'
+    path.write_text('A,0.75\nGone,0.5\n')
+
+    assert store.import_csv_files([str(path)], {'A': 1}) == 1
+    assert store.totals(1) == {1: 0.75}
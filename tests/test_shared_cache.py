@@ -0,0 +1,110 @@
+import os
+import time
+import numpy as np
+import pytest
+from shared_cache import STALE_VERSION_AGE, InProcessSharedCache, SharedLeagueCache
+
+SCORES = [[100, 90, 80], [90, 95, 80], [80, 70, 120], [70, 60, 60]]
+
+
+@pytest.fixture(params=['disk', 'in_process'])
+def shared(request, tmp_path):
+    if request.param == 'disk':
+        return SharedLeagueCache(str(tmp_path))
+
+    return InProcessSharedCache()
+
+
+def test_round_trip_keeps_arrays_and_expiry(shared, make_season):
+    season = make_season(SCORES)
+    expires = time.time() + 60
+    shared.put(1, 2017, season, expires=expires)
+
+    copy, copy_expires = shared.get_entry(1, 2017)
+
+    assert copy_expires == expires
+    np.testing.assert_array_equal(copy.scores, season.scores)
+    np.testing.assert_array_equal(copy.standings, season.standings)
+    assert copy.window_table(2, 3) == season.window_table(2, 3)
+
+
+def test_expired_and_invalidated_entries_are_missing(shared, make_season):
+    shared.put(1, 2017, make_season(SCORES), expires=time.time() - 1)
+    assert shared.get_entry(1, 2017) == (None, None)
+
+    shared.put(1, 2017, make_season(SCORES))
+    shared.invalidate(1, 2017)
+    assert shared.get(1, 2017) is None
+
+
+def test_disk_copy_is_memory_mapped(tmp_path, make_season):
+    shared = SharedLeagueCache(str(tmp_path))
+    shared.put(1, 2017, make_season(SCORES))
+
+    copy = shared.get(1, 2017)
+
+    assert isinstance(copy.standings, np.memmap)
+    assert copy.nbytes < make_season(SCORES).nbytes
+
+
+def test_stale_versions_are_removed(tmp_path, make_season):
+    shared = SharedLeagueCache(str(tmp_path))
+    shared.put(1, 2017, make_season(SCORES))
+    current = set(os.listdir(str(tmp_path)))
+
+    # left by a put() that lost a race, or died before swapping its index entry in
+    orphan = tmp_path / '1-2017.orphan'
+    orphan.mkdir()
+    leftover = tmp_path / '1-2017.leftover.tmp'
+    leftover.write_text('{}')
+    long_ago = time.time() - STALE_VERSION_AGE - 1
+    os.utime(str(orphan), (long_ago, long_ago))
+    os.utime(str(leftover), (long_ago, long_ago))
+
+    # possibly still being written by another process
+    recent = tmp_path / '1-2017.recent'
+    recent.mkdir()
+
+    SharedLeagueCache(str(tmp_path))
+
+    assert set(os.listdir(str(tmp_path))) == current | {'1-2017.recent'}
+    assert shared.get(1, 2017) is not None
+
+
+def test_another_worker_is_served_from_the_shared_copy(shared, make_season):
+    pytest.importorskip('espnff')
+    import league_cache
+    season = make_season(SCORES, complete=False)
+    loads = []
+
+    def loader(league_id, year, progress=None, cancel=None):
+        loads.append((league_id, year))
+        return season
+
+    worker_1 = league_cache.LeagueCache(shared=shared)
+    worker_2 = league_cache.LeagueCache(shared=shared)
+
+    worker_1.get_or_load(1, 2017, loader)
+    copy = worker_2.get_or_load(1, 2017, loader)
+
+    assert loads == [(1, 2017)]
+    assert worker_2.shared_hits == 1
+    np.testing.assert_array_equal(copy.cumul_ew, season.cumul_ew)
+
+    # the second worker keeps the expiry the first published with
+    assert worker_2._entries[(1, 2017)][1] == shared.get_entry(1, 2017)[1]
+
+
+def test_an_expired_shared_copy_is_loaded_again(shared, make_season):
+    pytest.importorskip('espnff')
+    import league_cache
+    loads = []
+
+    def loader(league_id, year, progress=None, cancel=None):
+        loads.append((league_id, year))
+        return make_season(SCORES, complete=False)
+
+    shared.put(1, 2017, make_season(SCORES, complete=False), expires=time.time() - 1)
+    league_cache.LeagueCache(shared=shared).get_or_load(1, 2017, loader)
+
+    assert loads == [(1, 2017)]